@@ -2,13 +2,14 @@
 
 import logging
 from typing import Tuple
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from flask import Blueprint, session, request, jsonify
 from flask.wrappers import Response
 
-from fractalis import celery, app
+from fractalis import celery, app, redis
 from fractalis.validator import validate_json, validate_schema
+from fractalis.analytics import resultcache
 from fractalis.analytics.schema import create_task_schema
 from fractalis.analytics.task import AnalyticTask
 
@@ -33,9 +34,24 @@ def create_task() -> Tuple[Response, int]:
                      "'{}'".format(json['task_name']))
         return jsonify({'error_msg': "Task with name '{}' not found."
                        .format(json['task_name'])}), 400
+    decrypt = app.config['FRACTALIS_ENCRYPT_CACHE']
+    cache_key = analytic_task.get_cache_key(
+        session_data_tasks=session['data_tasks'], args=json['args'],
+        decrypt=decrypt)
+    result = resultcache.get(cache_key) if cache_key is not None else None
+    if result is not None:
+        # a completed task that never reaches the queue
+        task_id = str(uuid4())
+        celery.backend.store_result(task_id=task_id, result=result,
+                                    state='SUCCESS')
+        redis.expire(name='celery-task-meta-{}'.format(task_id),
+                     time=app.config['FRACTALIS_RESULT_LIFETIME'])
+        session['analytic_tasks'].append(task_id)
+        logger.debug("Result found in result cache. Sending response.")
+        return jsonify({'task_id': task_id}), 201
     async_result = analytic_task.delay(
         session_data_tasks=session['data_tasks'], args=json['args'],
-        decrypt=app.config['FRACTALIS_ENCRYPT_CACHE'])
+        decrypt=decrypt, cache_key=cache_key)
     session['analytic_tasks'].append(async_result.id)
     logger.debug("Task successfully submitted. Sending response.")
     return jsonify({'task_id': async_result.id}), 201
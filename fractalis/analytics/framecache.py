@@ -0,0 +1,112 @@
+"""This module provides an in-process cache for data frames loaded by analytic
+tasks. Every worker process holds its own cache, so repeated analyses of the
+same data do not have to read and decode the cache file again."""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Tuple, Union
+
+from pandas import DataFrame
+
+from fractalis import app
+
+logger = logging.getLogger(__name__)
+
+
+class DataFrameCache:
+    """A size-bounded LRU cache of data frames. Entries are keyed by the data
+    task id and the identity of the file they have been loaded from, so a
+    file that has been removed or replaced is never served from memory."""
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: Memory budget of the cache. 0 disables the cache.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_file_identity(file_path: str) -> Union[Tuple, None]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return file_path, stat.st_ino, stat.st_mtime, stat.st_size
+
+    def get(self, data_task_id: str, file_path: str) -> Union[DataFrame, None]:
+        """Return a copy of the cached data frame or None if there is none.
+        :param data_task_id: The data id associated with the data.
+        :param file_path: The location the data frame is loaded from.
+        :return: The data frame or None.
+        """
+        identity = self._get_file_identity(file_path)
+        with self._lock:
+            entry = self._entries.get(data_task_id)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(data_task_id)
+                self.hits += 1
+                return entry[1].copy()
+            if entry is not None:
+                self._remove(data_task_id)
+            self.misses += 1
+            return None
+
+    def put(self, data_task_id: str, file_path: str,
+            data_frame: DataFrame) -> None:
+        """Add a copy of the data frame to the cache and evict the least
+        recently used entries until the cache fits into its memory budget.
+        :param data_task_id: The data id associated with the data.
+        :param file_path: The location the data frame has been loaded from.
+        :param data_frame: The loaded data frame.
+        """
+        identity = self._get_file_identity(file_path)
+        if identity is None:
+            return
+        size = int(data_frame.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        data_frame = data_frame.copy()
+        with self._lock:
+            self._remove(data_task_id)
+            self._entries[data_task_id] = (identity, data_frame, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, data_task_id: str) -> None:
+        """Remove the entry for the given data task id if there is one.
+        :param data_task_id: The data id associated with the data.
+        """
+        with self._lock:
+            self._remove(data_task_id)
+
+    def _remove(self, data_task_id: str) -> None:
+        entry = self._entries.pop(data_task_id, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def stats(self) -> dict:
+        """Return usage statistics of this cache.
+        :return: Dict containing number of entries, size, hits, misses and
+        evictions.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+frame_cache = DataFrameCache(app.config['FRACTALIS_WORKER_CACHE_SIZE'])
@@ -0,0 +1,152 @@
+"""This module provides a cache for the results of analytic tasks. Results
+are keyed by the task name, the canonical form of its arguments and the
+content digests of the data it has been run on. Submitting the same analysis
+again returns the cached result instead of computing it once more. The cache
+is stored in Redis and shared by all workers and web processes."""
+
+import json
+import time
+import hashlib
+import logging
+from datetime import timedelta
+from typing import List, Union
+
+from redis.exceptions import WatchError
+
+from fractalis import app, redis
+
+logger = logging.getLogger(__name__)
+
+# sorted sets of the cached keys by time of last use and by expiry time
+ACCESS_KEY = 'result-cache-access'
+EXPIRY_KEY = 'result-cache-expiry'
+# hash of the size of every cached result and the sum of all sizes
+SIZE_KEY = 'result-cache-size'
+TOTAL_KEY = 'result-cache-total'
+# number of least recently used results looked at at once when evicting
+EVICTION_BATCH = 16
+
+
+def _result_key(cache_key: str) -> str:
+    return 'result-cache:{}'.format(cache_key)
+
+
+def make_cache_key(task_name: str, args: dict, decrypt: bool) -> str:
+    """Compute the key of a task result.
+    :param task_name: The name of the analytic task.
+    :param args: The canonical arguments of the task. Data task ids must be
+    replaced by the content digests of their data beforehand.
+    :param decrypt: Whether the data are stored in encrypted form.
+    :return: The hex encoded sha256 key.
+    """
+    string = json.dumps([task_name, args, decrypt],
+                        sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+
+def get(cache_key: str) -> Union[str, None]:
+    """Return the cached result for the given key.
+    :param cache_key: The key returned by make_cache_key().
+    :return: The result as returned by AnalyticTask.run() or None.
+    """
+    if not app.config['FRACTALIS_RESULT_CACHE_SIZE']:
+        return None
+    result = redis.get(_result_key(cache_key))
+    if result is None:
+        return None
+    redis.zadd(ACCESS_KEY, time.time(), cache_key)
+    return result
+
+
+def put(cache_key: str, result: str) -> None:
+    """Add a result to the cache, forget expired results and evict the least
+    recently used results until the cache fits into
+    FRACTALIS_RESULT_CACHE_SIZE.
+    :param cache_key: The key returned by make_cache_key().
+    :param result: The result as returned by AnalyticTask.run().
+    """
+    max_bytes = app.config['FRACTALIS_RESULT_CACHE_SIZE']
+    size = len(result.encode('utf-8'))
+    if size > max_bytes:
+        return
+    expires = app.config['FRACTALIS_RESULT_CACHE_LIFETIME']
+    lifetime = expires.total_seconds() \
+        if isinstance(expires, timedelta) else expires
+    now = time.time()
+    expired = redis.zrangebyscore(EXPIRY_KEY, '-inf', now)
+    _forget([key for key in expired if key != cache_key])
+    with redis.pipeline() as pipeline:
+        while True:
+            try:
+                # the transaction fails if another process changes the sizes
+                # in between, so the size of a result is never counted twice
+                pipeline.watch(SIZE_KEY)
+                previous = pipeline.hget(SIZE_KEY, cache_key)
+                pipeline.multi()
+                pipeline.setex(name=_result_key(cache_key), value=result,
+                               time=expires)
+                pipeline.zadd(ACCESS_KEY, now, cache_key)
+                pipeline.zadd(EXPIRY_KEY, now + lifetime, cache_key)
+                pipeline.hset(SIZE_KEY, cache_key, size)
+                pipeline.incr(TOTAL_KEY, size - int(previous or 0))
+                total = pipeline.execute()[-1]
+                break
+            except WatchError:
+                continue
+    if total > max_bytes:
+        evict(max_bytes)
+
+
+def _forget(cache_keys: List[str]) -> int:
+    """Remove the given results and their entries in the indexes.
+    :param cache_keys: The keys of the results.
+    :return: The size of the remaining results.
+    """
+    if not cache_keys:
+        return int(redis.get(TOTAL_KEY) or 0)
+    with redis.pipeline() as pipeline:
+        while True:
+            try:
+                # see put()
+                pipeline.watch(SIZE_KEY)
+                sizes = pipeline.hmget(SIZE_KEY, cache_keys)
+                pipeline.multi()
+                pipeline.delete(*[_result_key(cache_key)
+                                  for cache_key in cache_keys])
+                pipeline.zrem(ACCESS_KEY, *cache_keys)
+                pipeline.zrem(EXPIRY_KEY, *cache_keys)
+                pipeline.hdel(SIZE_KEY, *cache_keys)
+                pipeline.incr(TOTAL_KEY,
+                              -sum(int(size or 0) for size in sizes))
+                return pipeline.execute()[-1]
+            except WatchError:
+                continue
+
+
+def evict(max_bytes: int) -> int:
+    """Remove the least recently used results until the remaining ones do not
+    exceed the given size.
+    :param max_bytes: The size in bytes the cache must fit into.
+    :return: The number of removed results.
+    """
+    evictions = 0
+    total = int(redis.get(TOTAL_KEY) or 0)
+    while total > max_bytes:
+        oldest = redis.zrange(ACCESS_KEY, 0, EVICTION_BATCH - 1)
+        if not oldest:
+            # nothing is left that could be counted
+            redis.set(TOTAL_KEY, 0)
+            break
+        sizes = redis.hmget(SIZE_KEY, oldest)
+        victims = []
+        for cache_key, size in zip(oldest, sizes):
+            if total <= max_bytes:
+                break
+            victims.append(cache_key)
+            total -= int(size or 0)
+        total = _forget(victims)
+        evictions += len(victims)
+    if evictions:
+        logger.debug("Evicted {} results from the result "
+                     "cache.".format(evictions))
+    return evictions
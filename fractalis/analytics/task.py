@@ -1,17 +1,28 @@
 """This module provides AnalyticTask, which is a modification of a standard
 Celery task tailored to Fractalis."""
 import abc
+import os
 import json
 import re
 import logging
+from copy import deepcopy
 from uuid import UUID
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Union
 
-from pandas import read_pickle, DataFrame
+from pandas import DataFrame
 from celery import Task
 from Cryptodome.Cipher import AES
 
 from fractalis import redis, app
+from fractalis.analytics import resultcache
+from fractalis.analytics.framecache import frame_cache
+from fractalis.data.cache import CacheFormat, read_cache
+from fractalis.data.encryption import MAGIC, decrypt_file, \
+    is_encrypted_container
+from fractalis.data import quota
+from fractalis.data.matrix import has_matrix, pivot_array, read_matrix
+from fractalis.data.summary import compute_summary, get_summary_path
 from fractalis.utils import get_cache_encrypt_key
 
 logger = logging.getLogger(__name__)
@@ -28,6 +39,21 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
         """The name of the task."""
         pass
 
+    # Arguments whose data task ids are passed to main() as 'feature x id'
+    # matrices instead of data frames in the Fractalis long format.
+    matrix_args = []  # type: List[str]
+    # Arguments whose data task ids are passed to main() as per-feature
+    # summary statistics (see fractalis.data.summary) instead of the data.
+    summary_args = []  # type: List[str]
+    # Arguments whose data task ids are passed to main() as usual and, in
+    # addition, as '<argument>_summaries' with the summaries written by the
+    # ETL. Summaries that cannot be used as they are, e.g. because the data
+    # are encrypted or filtered by id, are passed as None.
+    extra_summary_args = []  # type: List[str]
+    # Key of FRACTALIS_TASK_QUEUES. Analyses taking minutes rather than
+    # seconds should use 'statistics' to not delay interactive ones.
+    task_class = 'analytics'
+
     @staticmethod
     def factory(task_name: str) -> 'AnalyticTask':
         """Initialize the correct task based on the given arguments.
@@ -49,12 +75,23 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
         pass
 
     @staticmethod
-    def secure_load(file_path: str) -> DataFrame:
+    def secure_load(file_path: str, filters: dict = None) -> DataFrame:
         """Decrypt data so they can be loaded into a pandas data frame.
         :param file_path: The location of the encrypted file.
+        :param filters: Hint for cache formats that can skip data that do not
+        match the filters.
         :return: The decrypted file loaded into a pandas data frame.
         """
         key = get_cache_encrypt_key(app.config['SECRET_KEY'])
+        with open(file_path, 'rb') as f:
+            header = f.read(len(MAGIC))
+        if is_encrypted_container(header):
+            data = decrypt_file(
+                file_path=file_path, key=key,
+                threads=app.config['FRACTALIS_DECRYPT_THREADS'])
+            return CacheFormat.from_header(data[:16]).deserialize(
+                data, filters=filters)
+        # files written before the introduction of the chunked container
         with open(file_path, 'rb') as f:
             nonce, tag, ciphertext = [f.read(x) for x in (16, 16, -1)]
         cipher = AES.new(key, AES.MODE_EAX, nonce)
@@ -64,17 +101,15 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
         df = DataFrame.from_dict(data)
         return df
 
-    def data_task_id_to_data_frame(
-            self, data_task_id: str,
-            session_data_tasks: List[str], decrypt: bool) -> DataFrame:
-        """Attempts to load the data frame associated with the provided data id
+    def get_data_state(self, data_task_id: str,
+                       session_data_tasks: List[str]) -> dict:
+        """Return the data state associated with the provided data id after
+        verifying that the data can be used by the requesting session.
         :param data_task_id: The data id associated with the previously loaded
         data.
         :param session_data_tasks: A list of data tasks previously executed by
         this the requesting session. This is used for permission checks.
-        :param decrypt: Specify whether the data have to be decrypted for usage
-        only part of the data, for instance some genes out of thousands.
-        :return: A pandas data frame associated with the data id.
+        :return: The data state stored in Redis.
         """
         if data_task_id not in session_data_tasks:
             error = "No permission to use data_task_id '{}' " \
@@ -95,13 +130,100 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
                     "analysis task.".format(data_task_id)
             logger.error(error)
             raise ValueError(error)
+        quota.touch(data_task_id)
+        return data_state
+
+    def data_task_id_to_data_frame(
+            self, data_task_id: str, session_data_tasks: List[str],
+            decrypt: bool, filters: dict = None) -> DataFrame:
+        """Attempts to load the data frame associated with the provided data id
+        :param data_task_id: The data id associated with the previously loaded
+        data.
+        :param session_data_tasks: A list of data tasks previously executed by
+        this the requesting session. This is used for permission checks.
+        :param decrypt: Specify whether the data have to be decrypted for usage
+        only part of the data, for instance some genes out of thousands.
+        :param filters: If given only the parts of the cache that can match
+        these filters are read. The result still has to be filtered and is
+        not added to the worker cache.
+        :return: A pandas data frame associated with the data id.
+        """
+        data_state = self.get_data_state(data_task_id, session_data_tasks)
         file_path = data_state['file_path']
+        df = frame_cache.get(data_task_id, file_path)
+        if df is not None:
+            logger.debug("Data task '{}' loaded from worker "
+                         "cache.".format(data_task_id))
+            return df
         if decrypt:
-            return self.secure_load(file_path)
+            df = self.secure_load(file_path, filters=filters)
         else:
-            df = read_pickle(file_path, compression='gzip')
+            df = read_cache(file_path, filters=filters)
+        if not filters:
+            frame_cache.put(data_task_id, file_path, df)
         return df
 
+    def data_task_id_to_matrix(
+            self, data_task_id: str, session_data_tasks: List[str],
+            decrypt: bool, filters: Union[dict, None]) -> DataFrame:
+        """Attempts to load the data associated with the provided data id as
+        a 'feature x id' matrix. If a memory-mapped matrix has been written by
+        the ETL it is used directly, otherwise the data frame is pivoted.
+        :param data_task_id: The data id associated with the previously loaded
+        data.
+        :param session_data_tasks: A list of data tasks previously executed by
+        this the requesting session. This is used for permission checks.
+        :param decrypt: Specify whether the data have to be decrypted.
+        :param filters: The filters parsed from the argument value.
+        :return: DataFrame with features as index and ids as columns.
+        """
+        data_state = self.get_data_state(data_task_id, session_data_tasks)
+        file_path = data_state['file_path']
+        filters = filters or {}
+        if not decrypt and has_matrix(file_path) and \
+                set(filters) <= {'feature', 'id'}:
+            return read_matrix(file_path,
+                               features=filters.get('feature'),
+                               ids=filters.get('id'))
+        df = self.data_task_id_to_data_frame(
+            data_task_id, session_data_tasks, decrypt, filters)
+        if filters:
+            df = self.apply_filters(df, filters)
+        return pivot_array(df)
+
+    def data_task_id_to_summary(
+            self, data_task_id: str, session_data_tasks: List[str],
+            decrypt: bool, filters: Union[dict, None],
+            compute: bool = True) -> Union[DataFrame, None]:
+        """Attempts to load the per-feature summary statistics of the data
+        associated with the provided data id. If the ETL has written a summary
+        it is used directly, otherwise it is computed from the data frame.
+        :param data_task_id: The data id associated with the previously loaded
+        data.
+        :param session_data_tasks: A list of data tasks previously executed by
+        this the requesting session. This is used for permission checks.
+        :param decrypt: Specify whether the data have to be decrypted.
+        :param filters: The filters parsed from the argument value.
+        :param compute: Whether to compute the summary if the one written by
+        the ETL cannot be used.
+        :return: DataFrame with one row of statistics per feature or None.
+        """
+        data_state = self.get_data_state(data_task_id, session_data_tasks)
+        summary_path = get_summary_path(data_state['file_path'])
+        filters = {key: value for key, value in (filters or {}).items()
+                   if value}
+        # summaries cannot be filtered by anything but feature
+        if not decrypt and os.path.exists(summary_path) and \
+                set(filters) <= {'feature'}:
+            summary = read_cache(summary_path, filters=filters)
+            return self.apply_filters(summary, filters)
+        if not compute:
+            return None
+        df = self.data_task_id_to_data_frame(
+            data_task_id, session_data_tasks, decrypt, filters)
+        df = self.apply_filters(df, filters)
+        return compute_summary(df)
+
     @staticmethod
     def apply_filters(df: DataFrame, filters: dict) -> DataFrame:
         """Apply filter to data frame and return it.
@@ -152,46 +274,152 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
             data_task_id = None
         return data_task_id, filters
 
+    def load_value(self, value: str, session_data_tasks: List[str],
+                   decrypt: bool, as_matrix: bool,
+                   as_summary: bool = False) -> DataFrame:
+        """Load the data referenced by a single data task id argument.
+        :param value: A string that contains a data task id.
+        :param session_data_tasks: We use this list to check access.
+        :param decrypt: Indicates whether cache must be decrypted to be used.
+        :param as_matrix: Load the data as 'feature x id' matrix.
+        :param as_summary: Load the per-feature summary of the data.
+        :return: The loaded and filtered data.
+        """
+        data_task_id, filters = self.parse_value(value)
+        if as_summary:
+            return self.data_task_id_to_summary(
+                data_task_id, session_data_tasks, decrypt, filters)
+        if as_matrix:
+            return self.data_task_id_to_matrix(
+                data_task_id, session_data_tasks, decrypt, filters)
+        df = self.data_task_id_to_data_frame(
+            data_task_id, session_data_tasks, decrypt, filters)
+        if filters:
+            df = self.apply_filters(df, filters)
+        return df
+
     def prepare_args(self, session_data_tasks: List[str],
                      args: dict, decrypt: bool) -> dict:
         """Replace data task ids in the arguments with their associated
         data frame located on the file system. This currently works for non
-        nested strings and non nested lists containing strings.
+        nested strings and non nested lists containing strings. Arguments
+        listed in matrix_args are replaced by 'feature x id' matrices and
+        arguments listed in summary_args by per-feature summaries instead.
+        Arguments listed in extra_summary_args get an additional argument
+        with their summaries.
+        The data are loaded by up to FRACTALIS_LOAD_THREADS threads.
         :param session_data_tasks: We use this list to check access.
         :param args: The arguments submitted to run().
         :param decrypt: Indicates whether cache must be decrypted to be used.
         :return: The new parsed arguments
         """
         parsed_args = {}
+        # (arg, position in list or None, value) of every data id
+        references = []
         for arg in args:
             value = args[arg]
 
             # value is data id
             if self.contains_data_task_id(value):
-                data_task_id, filters = self.parse_value(value)
-                df = self.data_task_id_to_data_frame(
-                    data_task_id, session_data_tasks, decrypt)
-                if filters:
-                    df = self.apply_filters(df, filters)
-                value = df
+                references.append((arg, None, value))
 
             # value is list containing data ids
-            if (isinstance(value, list) and
+            elif (isinstance(value, list) and
                     value and self.contains_data_task_id(value[0])):
-                dfs = []
-                for el in value:
-                    data_task_id, filters = self.parse_value(el)
-                    df = self.data_task_id_to_data_frame(
-                        data_task_id, session_data_tasks, decrypt)
-                    if filters:
-                        df = self.apply_filters(df, filters)
-                    dfs.append(df)
-                value = dfs
+                references += [(arg, i, el) for i, el in enumerate(value)]
+                value = [None] * len(value)
 
             parsed_args[arg] = value
 
+        summaries_of = {}
+        for arg in self.extra_summary_args:
+            summary_arg = '{}_summaries'.format(arg)
+            summaries_of[summary_arg] = arg
+            parsed_args[summary_arg] = deepcopy(parsed_args.get(arg))
+        references += [('{}_summaries'.format(arg), i, value)
+                       for arg, i, value in references
+                       if arg in self.extra_summary_args]
+
+        def load(reference: Tuple[str, Union[int, None], str]) -> DataFrame:
+            arg, _, value = reference
+            if arg in summaries_of:
+                data_task_id, filters = self.parse_value(value)
+                return self.data_task_id_to_summary(
+                    data_task_id, session_data_tasks, decrypt, filters,
+                    compute=False)
+            return self.load_value(value, session_data_tasks, decrypt,
+                                   as_matrix=arg in self.matrix_args,
+                                   as_summary=arg in self.summary_args)
+
+        threads = min(app.config['FRACTALIS_LOAD_THREADS'], len(references))
+        if threads > 1:
+            # reading and decompressing the files releases the GIL
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                loaded = list(executor.map(load, references))
+        else:
+            loaded = [load(reference) for reference in references]
+
+        for (arg, i, _), data in zip(references, loaded):
+            if i is None:
+                parsed_args[arg] = data
+            else:
+                parsed_args[arg][i] = data
+
         return parsed_args
 
+    def canonicalize_value(self, value: str, session_data_tasks: List[str]
+                           ) -> Union[dict, None]:
+        """Replace the data task id of a data argument by the content digest
+        of its data, so the same data loaded by different tasks are equal.
+        :param value: A string that contains a data task id.
+        :param session_data_tasks: We use this list to check access.
+        :return: Dict of digest and filters or None if the data have no
+        digest.
+        """
+        data_task_id, filters = self.parse_value(value)
+        data_state = self.get_data_state(data_task_id, session_data_tasks)
+        if not data_state.get('blob'):
+            return None
+        # filters are applied with isin(), so their order does not matter
+        filters = {key: sorted(values, key=str)
+                   for key, values in (filters or {}).items() if values}
+        return {'blob': data_state['blob'], 'filters': filters}
+
+    def get_cache_key(self, session_data_tasks: List[str],
+                      args: dict, decrypt: bool) -> Union[str, None]:
+        """Compute the key of the result of this task for the given arguments
+        (see fractalis.analytics.resultcache). Only results of tasks that use
+        data can be cached.
+        :param session_data_tasks: We use this list to check access.
+        :param args: The arguments submitted to run().
+        :param decrypt: Indicates whether cache must be decrypted to be used.
+        :return: The key or None if the result cannot be cached.
+        """
+        canonical_args = {}
+        uses_data = False
+        try:
+            for arg in args:
+                value = args[arg]
+                if self.contains_data_task_id(value):
+                    value = self.canonicalize_value(value, session_data_tasks)
+                    if value is None:
+                        return None
+                    uses_data = True
+                if (isinstance(value, list) and
+                        value and self.contains_data_task_id(value[0])):
+                    value = [self.canonicalize_value(el, session_data_tasks)
+                             for el in value]
+                    if None in value:
+                        return None
+                    uses_data = True
+                canonical_args[arg] = value
+        except (PermissionError, LookupError, ValueError):
+            # the task reports these errors when it is run
+            return None
+        if not uses_data:
+            return None
+        return resultcache.make_cache_key(self.name, canonical_args, decrypt)
+
     @staticmethod
     def task_result_to_json(result: dict) -> str:
         """Transform task result to JSON so we can send it as a response.
@@ -219,16 +447,20 @@ class AnalyticTask(Task, metaclass=abc.ABCMeta):
                      time=app.config['FRACTALIS_RESULT_LIFETIME'])
 
     def run(self, session_data_tasks: List[str],
-            args: dict, decrypt: bool) -> str:
+            args: dict, decrypt: bool, cache_key: str = None) -> str:
         """This is called by the celery worker. This method calls other helper
         methods to prepare and validate the in and output of a task.
         :param session_data_tasks: List of data task ids from session to check
         access.
         :param args: The dict of arguments submitted to the task.
         :param decrypt: Indicates whether cache must be decrypted to be used.
+        :param cache_key: The key to add the result to the result cache with.
         :return: The result of the task.
         """
         arguments = self.prepare_args(session_data_tasks, args, decrypt)
+        logger.debug("Worker cache stats: {}".format(frame_cache.stats()))
         result = self.main(**arguments)
         json = self.task_result_to_json(result)
+        if cache_key is not None:
+            resultcache.put(cache_key, json)
         return json
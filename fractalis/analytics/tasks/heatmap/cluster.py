@@ -17,6 +17,7 @@ logger = logging.getLogger(__name__)
 class ClusteringTask(AnalyticTask):
 
     name = 'compute-cluster'
+    task_class = 'statistics'
 
     def main(self, df: dict, cluster_algo: str,
              options: dict) -> dict:
@@ -1,7 +1,6 @@
 """Module containing analysis code for heatmap analytics."""
 
 from typing import List, TypeVar
-from functools import reduce
 import logging
 
 import pandas as pd
@@ -19,6 +18,9 @@ class HeatmapTask(AnalyticTask):
     submittable celery task."""
 
     name = 'compute-heatmap'
+    matrix_args = ['numerical_arrays']
+    extra_summary_args = ['numerical_arrays']
+    task_class = 'statistics'
 
     def main(self, numerical_arrays: List[pd.DataFrame],
              numericals: List[pd.DataFrame],
@@ -27,20 +29,24 @@ class HeatmapTask(AnalyticTask):
              params: dict,
              id_filter: List[T],
              max_rows: int,
-             subsets: List[List[T]]) -> dict:
-        # merge input data into single df
-        df = reduce(lambda a, b: a.append(b), numerical_arrays)
+             subsets: List[List[T]],
+             numerical_arrays_summaries: List[pd.DataFrame] = None) -> dict:
+        # merge input data into single matrix
+        df = utils.merge_arrays(numerical_arrays)
+        n_ids = df.shape[1]
         if not subsets:
             # empty subsets equals all samples in one subset
-            subsets = [df['id'].unique().tolist()]
+            subsets = [df.columns.tolist()]
         else:
-            # if subsets are defined we drop the rows that are not part of one
+            # if subsets are defined we drop the ids that are not part of one
             flattened_subsets = [x for subset in subsets for x in subset]
-            df = df[df['id'].isin(flattened_subsets)]
+            df = utils.select_ids(df=df, ids=flattened_subsets)
         # apply id filter
-        df = utils.apply_id_filter(df=df, id_filter=id_filter)
+        if id_filter:
+            df = utils.select_ids(df=df, ids=id_filter)
         # drop subset ids that are not in the df
-        subsets = utils.drop_unused_subset_ids(df=df, subsets=subsets)
+        subsets = [[x for x in subset if x in df.columns]
+                   for subset in subsets]
         # make sure the input data are still valid after the pre-processing
         if df.shape[0] < 1:
             error = "Either the input data set is too small or " \
@@ -48,32 +54,34 @@ class HeatmapTask(AnalyticTask):
             logger.error(error)
             raise ValueError(error)
 
-        # make matrix of input data
-        df = df.pivot(index='feature', columns='id', values='value')
-
-        # create z-score matrix used for visualising the heatmap
-        z_df = [(df.iloc[i] - df.iloc[i].mean()) / df.iloc[i].std(ddof=0)
-                for i in range(df.shape[0])]
-        z_df = pd.DataFrame(z_df, columns=df.columns, index=df.index)
-
         method = 'limma'
         if ranking_method in ['mean', 'median', 'variance']:
             method = ranking_method
-        # compute statistic for ranking
-        stats = array_stats.get_stats(df=df, subsets=subsets,
-                                      params=params,
-                                      ranking_method=method)
+        # compute statistic for ranking. The summaries are only valid as long
+        # as no id has been dropped.
+        summaries = numerical_arrays_summaries or []
+        if method != 'limma' and summaries and df.shape[1] == n_ids and \
+                all(summary is not None for summary in summaries):
+            stats = array_stats.get_summary_stats(df=df, summaries=summaries,
+                                                  ranking_method=method)
+        else:
+            stats = array_stats.get_stats(df=df, subsets=subsets,
+                                          params=params,
+                                          ranking_method=method)
 
         # sort by ranking_value
         self.sort(df, stats[ranking_method], ranking_method)
-        self.sort(z_df, stats[ranking_method], ranking_method)
         self.sort(stats, stats[ranking_method], ranking_method)
 
         # discard rows according to max_rows
         df = df[:max_rows]
-        z_df = z_df[:max_rows]
         stats = stats[:max_rows]
 
+        # create z-score matrix used for visualising the heatmap
+        z_df = [(df.iloc[i] - df.iloc[i].mean()) / df.iloc[i].std(ddof=0)
+                for i in range(df.shape[0])]
+        z_df = pd.DataFrame(z_df, columns=df.columns, index=df.index)
+
         # prepare output for front-end
         df['feature'] = df.index
         z_df['feature'] = z_df.index
@@ -1,7 +1,6 @@
 """Module containing analysis code for pca."""
 
 from typing import List, TypeVar
-from functools import reduce
 import logging
 
 import pandas as pd
@@ -22,6 +21,7 @@ class PCATask(AnalyticTask):
     submittable celery task."""
 
     name = 'compute-pca'
+    matrix_args = ['features']
 
     def main(self,
              features: List[pd.DataFrame],
@@ -29,18 +29,17 @@ class PCATask(AnalyticTask):
              whiten: bool,
              id_filter: List[T],
              subsets: List[List[T]]) -> dict:
-        # merge input data into single df
-        df = reduce(lambda a, b: a.append(b), features)
+        # merge input data into single matrix
+        df = utils.merge_arrays(features)
 
         # apply id filter
-        df = utils.apply_id_filter(df=df, id_filter=id_filter)
+        if id_filter:
+            df = utils.select_ids(df=df, ids=id_filter)
 
         if not subsets:
             # empty subsets equals all samples in one subset
-            subsets = [df['id'].unique().tolist()]
+            subsets = [df.columns.tolist()]
 
-        # make matrix of data
-        df = df.pivot(index='feature', columns='id', values='value')
         df = df.T
         feature_labels = list(df)
 
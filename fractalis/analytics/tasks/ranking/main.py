@@ -0,0 +1,51 @@
+"""Module containing analysis code for feature ranking analytics."""
+
+import logging
+from typing import List
+
+import pandas as pd
+
+from fractalis.analytics.task import AnalyticTask
+from fractalis.data.summary import QUANTILES, SUMMARY_COLUMNS, \
+    merge_summaries
+
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureRankingTask(AnalyticTask):
+    """Feature Ranking Task implementing AnalyticsTask. Ranks the features of
+    numerical arrays by the summary statistics computed when the data were
+    loaded, so the data themselves do not have to be read. This class is a
+    submittable celery task."""
+
+    name = 'compute-feature-ranking'
+    summary_args = ['numerical_arrays']
+
+    def main(self, numerical_arrays: List[pd.DataFrame],
+             ranking_method: str, max_rows: int) -> dict:
+        """Rank features in descending order of the given statistic.
+        Quantiles of features present in more than one array are unknown, so
+        such arrays cannot be ranked by quantiles.
+        :param numerical_arrays: Summaries of the numerical arrays.
+        :param ranking_method: The statistic to rank by, e.g. 'variance'.
+        :param max_rows: The maximum number of features to return.
+        :return: The summary statistics of the top ranked features.
+        """
+        if ranking_method not in SUMMARY_COLUMNS[1:]:
+            error = "Ranking method unknown: {}".format(ranking_method)
+            logger.error(error)
+            raise ValueError(error)
+        stats = merge_summaries(numerical_arrays)
+        quantiles = [column for _, column in QUANTILES]
+        if ranking_method in quantiles and \
+                stats[ranking_method].isnull().any():
+            error = "Cannot rank by {} because some features are present " \
+                    "in more than one array.".format(ranking_method)
+            logger.error(error)
+            raise ValueError(error)
+        stats = stats.sort_values(ranking_method, ascending=False)
+        stats = stats[:max_rows]
+        return {
+            'stats': stats.to_dict(orient='list')
+        }
@@ -11,6 +11,8 @@ from rpy2 import robjects as robj
 from rpy2.robjects import r, pandas2ri
 from rpy2.robjects.packages import importr
 
+from fractalis.data.summary import merge_summaries
+
 
 T = TypeVar('T')
 importr('limma')
@@ -59,6 +61,33 @@ def get_variance_stats(df: pd.DataFrame) -> pd.DataFrame:
     return stats
 
 
+def get_summary_stats(df: pd.DataFrame, summaries: List[pd.DataFrame],
+                      ranking_method: str) -> pd.DataFrame:
+    """Take the mean, median or variance of every feature from the summaries
+    written when the data were loaded instead of computing them from the
+    matrix. Values the summaries cannot provide exactly, e.g. medians of
+    features present in more than one array, are computed from the matrix.
+    :param df: Matrix of all values the summaries have been computed from.
+    :param summaries: The summaries of the arrays the matrix was merged from.
+    :param ranking_method: Either 'mean', 'median' or 'variance'.
+    :return: The same statistics as get_stats().
+    """
+    summary = merge_summaries(summaries).set_index('feature')
+    summary = summary.reindex(df.index)
+    values = summary[ranking_method].values.copy()
+    if ranking_method == 'median':
+        # np.median() is NaN for features with missing values
+        values[(summary['count'] != df.shape[1]).values] = np.nan
+    missing = np.isnan(values)
+    if missing.any():
+        stats = get_stats(df=df[missing], subsets=[], params={},
+                          ranking_method=ranking_method)
+        values[missing] = stats[ranking_method].values
+    stats = pd.DataFrame(values, index=df.index, columns=[ranking_method])
+    stats['feature'] = df.index
+    return stats
+
+
 def get_limma_stats(df: pd.DataFrame, subsets: List[List[T]]) -> pd.DataFrame:
     """Use the R bioconductor package 'limma' to perform a differential
     gene expression analysis on the given data frame.
@@ -8,6 +8,8 @@ from copy import deepcopy
 import pandas as pd
 import numpy as np
 
+from fractalis.data.matrix import pivot_array
+
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +25,17 @@ def apply_subsets(df: pd.DataFrame,
     """
     if not subsets:
         subsets = [df['id']]
-    _df = pd.DataFrame()
+    df_subsets = []
     for i, subset in enumerate(subsets):
         df_subset = df[df['id'].isin(subset)]
         if not df_subset.shape[0]:
             continue
         subset_col = [i] * df_subset.shape[0]
-        df_subset = df_subset.assign(subset=subset_col)
-        _df = _df.append(df_subset)
-    if _df.shape[0] == 0:
+        df_subsets.append(df_subset.assign(subset=subset_col))
+    if not df_subsets:
         raise ValueError("No data match given subsets.")
-    return _df
+    # concatenating all at once keeps 'category' columns intact
+    return pd.concat(df_subsets)
 
 
 def apply_categories(df: pd.DataFrame,
@@ -84,6 +86,50 @@ def apply_id_filter(df: pd.DataFrame, id_filter: List[str]) -> pd.DataFrame:
     return df
 
 
+def merge_arrays(arrays: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge the given arrays into a single 'feature x id' matrix. Arrays can
+    either be matrices already or data frames in the Fractalis long format,
+    which are pivoted first. Like pivoting the concatenated data, this
+    raises if several arrays contain a value for the same feature and id.
+    :param arrays: List of matrices or data frames in the Fractalis format.
+    :return: Matrix with features as index and ids as columns.
+    """
+    matrices = [df if df.index.name == 'feature' else pivot_array(df)
+                for df in arrays]
+
+    def merge(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+        features = a.index.intersection(b.index)
+        ids = a.columns.intersection(b.columns)
+        if len(features) and len(ids):
+            overlap = a.loc[features, ids].notnull() & \
+                b.loc[features, ids].notnull()
+            if overlap.values.any():
+                feature, id_ = overlap.stack()[lambda x: x].index[0]
+                error = "The arrays contain more than one value for " \
+                        "feature '{}' and id '{}'.".format(feature, id_)
+                logger.error(error)
+                raise ValueError(error)
+        return a.combine_first(b)
+
+    return reduce(merge, matrices)
+
+
+def select_ids(df: pd.DataFrame, ids: List[str]) -> pd.DataFrame:
+    """Keep only the columns of the matrix that are in ids and drop features
+    that have no value for any of the remaining ids.
+    :param df: Matrix with features as index and ids as columns.
+    :param ids: List of ids to keep.
+    :return: The reduced matrix.
+    """
+    keep = df.columns.isin(ids)
+    if not keep.all():
+        df = df.loc[:, keep]
+    has_values = df.notnull().any(axis=1)
+    if not has_values.all():
+        df = df[has_values]
+    return df
+
+
 def drop_unused_subset_ids(df: pd.DataFrame,
                            subsets: List[List[str]]) -> List[List[str]]:
     """Drop subset ids that are not present in the given data
@@ -91,7 +137,7 @@ def drop_unused_subset_ids(df: pd.DataFrame,
     :param subsets: Subset groups specified by the user.
     :return: Modified subsets list.
     """
-    ids = df['id'].unique()
+    ids = set(df['id'].unique().tolist())
     _subsets = deepcopy(subsets)
     for subset in _subsets:
         _subset = list(subset)
@@ -2,7 +2,6 @@
 
 import logging
 from typing import List
-from functools import reduce
 
 import pandas as pd
 
@@ -18,6 +17,8 @@ class VolcanoTask(AnalyticTask):
     submittable celery task."""
 
     name = 'compute-volcanoplot'
+    matrix_args = ['numerical_arrays']
+    task_class = 'statistics'
 
     def main(self, numerical_arrays: List[pd.DataFrame],
              id_filter: List[str],
@@ -25,27 +26,27 @@ class VolcanoTask(AnalyticTask):
              params: dict,
              subsets: List[List[str]]) -> dict:
         # TODO: docstring
-        # merge input data into single df
-        df = reduce(lambda a, b: a.append(b), numerical_arrays)
+        # merge input data into single matrix
+        df = utils.merge_arrays(numerical_arrays)
         if not subsets:
             # empty subsets equals all samples in one subset
-            subsets = [df['id'].unique().tolist()]
+            subsets = [df.columns.tolist()]
         else:
-            # if subsets are defined we drop the rows that are not part of one
+            # if subsets are defined we drop the ids that are not part of one
             flattened_subsets = [x for subset in subsets for x in subset]
-            df = df[df['id'].isin(flattened_subsets)]
+            df = utils.select_ids(df=df, ids=flattened_subsets)
         # apply id filter
-        df = utils.apply_id_filter(df=df, id_filter=id_filter)
+        if id_filter:
+            df = utils.select_ids(df=df, ids=id_filter)
         # drop subset ids that are not in the df
-        subsets = utils.drop_unused_subset_ids(df=df, subsets=subsets)
+        subsets = [[x for x in subset if x in df.columns]
+                   for subset in subsets]
         # make sure the input data are still valid after the pre-processing
         if df.shape[0] < 1:
             error = "Either the input data set is too small or " \
                     "the subset sample ids do not match the data."
             logger.error(error)
             raise ValueError(error)
-        # make matrix of input data
-        df = df.pivot(index='feature', columns='id', values='value')
         # compute the stats (p / fC) for the selected ranking method
         stats = array_stats.get_stats(df=df,
                                       subsets=subsets,
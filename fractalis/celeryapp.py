@@ -2,21 +2,29 @@
 Celery instance."""
 
 import logging
+from typing import List, Union
 
 from celery import Celery, current_app
+from celery.backends.base import Backend
 from celery.signals import after_task_publish
 from flask import Flask
+from kombu import Exchange, Queue
 
 from fractalis.utils import list_classes_with_base_class
 
 
 logger = logging.getLogger(__name__)
 
+# Message header of tasks whose 'SUBMITTED' state has been stored beforehand
+STATE_STORED_HEADER = 'fractalis_state_stored'
+
 
 # https://stackoverflow.com/questions/9824172/find-out-whether-celery-task-exists
 @after_task_publish.connect
 def update_submitted_state(sender, headers, **kwargs):
     """Add 'SUBMITTED' state to celery task."""
+    if headers.get(STATE_STORED_HEADER):
+        return
     # the task may not exist if sent using `send_task` which
     # sends tasks by name, so fall back to the default result backend
     # if that is the case.
@@ -27,6 +35,28 @@ def update_submitted_state(sender, headers, **kwargs):
                          state='SUBMITTED')
 
 
+def store_submitted_states(backend: Backend, task_ids: List[str]) -> None:
+    """Store the 'SUBMITTED' state of several tasks before they are
+    published. The states are stored one by one through the backend, which
+    costs one round-trip per task. Publish the tasks with the
+    STATE_STORED_HEADER set afterwards to avoid storing the state again.
+    :param backend: The result backend of the tasks.
+    :param task_ids: The ids of the tasks.
+    """
+    # the backend's own API writes exactly what celery expects to read
+    for task_id in task_ids:
+        backend.store_result(task_id=task_id, result=None, state='SUBMITTED')
+
+
+def route_task(name, args, kwargs, options, task=None,
+               **kw) -> Union[dict, None]:
+    """Route every task to the queue configured in FRACTALIS_TASK_QUEUES for
+    its 'task_class'. Tasks without a class use the default queue."""
+    queues = current_app.conf.get('FRACTALIS_TASK_QUEUES') or {}
+    queue = queues.get(getattr(task, 'task_class', None))
+    return {'queue': queue} if queue else None
+
+
 def make_celery(app: Flask) -> Celery:
     """Create a celery instance which executes its tasks in the application
     context of our service.
@@ -37,6 +67,15 @@ def make_celery(app: Flask) -> Celery:
                     backend=app.config['CELERY_RESULT_BACKEND'],
                     broker=app.config['BROKER_URL'])
     celery.conf.update(app.config)
+    if 'CELERY_ROUTES' not in app.config:
+        celery.conf.update(CELERY_ROUTES=(route_task,))
+    if 'CELERY_QUEUES' not in app.config:
+        # workers started without -Q consume all queues
+        names = set(app.config['FRACTALIS_TASK_QUEUES'].values())
+        names.add(app.config.get('CELERY_DEFAULT_QUEUE', 'celery'))
+        celery.conf.update(CELERY_QUEUES=[
+            Queue(name, Exchange(name), routing_key=name)
+            for name in sorted(names)])
 
     TaskBase = celery.Task
 
@@ -1,12 +1,20 @@
 import os
+import json
+import logging
 
 from fractalis import app, redis, sync, celery
+from fractalis.data import blobstore, quota
+
+
+logger = logging.getLogger(__name__)
 
 
 @celery.task
 def janitor():
     """Ideally this is maintained by a systemd service to cleanup redis and the
-    file system while Fractalis is running.
+    file system while Fractalis is running. If the cache exceeds
+    FRACTALIS_CACHE_QUOTA the least recently used data are evicted.
+    :return: Dict containing the cache size and the number of evictions.
     """
     data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
     if not os.path.exists(data_dir):
@@ -17,14 +25,62 @@ def janitor():
                     if os.path.isfile(os.path.join(data_dir, f))]
     tracked_files = [key.split(':')[1] for key in redis.scan_iter('data:*')]
 
-    # clean cached files
+    # clean cached files (files written next to the cache file share its id)
     for cached_file in cached_files:
-        if cached_file not in tracked_files:
+        if cached_file.split('.')[0] not in tracked_files:
             sync.remove_file(os.path.join(data_dir, cached_file))
 
+    # clean blobs that are not referenced by any tracked data
+    blobstore.prune()
+
     # clean tracked files
     for task_id in tracked_files:
-        path = os.path.join(data_dir, task_id)
+        path = get_file_path(task_id, data_dir)
         async_result = celery.AsyncResult(task_id)
         if async_result.state == 'SUCCESS' and not os.path.exists(path):
             redis.delete('data:{}'.format(task_id))
+
+    # evict least recently used data if the cache exceeds its quota
+    tracked_files = [key.split(':')[1] for key in redis.scan_iter('data:*')]
+    evictions = 0
+    size = quota.get_cache_size(data_dir)
+    max_size = app.config['FRACTALIS_CACHE_QUOTA']
+    if max_size is not None and size > max_size:
+        for task_id in quota.get_least_recently_used(tracked_files):
+            if size <= max_size:
+                break
+            # data that are still being loaded cannot be evicted
+            if celery.AsyncResult(task_id).state != 'SUCCESS':
+                continue
+            path = get_file_path(task_id, data_dir)
+            freed = quota.get_file_size(path)
+            sync.remove_data(task_id)
+            evictions += 1
+            # shared blobs are only removed with their last reference
+            if not os.path.exists(path):
+                size -= freed
+        tracked_files = [key.split(':')[1]
+                         for key in redis.scan_iter('data:*')]
+    quota.prune(tracked_files)
+    stats = quota.record_stats(size=size, evictions=evictions)
+    logger.info("Data cache size: {} bytes. Evicted {} data sets to "
+                "meet the quota of {} bytes.".format(stats['size'],
+                                                     evictions, max_size))
+    return stats
+
+
+def get_file_path(task_id: str, data_dir: str) -> str:
+    """Return the location of the data of the given task. This is a shared
+    blob if the data state points to one.
+    :param task_id: The id associated with a data state.
+    :param data_dir: The directory containing the cache files.
+    :return: The location of the data.
+    """
+    # noinspection PyBroadException
+    try:
+        data_state = json.loads(redis.get('data:{}'.format(task_id)))
+        if data_state.get('blob'):
+            return data_state['file_path']
+    except Exception:
+        pass
+    return os.path.join(data_dir, task_id)
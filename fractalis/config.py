@@ -26,13 +26,62 @@ CELERYD_HIJACK_ROOT_LOGGER = False
 FRACTALIS_TMP_DIR = os.path.abspath(os.path.join(os.sep, 'tmp', 'fractalis'))
 # How long to store files in the cache
 FRACTALIS_DATA_LIFETIME = timedelta(days=6)
+# Maximum size in bytes of the data cache on disk. The janitor evicts the least
+# recently used data once it is exceeded. Set to None to disable it.
+FRACTALIS_CACHE_QUOTA = 50 * 1024 ** 3
 # How long to keep analysis results (beware of high RAM usage)
 FRACTALIS_RESULT_LIFETIME = timedelta(seconds=30)
+# Memory budget in bytes of the analysis results kept in Redis to answer
+# identical analyses of the same data without running them again and how long
+# to keep them. Set the size to 0 to disable it.
+FRACTALIS_RESULT_CACHE_SIZE = 128 * 1024 ** 2
+FRACTALIS_RESULT_CACHE_LIFETIME = timedelta(hours=1)
 # Should the Cache be encrypted? This might impact performance for little gain!
 FRACTALIS_ENCRYPT_CACHE = False
+# Size in bytes of the individually encrypted chunks of an encrypted cache file
+FRACTALIS_ENCRYPT_CHUNK_SIZE = 4 * 1024 ** 2
+# Number of threads used to decrypt a single encrypted cache file
+FRACTALIS_DECRYPT_THREADS = 4
+# Number of threads used by an analytic task to load the data it has been given
+FRACTALIS_LOAD_THREADS = 4
+# Format used to write the cache. One of ['parquet', 'pickle']. Files written
+# in any of these formats can be read regardless of this setting.
+FRACTALIS_CACHE_FORMAT = 'parquet'
+# Memory budget in bytes of the in-process data cache of every worker process.
+# Set to 0 to disable it.
+FRACTALIS_WORKER_CACHE_SIZE = 512 * 1024 ** 2
+# Celery queue of every class of tasks: I/O-bound ETLs, fast interactive
+# analyses and heavy statistics like DESeq2. Workers started without -Q consume
+# all of them, dedicated workers can be started with e.g. '-Q statistics'.
+FRACTALIS_TASK_QUEUES = {
+    'etl': 'etl',
+    'analytics': 'analytics',
+    'statistics': 'statistics'
+}
 # Location of your the log configuration file.
 FRACTALIS_LOG_CONFIG = os.path.join(os.path.dirname(__file__), 'logging.yaml')
 # Whether to verify the certs of https data sources
 ETL_VERIFY_SSL_CERT = False
+# Seconds a token obtained with credentials is reused for other requests.
+# Tokens are refreshed ETL_TOKEN_REFRESH_MARGIN seconds before they expire, if
+# the data source tells when. Set to 0 to log in for every request.
+ETL_TOKEN_CACHE_LIFETIME = 60 * 60
+ETL_TOKEN_REFRESH_MARGIN = 60
+# Minimum seconds between two progress reports of an ETL within the same phase
+ETL_PROGRESS_INTERVAL = 1
+# Maximum number of open connections to a single data source per process
+ETL_HTTP_POOL_SIZE = 10
+# Seconds an idle connection to a data source is kept open for reuse. Set to 0
+# to close connections after every request.
+ETL_HTTP_KEEP_ALIVE = 60
+# Seconds to wait before checking the status of a running query again. The
+# interval doubles with every check up to ETL_POLL_MAX_INTERVAL.
+ETL_POLL_INTERVAL = 1
+ETL_POLL_MAX_INTERVAL = 30
+# Seconds after which a query that is still running is considered failed
+ETL_POLL_TIMEOUT = 60 * 60 * 6
+# Maximum number of descriptors extracted with a single request by ETLs that
+# support batch extraction
+ETL_BATCH_SIZE = 50
 
 # DO NOT MODIFY THIS FILE DIRECTLY
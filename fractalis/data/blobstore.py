@@ -0,0 +1,276 @@
+"""This module provides a content-addressed store for cache files. Data
+that have been loaded by several sessions are stored only once, as a blob
+named after the digest of their content. Every data task referencing a blob is
+recorded in Redis and a blob is removed once it is not referenced anymore.
+Access to the data is still granted per data task id and session.
+
+All changes of the references and files of a blob are made while holding a
+Redis lock of the blob, so a blob can never be removed between a check of
+its references and the addition of a new one."""
+
+import os
+import json
+import hashlib
+import logging
+from glob import glob
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from fractalis import app, redis
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which the lock of a blob is released if its holder died
+LOCK_TIMEOUT = 60
+
+
+def get_blob_dir() -> str:
+    """Return the directory containing all blobs.
+    :return: The blob directory.
+    """
+    return os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data', 'blobs')
+
+
+def get_blob_path(digest: str) -> str:
+    """Return the location of the blob with the given digest.
+    :param digest: The content digest of the blob.
+    :return: The path of the blob.
+    """
+    return os.path.join(get_blob_dir(), digest)
+
+
+def start_content_digest(data_frame: pd.DataFrame, encrypted: bool):
+    """Start a digest of data that are written chunk by chunk. Add every
+    chunk with update_content_digest().
+    :param data_frame: The first chunk. Used for the columns and types.
+    :param encrypted: Whether the data are stored in encrypted form.
+    :return: The sha256 hash object.
+    """
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps({
+        'columns': [str(column) for column in data_frame.columns],
+        'dtypes': [str(dtype) for dtype in data_frame.dtypes],
+        'encrypted': encrypted
+    }).encode('utf-8'))
+    return sha256
+
+
+def _update_buffer(sha256, tag: str, data: bytes) -> None:
+    # every buffer is prefixed by its type and length, so different
+    # sequences of buffers never produce the same input of the hash
+    sha256.update('{}:{}:'.format(tag, len(data)).encode('utf-8'))
+    sha256.update(data)
+
+
+def _update_values(sha256, values) -> None:
+    values = np.asarray(values)
+    if values.dtype.kind in 'biufcmM':
+        _update_buffer(sha256, str(values.dtype),
+                       np.ascontiguousarray(values).tobytes())
+    else:
+        # each value is tagged with its type, e.g. to tell 1 and '1' apart
+        encoded = ['{}:{}'.format(type(value).__name__, value).encode('utf-8')
+                   for value in values.astype(object)]
+        lengths = np.array([len(value) for value in encoded], dtype=np.int64)
+        _update_buffer(sha256, 'object', lengths.tobytes())
+        _update_buffer(sha256, 'object', b''.join(encoded))
+
+
+def update_content_digest(sha256, data_frame: pd.DataFrame) -> None:
+    """Add the values of the given chunk to a digest. The column buffers
+    themselves are hashed, so different data cannot end up with the same
+    digest short of a sha256 collision.
+    :param sha256: The hash object returned by start_content_digest().
+    :param data_frame: The chunk.
+    """
+    if not data_frame.shape[0]:
+        return
+    for column in data_frame.columns:
+        series = data_frame[column]
+        if pd.api.types.is_categorical_dtype(series):
+            _update_values(sha256, series.cat.categories)
+            _update_values(sha256, series.cat.codes.values.astype(np.int64))
+        else:
+            _update_values(sha256, series.values)
+
+
+def content_digest(data_frame: pd.DataFrame, encrypted: bool) -> str:
+    """Compute a digest of the content of a DataFrame. Two DataFrames have
+    the same digest if they contain the same columns and rows in the same
+    order and are stored the same way. Data written chunk by chunk have the
+    same digest only if they have been split into the same chunks.
+    :param data_frame: The data to compute the digest for.
+    :param encrypted: Whether the data are stored in encrypted form.
+    :return: The hex encoded sha256 digest.
+    """
+    sha256 = start_content_digest(data_frame, encrypted)
+    update_content_digest(sha256, data_frame)
+    return sha256.hexdigest()
+
+
+def descriptor_fingerprint(server: str, etl_name: str, descriptor: dict,
+                           encrypted: bool) -> str:
+    """Compute a fingerprint identifying the data a descriptor refers to.
+    :param server: The server the data are loaded from.
+    :param etl_name: The name of the ETL used to load the data.
+    :param descriptor: ETL descriptor.
+    :param encrypted: Whether the data are stored in encrypted form.
+    :return: The hex encoded sha256 fingerprint.
+    """
+    string = json.dumps([server, etl_name, descriptor, encrypted],
+                        sort_keys=True, default=str)
+    return hashlib.sha256(string.encode('utf-8')).hexdigest()
+
+
+def _refs_key(digest: str) -> str:
+    return 'blob:{}'.format(digest)
+
+
+def _meta_key(digest: str) -> str:
+    return 'blob-meta:{}'.format(digest)
+
+
+def _fingerprint_key(fingerprint: str) -> str:
+    return 'fingerprint:{}'.format(fingerprint)
+
+
+def _version_key(fingerprint: str) -> str:
+    return 'fingerprint-version:{}'.format(fingerprint)
+
+
+def _lock(digest: str):
+    return redis.lock('blob-lock:{}'.format(digest), timeout=LOCK_TIMEOUT)
+
+
+def _remove_files(file_path: str) -> None:
+    for path in [file_path] + glob('{}.*'.format(file_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def publish(file_path: str, digest: str, task_id: str, meta: dict,
+            fingerprint: str = None, version: str = None) -> str:
+    """Move a freshly written cache file and all files written next to it
+    into the store. If a blob with the same digest exists already the given
+    files are discarded in favor of it.
+    :param file_path: The location the cache file has been written to.
+    :param digest: The content digest of the data.
+    :param task_id: The data task id referencing the blob.
+    :param meta: Meta information that can be reused with the blob.
+    :param fingerprint: Descriptor fingerprint that produced the data.
+    :param version: Version of the data on the source (see ETL.get_version()).
+    :return: The path of the blob.
+    """
+    blob_path = get_blob_path(digest)
+    os.makedirs(get_blob_dir(), exist_ok=True)
+    with _lock(digest):
+        redis.sadd(_refs_key(digest), task_id)
+        if os.path.exists(blob_path):
+            logger.info("Data of task '{}' are identical to blob '{}'. "
+                        "Discarding copy.".format(task_id, digest))
+            _remove_files(file_path)
+        else:
+            for path in glob('{}.*'.format(file_path)):
+                os.replace(path, blob_path + path[len(file_path):])
+            os.replace(file_path, blob_path)
+        redis.set(_meta_key(digest), json.dumps(meta))
+    if fingerprint is not None:
+        lifetime = app.config['FRACTALIS_DATA_LIFETIME']
+        pipeline = redis.pipeline()
+        pipeline.setex(name=_fingerprint_key(fingerprint), value=digest,
+                       time=lifetime)
+        if version is not None:
+            pipeline.setex(name=_version_key(fingerprint), value=version,
+                           time=lifetime)
+        else:
+            pipeline.delete(_version_key(fingerprint))
+        pipeline.execute()
+    return blob_path
+
+
+def find_blob(fingerprint: str) -> Union[str, None]:
+    """Return the digest of the blob previously loaded for the given
+    descriptor fingerprint if it still exists.
+    :param fingerprint: The descriptor fingerprint.
+    :return: The digest of the blob or None.
+    """
+    digest = redis.get(_fingerprint_key(fingerprint))
+    if digest is None or not os.path.exists(get_blob_path(digest)):
+        return None
+    return digest
+
+
+def find_version(fingerprint: str) -> Union[str, None]:
+    """Return the version of the source data the blob found by find_blob()
+    has been extracted from.
+    :param fingerprint: The descriptor fingerprint.
+    :return: The version or None if it is unknown.
+    """
+    return redis.get(_version_key(fingerprint))
+
+
+def link(digest: str, task_id: str) -> Union[dict, None]:
+    """Add a reference from the given data task to an existing blob.
+    :param digest: The digest of the blob.
+    :param task_id: The data task id referencing the blob.
+    :return: The meta information stored with the blob or None if the blob
+    does not exist anymore.
+    """
+    with _lock(digest):
+        meta = redis.get(_meta_key(digest))
+        if meta is None or not os.path.exists(get_blob_path(digest)):
+            return None
+        redis.sadd(_refs_key(digest), task_id)
+    return json.loads(meta)
+
+
+def release(digest: str, task_id: str) -> None:
+    """Remove the reference of the given data task from a blob and remove the
+    blob if it is not referenced anymore.
+    :param digest: The digest of the blob.
+    :param task_id: The data task id referencing the blob.
+    """
+    with _lock(digest):
+        redis.srem(_refs_key(digest), task_id)
+        if not redis.scard(_refs_key(digest)):
+            _remove(digest)
+
+
+def remove(digest: str) -> None:
+    """Remove the blob and its meta information.
+    :param digest: The digest of the blob.
+    """
+    with _lock(digest):
+        _remove(digest)
+
+
+def _remove(digest: str) -> None:
+    redis.delete(_refs_key(digest), _meta_key(digest))
+    _remove_files(get_blob_path(digest))
+
+
+def prune() -> None:
+    """Drop references of data tasks whose data state does not exist anymore
+    and remove all blobs that are not referenced by any of the remaining
+    ones. The data states are looked up for every blob while holding its
+    lock, so references added in the meantime are never dropped.
+    """
+    blob_dir = get_blob_dir()
+    if not os.path.exists(blob_dir):
+        return
+    digests = {f.split('.')[0] for f in os.listdir(blob_dir)}
+    for digest in digests:
+        with _lock(digest):
+            task_ids = list(redis.smembers(_refs_key(digest)))
+            pipeline = redis.pipeline()
+            for task_id in task_ids:
+                pipeline.exists('data:{}'.format(task_id))
+            for task_id, exists in zip(task_ids, pipeline.execute()):
+                if not exists:
+                    redis.srem(_refs_key(digest), task_id)
+            if not redis.scard(_refs_key(digest)):
+                _remove(digest)
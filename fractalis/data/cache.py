@@ -0,0 +1,177 @@
+"""This module provides an abstract class for the file formats that can be
+used to store data in the analysis cache."""
+
+import abc
+import logging
+from typing import List, Union
+
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWriter(metaclass=abc.ABCMeta):
+    """This is an abstract class for writing a DataFrame to the cache chunk
+    by chunk. Nothing is written to the final location before close()."""
+
+    @abc.abstractmethod
+    def append(self, data_frame: DataFrame) -> None:
+        """Append the rows of the given chunk. All chunks must have the same
+        columns and types.
+        :param data_frame: The chunk to write.
+        """
+        pass
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """Finish writing and move the data to the final location."""
+        pass
+
+    @abc.abstractmethod
+    def abort(self) -> None:
+        """Stop writing and remove everything written so far."""
+        pass
+
+
+class CacheFormat(metaclass=abc.ABCMeta):
+    """This is an abstract class that provides a factory method to create
+    instances of implementations of itself. Every implementation is able to
+    write a DataFrame to the cache and to read it back."""
+
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        """Used to select this format via FRACTALIS_CACHE_FORMAT."""
+        pass
+
+    @property
+    @abc.abstractmethod
+    def magic(self) -> bytes:
+        """The leading bytes that identify a file written in this format."""
+        pass
+
+    @classmethod
+    def can_handle(cls, name: str) -> bool:
+        """Test if this implementation is responsible for the given format.
+        :param name: The name of the format.
+        :return: True if this implementation can handle the format.
+        """
+        return cls.name == name
+
+    @classmethod
+    def can_read(cls, header: bytes) -> bool:
+        """Test if the given file header belongs to this format.
+        :param header: The first bytes of a file in the cache.
+        :return: True if this implementation can read the file.
+        """
+        return header.startswith(cls.magic)
+
+    def can_write(self, data_frame: DataFrame) -> bool:
+        """Test if the given DataFrame can be represented in this format.
+        :param data_frame: The DataFrame to write.
+        :return: True if this implementation can write the DataFrame.
+        """
+        return True
+
+    def open_writer(self, file_path: str) -> Union[CacheWriter, None]:
+        """Open a writer that writes a DataFrame to the given location chunk
+        by chunk.
+        :param file_path: File to write to.
+        :return: The writer or None if this format can only write whole
+        DataFrames.
+        """
+        return None
+
+    @staticmethod
+    def factory(name: str) -> 'CacheFormat':
+        """A factory that returns the format object for the given name.
+        :param name: The name of the format. E.g.: parquet, pickle
+        :return: An instance of CacheFormat
+        """
+        from . import FORMAT_REGISTRY
+        for Format in FORMAT_REGISTRY:
+            if Format.can_handle(name):
+                return Format()
+        error = "No CacheFormat implementation found " \
+                "for format '{}'".format(name)
+        logger.error(error)
+        raise NotImplementedError(error)
+
+    @staticmethod
+    def from_header(header: bytes) -> 'CacheFormat':
+        """Return the format object that is able to read data starting with
+        the given bytes.
+        :param header: The first bytes of the serialized data.
+        :return: An instance of CacheFormat
+        """
+        from . import FORMAT_REGISTRY
+        for Format in FORMAT_REGISTRY:
+            if Format.can_read(bytes(header)):
+                return Format()
+        error = "Could not detect the cache format."
+        logger.error(error)
+        raise ValueError(error)
+
+    @staticmethod
+    def detect(file_path: str) -> 'CacheFormat':
+        """Return the format object that is able to read the given file. This
+        does not depend on the configured format, so caches written with a
+        previous configuration remain readable.
+        :param file_path: The file to inspect.
+        :return: An instance of CacheFormat
+        """
+        with open(file_path, 'rb') as f:
+            header = f.read(16)
+        return CacheFormat.from_header(header)
+
+    @abc.abstractmethod
+    def write(self, data_frame: DataFrame, file_path: str) -> None:
+        """Write the DataFrame to the given location.
+        :param data_frame: The DataFrame to write.
+        :param file_path: File to write to.
+        """
+        pass
+
+    @abc.abstractmethod
+    def read(self, file_path: str, columns: List[str] = None,
+             filters: dict = None) -> DataFrame:
+        """Read a DataFrame from the given location.
+        :param file_path: File to read from.
+        :param columns: Only read these columns. All columns if None.
+        :param filters: Dict of column names and values the caller is going
+        to keep. Formats may use it to skip data that cannot match, but the
+        result can still contain other rows, so callers have to filter again.
+        :return: The DataFrame stored in the file.
+        """
+        pass
+
+    @abc.abstractmethod
+    def serialize(self, data_frame: DataFrame) -> bytes:
+        """Serialize the DataFrame into an in-memory buffer.
+        :param data_frame: The DataFrame to serialize.
+        :return: An object supporting the buffer protocol.
+        """
+        pass
+
+    @abc.abstractmethod
+    def deserialize(self, buffer: bytes, columns: List[str] = None,
+                    filters: dict = None) -> DataFrame:
+        """Deserialize a DataFrame from the given buffer.
+        :param buffer: An object supporting the buffer protocol.
+        :param columns: Only read these columns. All columns if None.
+        :param filters: See read().
+        :return: The DataFrame stored in the buffer.
+        """
+        pass
+
+
+def read_cache(file_path: str, columns: List[str] = None,
+               filters: dict = None) -> DataFrame:
+    """Read the cached DataFrame from the given location regardless of the
+    format it was written in.
+    :param file_path: File to read from.
+    :param columns: Only read these columns. All columns if None.
+    :param filters: Hint for formats that can skip non-matching data.
+    :return: The DataFrame stored in the file.
+    """
+    return CacheFormat.detect(file_path).read(file_path, columns, filters)
@@ -3,6 +3,10 @@ ETLs produce valid fractalis standard data."""
 
 import abc
 import logging
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +14,11 @@ logger = logging.getLogger(__name__)
 class IntegrityCheck(metaclass=abc.ABCMeta):
     """This is an abstract class that provides can be called directly"""
 
+    # columns whose combination must be unique across all chunks of the data
+    unique_columns = []
+    # columns that must contain a single value across all chunks of the data
+    constant_columns = []
+
     @property
     @abc.abstractmethod
     def data_type(self) -> str:
@@ -39,6 +48,18 @@ class IntegrityCheck(metaclass=abc.ABCMeta):
         logger.error(error)
         raise NotImplementedError(error)
 
+    @staticmethod
+    def is_label_column(series: pd.Series) -> bool:
+        """Test if the given column can hold labels such as 'id' or
+        'feature'. These are either plain strings ('object') or dictionary
+        encoded strings ('category' with 'object' categories).
+        :param series: The column to test.
+        :return: True if the column is a valid label column.
+        """
+        if pd.api.types.is_categorical_dtype(series):
+            return series.cat.categories.dtype == np.object
+        return series.dtype == np.object
+
     @abc.abstractmethod
     def check(self, data: object) -> None:
         """Raise if the data have an invalid format. This is okay because
@@ -46,3 +67,44 @@ class IntegrityCheck(metaclass=abc.ABCMeta):
         :param data: The data to check.
         """
         pass
+
+    def check_chunks(
+            self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Check data that are produced chunk by chunk while passing the
+        chunks on. Every non-empty chunk is checked with check(). The
+        constraints spanning several chunks are checked once all chunks have
+        been passed on, so the consumer must not use the data before the
+        iteration has finished without an error.
+        :param chunks: The chunks of the data.
+        :return: The same chunks.
+        """
+        hashes = []
+        constants = {}
+        last_chunk = None
+        for chunk in chunks:
+            if not isinstance(chunk, pd.DataFrame) or chunk.shape[0]:
+                self.check(chunk)
+                for column in self.constant_columns:
+                    value = chunk[column].iloc[0]
+                    if constants.setdefault(column, value) != value:
+                        error = "'{}' column must contain exactly one " \
+                                "unique value for this data " \
+                                "type.".format(column)
+                        logger.error(error)
+                        raise ValueError(error)
+                if self.unique_columns:
+                    hashes.append(pd.util.hash_pandas_object(
+                        chunk[self.unique_columns], index=False).values)
+            last_chunk = chunk
+            yield chunk
+        if not hashes:
+            # let check() decide whether empty data are valid
+            self.check(last_chunk)
+        elif len(hashes) > 1:
+            hashes = np.concatenate(hashes)
+            if len(np.unique(hashes)) != len(hashes):
+                error = "Every combination of {} must be unique.".format(
+                    ', '.join("'{}'".format(column)
+                              for column in self.unique_columns))
+                logger.error(error)
+                raise ValueError(error)
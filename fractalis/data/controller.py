@@ -32,6 +32,13 @@ def create_data_task() -> Tuple[Response, int]:
     etl_handler = ETLHandler.factory(handler=payload['handler'],
                                      server=payload['server'],
                                      auth=payload['auth'])
+    # a cached token is replaced if the server rejects it
+    if etl_handler.has_cached_token() and \
+            etl_handler.verify_access() is False:
+        error = "The server '{}' rejected the given credentials.".format(
+            payload['server'])
+        logger.error(error)
+        return jsonify({'error': error}), 403
     task_ids = etl_handler.handle(descriptors=payload['descriptors'],
                                   data_tasks=session['data_tasks'],
                                   use_existing=False,
@@ -49,7 +56,7 @@ def get_data_state_for_task_id(task_id: str, wait: bool) -> Union[dict, None]:
     :return: Data state that has been stored in Redis.
     """
     async_result = celery.AsyncResult(task_id)
-    if wait and async_result.state == 'SUBMITTED':
+    if wait and async_result.state in ['SUBMITTED', 'RETRY', 'PROGRESS']:
         logger.debug("'wait' was set. Waiting for tasks to finish ...")
         async_result.get(propagate=False)
     value = redis.get('data:{}'.format(task_id))
@@ -57,11 +64,17 @@ def get_data_state_for_task_id(task_id: str, wait: bool) -> Union[dict, None]:
         return None
     data_state = json.loads(value)
     # add additional information to data_state
+    state = async_result.state
     result = async_result.result
+    progress = None
+    if state == 'PROGRESS':
+        # see ETL.report_progress()
+        progress, result = result, None
     if isinstance(result, Exception):  # Exception -> str
         result = "{}: {}".format(type(result).__name__, str(result))
     data_state['etl_message'] = result
-    data_state['etl_state'] = async_result.state
+    data_state['etl_state'] = state
+    data_state['etl_progress'] = progress
     return data_state
 
 
@@ -86,6 +99,7 @@ def get_all_data() -> Tuple[Response, int]:
         # remove internal information from response
         del data_state['file_path']
         del data_state['meta']
+        data_state.pop('blob', None)
         # add additional information to response
         data_states.append(data_state)
         existing_data_tasks.append(task_id)
@@ -155,4 +169,6 @@ def get_meta_information(task_id: UUID) -> Tuple[Response, int]:
         logger.error(error)
         return jsonify({'error': error}), 404
     logger.debug("Successfully gather meta information. Sending response.")
-    return jsonify({'meta': data_state['meta']}), 200
+    return jsonify({'meta': data_state['meta'],
+                    'etl_state': data_state['etl_state'],
+                    'etl_progress': data_state['etl_progress']}), 200
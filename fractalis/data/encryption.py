@@ -0,0 +1,105 @@
+"""This module provides a chunked container for encrypted cache files.
+
+The plaintext is split into chunks of equal size, each of which is encrypted
+and authenticated individually with AES-GCM. Because the position of every
+chunk can be computed from the header, chunks can be decrypted one at a time
+and in parallel, directly into a single pre-allocated output buffer.
+
+Layout: MAGIC | nonce prefix (8) | chunk size (4) | plaintext size (8)
+followed by (ciphertext | tag (16)) for every chunk. The header is
+authenticated as part of every chunk and the chunk index is part of its nonce,
+so truncated, reordered or otherwise modified files are rejected.
+"""
+
+import os
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from Cryptodome.Cipher import AES
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FRCENC01'
+HEADER = struct.Struct('>8s8sIQ')
+TAG_SIZE = 16
+
+
+def is_encrypted_container(header: bytes) -> bool:
+    """Test if the given file header belongs to an encrypted container.
+    :param header: The first bytes of a file in the cache.
+    :return: True if the file is a chunked encrypted container.
+    """
+    return header.startswith(MAGIC)
+
+
+def _make_cipher(key: bytes, prefix: bytes, index: int, header: bytes):
+    nonce = prefix + struct.pack('>I', index)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+    cipher.update(header)
+    return cipher
+
+
+def encrypt_to_file(data: bytes, file_path: str,
+                    key: bytes, chunk_size: int) -> None:
+    """Encrypt the given data chunk by chunk and write them to the file.
+    :param data: Any object supporting the buffer protocol.
+    :param file_path: File to write to.
+    :param key: The AES key.
+    :param chunk_size: Size of the plaintext of every chunk in bytes.
+    """
+    data = memoryview(data).cast('B')
+    prefix = os.urandom(8)
+    header = HEADER.pack(MAGIC, prefix, chunk_size, len(data))
+    with open(file_path, 'wb') as f:
+        f.write(header)
+        for index, start in enumerate(range(0, len(data), chunk_size)):
+            cipher = _make_cipher(key, prefix, index, header)
+            ciphertext, tag = cipher.encrypt_and_digest(
+                data[start:start + chunk_size])
+            f.write(ciphertext)
+            f.write(tag)
+
+
+def decrypt_file(file_path: str, key: bytes, threads: int = 1) -> bytearray:
+    """Decrypt and verify the given container.
+    :param file_path: File to read from.
+    :param key: The AES key.
+    :param threads: Number of threads used to decrypt the chunks.
+    :return: The plaintext.
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(HEADER.size)
+        file_size = os.fstat(f.fileno()).st_size
+    magic, prefix, chunk_size, size = HEADER.unpack(header)
+    if magic != MAGIC:
+        error = "File '{}' is not an encrypted container.".format(file_path)
+        logger.error(error)
+        raise ValueError(error)
+    n_chunks = (size + chunk_size - 1) // chunk_size
+    if file_size != HEADER.size + size + n_chunks * TAG_SIZE:
+        error = "Encrypted container '{}' has an " \
+                "unexpected size.".format(file_path)
+        logger.error(error)
+        raise ValueError(error)
+    output = bytearray(size)
+    target = memoryview(output)
+
+    def decrypt_chunk(index: int) -> None:
+        start = index * chunk_size
+        stop = min(start + chunk_size, size)
+        with open(file_path, 'rb') as chunk_file:
+            chunk_file.seek(HEADER.size + start + index * TAG_SIZE)
+            ciphertext = chunk_file.read(stop - start)
+            tag = chunk_file.read(TAG_SIZE)
+        cipher = _make_cipher(key, prefix, index, header)
+        target[start:stop] = cipher.decrypt_and_verify(ciphertext, tag)
+
+    if threads > 1 and n_chunks > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(decrypt_chunk, range(n_chunks)))
+    else:
+        for index in range(n_chunks):
+            decrypt_chunk(index)
+    target.release()
+    return output
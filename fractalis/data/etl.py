@@ -4,19 +4,48 @@ import abc
 import json
 import logging
 import os
+import pickle
+import time
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Union
 
-from Cryptodome.Cipher import AES
 # noinspection PyProtectedMember
 from celery import Task
-from pandas import DataFrame
+from pandas import DataFrame, concat
 
 from fractalis import app, redis
+from fractalis.data import blobstore, httppool, quota
+from fractalis.data.cache import CacheFormat, CacheWriter
 from fractalis.data.check import IntegrityCheck
+from fractalis.data.encryption import encrypt_to_file, decrypt_file
+from fractalis.data.matrix import write_matrix
+from fractalis.data.summary import compute_cache_summary, \
+    compute_summary, get_summary_path
 from fractalis.utils import get_cache_encrypt_key
 
 logger = logging.getLogger(__name__)
 
 
+def descriptor_key(hash_value: str) -> str:
+    # set of the ids of all data loaded with the same descriptor
+    return 'descriptor:{}'.format(hash_value)
+
+
+class PendingExtraction(Exception):
+    """Raised by ETL.extract() if the data are not ready on the target server
+    yet. Instead of blocking the worker the ETL is scheduled again and
+    extract() can resume from the given checkpoint."""
+
+    def __init__(self, checkpoint: dict, countdown: float):
+        """
+        :param checkpoint: JSON serializable state passed to the next attempt.
+        :param countdown: Seconds to wait before the next attempt.
+        """
+        super().__init__("Data are not ready yet.")
+        self.checkpoint = checkpoint
+        self.countdown = countdown
+
+
 class ETL(Task, metaclass=abc.ABCMeta):
     """This is an abstract class that implements a celery Task and provides a
     factory method to create instances of implementations of itself. Its main
@@ -25,6 +54,13 @@ class ETL(Task, metaclass=abc.ABCMeta):
     named methods can be found in this class.
     """
 
+    # If True extract() returns an iterable of chunks and transform() is
+    # called for every chunk. The chunks are then checked and loaded one by
+    # one, so the data do not have to fit into memory at once.
+    streaming = False
+    # Key of FRACTALIS_TASK_QUEUES. ETLs mostly wait for the network.
+    task_class = 'etl'
+
     @property
     @abc.abstractmethod
     def name(self) -> str:
@@ -112,52 +148,285 @@ class ETL(Task, metaclass=abc.ABCMeta):
             logger.error(error)
             raise RuntimeError(error)
 
-    def update_redis(self, data_frame: DataFrame) -> None:
+    def probe_access(self, server: str, token: str, descriptor: dict) -> bool:
+        """Check whether the given token grants access to the described data
+        without downloading them. If this returns True the data previously
+        loaded by another session are reused instead of extracting them again.
+        Implementations should only return True if the check is reliable.
+        :param server: The server on which the data are located.
+        :param token: The token used for authentication.
+        :param descriptor: Describes the data that we want to download.
+        :return: True if access has been verified.
+        """
+        return False
+
+    def get_version(self, server: str, token: str,
+                    descriptor: dict) -> Union[str, None]:
+        """Return a cheap to compute version of the described data on the
+        server, e.g. an ETag, a modification date or a count of records. Data
+        previously loaded by another session are only reused if the version
+        has not changed since. It is only asked for if such data exist.
+        Implementations must not download the data.
+        :param server: The server on which the data are located.
+        :param token: The token used for authentication.
+        :param descriptor: Describes the data that we want to download.
+        :return: The version or None if the server cannot tell.
+        """
+        return None
+
+    def batch_key(self, descriptor: dict) -> Union[str, None]:
+        """Return a key identifying the descriptors that can be extracted
+        together with the given one by a single call to extract_batch(). ETLs
+        returning the same key must be able to extract each others data.
+        :param descriptor: Describes the data that we want to download.
+        :return: The key or None if the data cannot be extracted in batches.
+        """
+        return None
+
+    def extract_batch(self, server: str, token: str,
+                      descriptors: List[dict]) -> List[object]:
+        """Extract the data of several descriptors at once. Implementations
+        returning a batch_key() should override this to save round-trips.
+        :param server: The server from which to extract from.
+        :param token: The token used for authentication.
+        :param descriptors: The descriptors of the data to download.
+        :return: The raw data of every descriptor in the given order.
+        """
+        return [self.extract(server, token, descriptor)
+                for descriptor in descriptors]
+
+    @staticmethod
+    def stash_raw_data(raw_data: object, file_path: str,
+                       encrypt: bool) -> str:
+        """Write data that have been extracted on behalf of an ETL next to
+        its cache file, so the ETL can continue without extracting them.
+        :param raw_data: The data as returned by extract().
+        :param file_path: The location where the ETL will store its data.
+        :param encrypt: Whether or not the data should be encrypted.
+        :return: The location of the raw data.
+        """
+        raw_data_path = '{}.raw'.format(file_path)
+        os.makedirs(os.path.dirname(raw_data_path), exist_ok=True)
+        data = pickle.dumps(raw_data, protocol=pickle.HIGHEST_PROTOCOL)
+        if encrypt:
+            key = get_cache_encrypt_key(app.config['SECRET_KEY'])
+            encrypt_to_file(data=data, file_path=raw_data_path, key=key,
+                            chunk_size=app.config[
+                                'FRACTALIS_ENCRYPT_CHUNK_SIZE'])
+        else:
+            with open(raw_data_path, 'wb') as f:
+                f.write(data)
+        return raw_data_path
+
+    @staticmethod
+    def unstash_raw_data(raw_data_path: str, encrypt: bool) -> object:
+        """Read and remove data written by stash_raw_data().
+        :param raw_data_path: The location of the raw data.
+        :param encrypt: Whether or not the data have been encrypted.
+        :return: The data as returned by extract().
+        """
+        try:
+            if encrypt:
+                key = get_cache_encrypt_key(app.config['SECRET_KEY'])
+                data = decrypt_file(file_path=raw_data_path, key=key)
+            else:
+                with open(raw_data_path, 'rb') as f:
+                    data = f.read()
+            return pickle.loads(data)
+        finally:
+            os.remove(raw_data_path)
+
+    def start_progress(self) -> None:
+        """Reset the progress and start counting the bytes downloaded by this
+        ETL. Called at the beginning of run()."""
+        self._progress = {'phase': None, 'bytes_downloaded': 0,
+                          'bytes_total': None, 'rows_transformed': 0,
+                          'elapsed': 0, 'eta': None}
+        self._progress_started = time.monotonic()
+        self._progress_reported = None
+        httppool.start_tracking()
+
+    def report_progress(self, phase: str = None, rows: int = 0) -> None:
+        """Publish the progress of this ETL as 'PROGRESS' state. The state
+        meta contain phase, bytes downloaded (and expected if known), rows
+        transformed, seconds elapsed and the estimated seconds remaining.
+        Reports within ETL_PROGRESS_INTERVAL seconds of the previous one are
+        only published if they start a new phase.
+        :param phase: The phase that starts, one of ['extract', 'transform',
+        'load'] or None if the current phase continues.
+        :param rows: Number of rows transformed since the last report.
+        """
+        progress = self._progress
+        progress['rows_transformed'] += rows
+        now = time.monotonic()
+        if (phase is None or phase == progress['phase']) and \
+                self._progress_reported is not None and \
+                now - self._progress_reported < \
+                app.config['ETL_PROGRESS_INTERVAL']:
+            return
+        if phase is not None:
+            progress['phase'] = phase
+        received, expected = httppool.get_received_bytes()
+        elapsed = now - self._progress_started
+        progress['bytes_downloaded'] = received
+        progress['bytes_total'] = expected
+        progress['elapsed'] = round(elapsed, 1)
+        progress['eta'] = None
+        if expected and 0 < received < expected:
+            progress['eta'] = round(elapsed * (expected - received) /
+                                    received, 1)
+        self.update_state(state='PROGRESS', meta=dict(progress))
+        self._progress_reported = now
+
+    def after_return(self, *args, **kwargs) -> None:
+        httppool.stop_tracking()
+
+    def get_checkpoint(self) -> Union[dict, None]:
+        """Return the checkpoint of the previous attempt of this ETL if
+        extract() raised PendingExtraction before.
+        :return: The checkpoint or None if this is the first attempt.
+        """
+        kwargs = getattr(self.request, 'kwargs', None) or {}
+        return kwargs.get('checkpoint')
+
+    @staticmethod
+    def get_meta(data_frame: DataFrame) -> dict:
+        """Compute several meta information that can be used to filter the
+        data before the analysis.
+        :param data_frame: The extracted and transformed data.
+        :return: Dict containing the meta information.
+        """
+        if 'feature' in data_frame.columns:
+            features = data_frame['feature'].unique().tolist()
+        else:
+            features = []
+        return {'features': features}
+
+    def update_redis(self, data_frame: DataFrame, blob: str = None) -> None:
         """Set several meta information that can be used to filter the data
         before the analysis.
         :param data_frame: The extracted and transformed data.
+        :param blob: The digest of the blob the data are stored in.
+        """
+        self.set_data_state(meta=self.get_meta(data_frame), blob=blob)
+
+    def set_data_state(self, meta: dict, blob: str = None) -> None:
+        """Add the given meta information to the data state and let it point
+        to the given blob.
+        :param meta: Meta information as returned by get_meta().
+        :param blob: The digest of the blob the data are stored in.
         """
         value = redis.get(name='data:{}'.format(self.request.id))
         assert value is not None
         data_state = json.loads(value)
-        if 'feature' in data_frame.columns:
-            features = data_frame['feature'].unique().tolist()
-        else:
-            features = []
-        data_state['meta']['features'] = features
-        redis.setex(name='data:{}'.format(self.request.id),
-                    value=json.dumps(data_state),
-                    time=app.config['FRACTALIS_DATA_LIFETIME'])
+        data_state['meta'].update(meta)
+        if blob is not None:
+            data_state['file_path'] = blobstore.get_blob_path(blob)
+            data_state['blob'] = blob
+        lifetime = app.config['FRACTALIS_DATA_LIFETIME']
+        pipeline = redis.pipeline()
+        pipeline.setex(name='data:{}'.format(self.request.id),
+                       value=json.dumps(data_state), time=lifetime)
+        # the index must not expire before the entries it points to
+        if data_state.get('hash') is not None:
+            pipeline.expire(descriptor_key(data_state['hash']), lifetime)
+        pipeline.execute()
+        quota.touch(self.request.id)
+
+    def reuse_blob(self, server: str, token: str, descriptor: dict,
+                   fingerprint: str, version: str = None) -> bool:
+        """Reference the data loaded by a previous ETL with the same
+        descriptor if they still exist, access to them can be verified and
+        they have not changed on the server since.
+        :param server: The server on which the data are located.
+        :param token: The token used for authentication.
+        :param descriptor: Describes the data that we want to download.
+        :param fingerprint: Fingerprint of the descriptor.
+        :param version: The current version as returned by get_version().
+        :return: True if existing data are used.
+        """
+        digest = blobstore.find_blob(fingerprint)
+        if digest is None:
+            return False
+        # noinspection PyBroadException
+        try:
+            if not self.probe_access(server, token, descriptor):
+                return False
+        except Exception as e:
+            logger.warning("Access probe failed. Extracting data instead. "
+                           "Exception: '{}'".format(e))
+            return False
+        if version is not None and \
+                blobstore.find_version(fingerprint) != version:
+            logger.info("Data have changed on the server. Extracting them "
+                        "again.")
+            return False
+        self.sanity_check()
+        meta = blobstore.link(digest, self.request.id)
+        if meta is None:
+            return False
+        self.set_data_state(meta=meta, blob=digest)
+        return True
+
+    @staticmethod
+    def encode_labels(data_frame: DataFrame) -> DataFrame:
+        """Dictionary encode the 'id' and 'feature' columns. Every label is
+        then stored only once and filtering, grouping and joining operate on
+        integer codes instead of strings.
+        :param data_frame: The transformed data.
+        :return: The data with 'category' typed 'id' and 'feature' columns.
+        """
+        for column in ['id', 'feature']:
+            if column in data_frame.columns and \
+                    data_frame[column].dtype == object:
+                data_frame[column] = data_frame[column].astype('category')
+        return data_frame
+
+    @staticmethod
+    def get_cache_format(data_frame: DataFrame) -> CacheFormat:
+        """Return the format specified by FRACTALIS_CACHE_FORMAT or 'pickle'
+        if the configured format cannot represent the given data.
+        :param data_frame: DataFrame to write.
+        :return: The format used to write the DataFrame.
+        """
+        cache_format = CacheFormat.factory(
+            app.config['FRACTALIS_CACHE_FORMAT'])
+        if not cache_format.can_write(data_frame):
+            logger.warning("Cache format '{}' cannot represent the data. "
+                           "Falling back to 'pickle'.".format(
+                               cache_format.name))
+            cache_format = CacheFormat.factory('pickle')
+        return cache_format
 
     @staticmethod
     def secure_load(data_frame: DataFrame, file_path: str) -> None:
         """Save data to the file system in encrypted form using AES and the
         web service secret key. This can be useful to comply with certain
-        security standards.
+        security standards. The data are serialized in the cache format and
+        encrypted in chunks, so they can be decrypted as a stream later on.
         :param data_frame: DataFrame to write.
         :param file_path: File to write to.
         """
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        data = data_frame.to_json()
-        data = data.encode('utf-8')
+        data = ETL.get_cache_format(data_frame).serialize(data_frame)
         key = get_cache_encrypt_key(app.config['SECRET_KEY'])
-        cipher = AES.new(key, AES.MODE_EAX)
-        ciphertext, tag = cipher.encrypt_and_digest(data)
-        with open(file_path, 'wb') as f:
-            [f.write(x) for x in (cipher.nonce, tag, ciphertext)]
+        encrypt_to_file(data=data, file_path=file_path, key=key,
+                        chunk_size=app.config['FRACTALIS_ENCRYPT_CHUNK_SIZE'])
 
     @staticmethod
     def load(data_frame: DataFrame, file_path: str) -> None:
-        """Load (save) the data to the file system.
+        """Load (save) the data to the file system using the format specified
+        by FRACTALIS_CACHE_FORMAT.
         :param data_frame: DataFrame to write.
         :param file_path: File to write to.
         """
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        data_frame.to_pickle(file_path, compression='gzip')
+        ETL.get_cache_format(data_frame).write(data_frame, file_path)
 
     def run(self, server: str, token: str,
             descriptor: dict, file_path: str,
-            encrypt: bool) -> None:
+            encrypt: bool, checkpoint: dict = None,
+            raw_data_path: str = None, version: str = None) -> None:
         """Run extract, transform and load. This is called by the celery worker.
         This is called by the celery worker.
         :param
@@ -166,20 +435,75 @@ class ETL(Task, metaclass=abc.ABCMeta):
         :param descriptor: Contains all necessary information to download data
         :param file_path: The location where the data will be stored
         :param encrypt: Whether or not the data should be encrypted.
+        :param checkpoint: Set if a previous attempt of extract() raised
+        PendingExtraction.
+        :param raw_data_path: Location of data that have already been
+        extracted on behalf of this ETL, e.g. by a batch extraction.
+        :param version: The version determined by a previous attempt.
         :return: The data id. Used to access the associated redis entry later
         """
         logger.info("Starting ETL process ...")
+        self.start_progress()
+        fingerprint = blobstore.descriptor_fingerprint(
+            server=server, etl_name=self.name,
+            descriptor=descriptor, encrypted=encrypt)
+        # the version is only needed to decide whether existing data can be
+        # reused. Data stored without a version are extracted again once.
+        if checkpoint is None and blobstore.find_blob(fingerprint):
+            # noinspection PyBroadException
+            try:
+                version = self.get_version(server, token, descriptor)
+            except Exception as e:
+                logger.warning("Version check failed. "
+                               "Exception: '{}'".format(e))
+            if self.reuse_blob(server, token, descriptor,
+                               fingerprint, version):
+                logger.info("Reusing data previously loaded by another ETL.")
+                if raw_data_path is not None:
+                    os.remove(raw_data_path)
+                return
         logger.info("(E)xtracting data from server '{}'.".format(server))
+        self.report_progress(phase='extract')
         try:
+            if raw_data_path is not None:
+                raw_data = self.unstash_raw_data(raw_data_path, encrypt)
             self.sanity_check()
-            raw_data = self.extract(server, token, descriptor)
+            if raw_data_path is None:
+                raw_data = self.extract(server, token, descriptor)
+        except PendingExtraction as e:
+            logger.info("Data are not ready yet. Retrying in {} seconds."
+                        .format(e.countdown))
+            kwargs = dict(server=server, token=token, descriptor=descriptor,
+                          file_path=file_path, encrypt=encrypt,
+                          checkpoint=e.checkpoint, version=version)
+            # releases the worker until the countdown has passed
+            raise self.retry(kwargs=kwargs, countdown=e.countdown,
+                             max_retries=None, exc=e)
         except Exception as e:
             logger.exception(e)
             raise RuntimeError("Data extraction failed. {}".format(e))
+        if self.streaming and not encrypt:
+            cache_format = CacheFormat.factory(
+                app.config['FRACTALIS_CACHE_FORMAT'])
+            writer = cache_format.open_writer(file_path)
+            if writer is not None:
+                logger.info("(T)ransforming and (L)oading data chunk by "
+                            "chunk.")
+                self.load_chunks(raw_data=raw_data, descriptor=descriptor,
+                                 file_path=file_path, writer=writer,
+                                 fingerprint=fingerprint, version=version)
+                return
         logger.info("(T)ransforming data to Fractalis format.")
+        self.report_progress(phase='transform')
         try:
             self.sanity_check()
-            data_frame = self.transform(raw_data, descriptor)
+            if self.streaming:
+                # the chunks cannot be appended to the cache file
+                data_frame = concat([self.transform(chunk, descriptor)
+                                     for chunk in raw_data],
+                                    ignore_index=True)
+            else:
+                data_frame = self.transform(raw_data, descriptor)
             checker = IntegrityCheck.factory(self.produces)
             checker.check(data_frame)
         except Exception as e:
@@ -190,13 +514,88 @@ class ETL(Task, metaclass=abc.ABCMeta):
                     "but returned '{}' instead.".format(type(data_frame))
             logging.error(error, exc_info=1)
             raise TypeError(error)
+        data_frame = self.encode_labels(data_frame)
+        self.report_progress(phase='load', rows=data_frame.shape[0])
         try:
             self.sanity_check()
             if encrypt:
                 self.secure_load(data_frame, file_path)
             else:
                 self.load(data_frame, file_path)
-            self.update_redis(data_frame)
+                if self.produces == 'numerical_array' and data_frame.shape[0]:
+                    write_matrix(data_frame, file_path)
+                if self.produces in ['numerical', 'numerical_array']:
+                    self.load(compute_summary(data_frame),
+                              get_summary_path(file_path))
+            digest = blobstore.content_digest(data_frame, encrypted=encrypt)
+            blobstore.publish(file_path=file_path, digest=digest,
+                              task_id=self.request.id,
+                              meta=self.get_meta(data_frame),
+                              fingerprint=fingerprint, version=version)
+            self.update_redis(data_frame, blob=digest)
         except Exception as e:
             logger.exception(e)
             raise RuntimeError("Data loading failed. {}".format(e))
+
+    def load_chunks(self, raw_data: Iterable, descriptor: dict,
+                    file_path: str, writer: CacheWriter,
+                    fingerprint: str, version: str = None) -> None:
+        """Transform, check and load the data chunk by chunk. This is used
+        instead of the remaining steps of run() by ETLs that set 'streaming'.
+        :param raw_data: The chunks returned by extract().
+        :param descriptor: Contains all necessary information to download data
+        :param file_path: The location where the data will be stored
+        :param writer: The writer appending the chunks to the cache file.
+        :param fingerprint: Descriptor fingerprint that produced the data.
+        :param version: Version of the data as returned by get_version().
+        """
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        checker = IntegrityCheck.factory(self.produces)
+        chunks = (self.encode_labels(chunk) for chunk in checker.check_chunks(
+            self.transform(chunk, descriptor) for chunk in raw_data))
+        features = OrderedDict()
+        summarize = self.produces in ['numerical', 'numerical_array']
+        # number of values of every feature
+        feature_rows = Counter()
+        sha256 = None
+        data_frame = None
+        self.report_progress(phase='load')
+        try:
+            for data_frame in chunks:
+                self.report_progress(rows=data_frame.shape[0])
+                self.sanity_check()
+                if not data_frame.shape[0]:
+                    continue
+                writer.append(data_frame)
+                if sha256 is None:
+                    sha256 = blobstore.start_content_digest(
+                        data_frame, encrypted=False)
+                blobstore.update_content_digest(sha256, data_frame)
+                for feature in self.get_meta(data_frame)['features']:
+                    features[feature] = None
+                if summarize:
+                    feature_rows.update(
+                        data_frame['feature'].value_counts().to_dict())
+            if sha256 is None:
+                # all chunks are empty
+                writer.abort()
+                self.load(data_frame, file_path)
+                sha256 = blobstore.start_content_digest(
+                    data_frame, encrypted=False)
+            else:
+                writer.close()
+            if summarize:
+                # quantiles cannot be merged from the chunks, so the summary
+                # is computed from the written data feature by feature
+                self.load(compute_cache_summary(file_path, feature_rows),
+                          get_summary_path(file_path))
+            digest = sha256.hexdigest()
+            meta = {'features': list(features)}
+            blobstore.publish(file_path=file_path, digest=digest,
+                              task_id=self.request.id, meta=meta,
+                              fingerprint=fingerprint, version=version)
+            self.set_data_state(meta=meta, blob=digest)
+        except Exception as e:
+            writer.abort()
+            logger.exception(e)
+            raise RuntimeError("Data processing failed. {}".format(e))
@@ -3,18 +3,66 @@
 import os
 import abc
 import json
+import hmac
+import hashlib
 import logging
 from uuid import uuid4
-from typing import List, Union
+from collections import OrderedDict
+from typing import List, Tuple, Union
+
+from celery import group
+from celery.result import ResultSet
 
 from fractalis.cleanup import janitor
 from fractalis import app, redis, celery
-from fractalis.data.etl import ETL
+from fractalis.celeryapp import STATE_STORED_HEADER, store_submitted_states
+from fractalis.data.etl import ETL, descriptor_key
 
 
 logger = logging.getLogger(__name__)
 
 
+@celery.task(bind=True, task_class='etl')
+def extract_batch(self, server: str, token: str,
+                  members: List[dict], encrypt: bool) -> None:
+    """Extract the data of several ETLs with a single call to
+    ETL.extract_batch() and submit every ETL with its share of the data. Until
+    then the ETLs are in the 'SUBMITTED' state and fail with this task.
+    :param server: The server on which the data are located.
+    :param token: The token used for authentication.
+    :param members: Dicts containing name, task_id, descriptor and file_path
+    of every ETL. All ETLs share the same ETL.batch_key().
+    :param encrypt: Whether or not the data should be encrypted.
+    """
+    etls = [celery.tasks[member['name']] for member in members]
+    descriptors = [member['descriptor'] for member in members]
+    logger.info("Extracting data of {} ETLs from server '{}' in a single "
+                "batch.".format(len(members), server))
+    try:
+        raw_data = etls[0].extract_batch(server, token, descriptors)
+        if len(raw_data) != len(members):
+            raise ValueError("Expected data for {} descriptors but got {}."
+                             .format(len(members), len(raw_data)))
+    except Exception as e:
+        logger.exception(e)
+        error = RuntimeError("Data extraction failed. {}".format(e))
+        for member in members:
+            self.backend.mark_as_failure(member['task_id'], error)
+        raise error
+    signatures = []
+    for etl, member, data in zip(etls, members, raw_data):
+        raw_data_path = ETL.stash_raw_data(raw_data=data,
+                                           file_path=member['file_path'],
+                                           encrypt=encrypt)
+        kwargs = dict(server=server, token=token,
+                      descriptor=member['descriptor'],
+                      file_path=member['file_path'],
+                      encrypt=encrypt, raw_data_path=raw_data_path)
+        signatures.append(etl.signature(kwargs=kwargs,
+                                        task_id=member['task_id']))
+    group(signatures).apply_async(headers={STATE_STORED_HEADER: True})
+
+
 class ETLHandler(metaclass=abc.ABCMeta):
     """This is an abstract class that provides a factory method to create
     instances of implementations of itself. The main purpose of this class
@@ -30,14 +78,47 @@ class ETLHandler(metaclass=abc.ABCMeta):
         """
         pass
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
+    def _get_token_for_credentials(
+            self, server: str, auth: dict) -> Tuple[str, Union[int, None]]:
         """ Authenticate with the server and return a token.
         :param server: The server to authenticate with.
         :param auth: dict containing credentials to auth with API
-        :return The token returned by the API.
+        :return The token returned by the API and the number of seconds until
+        it expires or None if that is unknown.
         """
         raise NotImplementedError()
 
+    def _get_cached_token(self, server: str, auth: dict) -> str:
+        """Return the token for the given credentials. Tokens are cached in
+        Redis until ETL_TOKEN_REFRESH_MARGIN seconds before they expire, or
+        for ETL_TOKEN_CACHE_LIFETIME seconds if their expiry is unknown.
+        :param server: The server to authenticate with.
+        :param auth: dict containing credentials to auth with API
+        :return The cached or newly obtained token.
+        """
+        # credentials must never end up in Redis, not even as plain digest
+        credentials = json.dumps([self._handler, server, auth],
+                                 sort_keys=True, separators=(',', ':'))
+        digest = hmac.new(key=app.config['SECRET_KEY'].encode('utf-8'),
+                          msg=credentials.encode('utf-8'),
+                          digestmod=hashlib.sha256).hexdigest()
+        key = 'token:{}'.format(digest)
+        token = redis.get(key)
+        if token:
+            logger.debug("Reusing cached token for '{}'.".format(server))
+            self._cached_token_key = key
+            return token
+        token, expires_in = self._get_token_for_credentials(server, auth)
+        if expires_in is None:
+            lifetime = app.config['ETL_TOKEN_CACHE_LIFETIME']
+        else:
+            lifetime = min(
+                expires_in - app.config['ETL_TOKEN_REFRESH_MARGIN'],
+                app.config['ETL_TOKEN_CACHE_LIFETIME'] or 0)
+        if lifetime > 0:
+            redis.setex(name=key, value=token, time=int(lifetime))
+        return token
+
     def __init__(self, server, auth):
         if not isinstance(server, str) or not server:
             error = ("{} is not a valid server url.".format(server))
@@ -50,6 +131,8 @@ class ETLHandler(metaclass=abc.ABCMeta):
         if server.endswith('/'):
             server = server[:-1]
         self._server = server
+        self._cached_token_key = None
+        self._credentials = None
         # if no token is given we have to get one
         try:
             self._token = auth['token']
@@ -58,8 +141,9 @@ class ETLHandler(metaclass=abc.ABCMeta):
         except KeyError:
             logger.info('No token has been provided. '
                         'Attempting to authenticate with the API.')
+            self._credentials = auth
             try:
-                self._token = self._get_token_for_credentials(server, auth)
+                self._token = self._get_cached_token(server, auth)
             except Exception as e:
                 logger.exception(e)
                 raise ValueError("Could not authenticate with API.")
@@ -74,38 +158,48 @@ class ETLHandler(metaclass=abc.ABCMeta):
         pass
 
     def create_redis_entry(self, task_id: str, file_path: str,
-                           descriptor: dict, data_type: str) -> None:
+                           descriptor: dict, data_type: str,
+                           pipeline: object = None) -> None:
         """Creates an entry in Redis that contains meta information for the
         data that are to be downloaded.
         :param task_id: Id associated with the loaded data.
         :param file_path: Location of the data on the file system.
         :param descriptor: Describes the data and is used to download them.
         :param data_type: The fractalis internal data type of the loaded data.
+        :param pipeline: If given the entry is only queued in this Redis
+        pipeline and written when it is executed.
         """
+        hash_value = self.descriptor_to_hash(descriptor)
         data_state = {
             'task_id': task_id,
             'file_path': file_path,
             'label': self.make_label(descriptor),
             'data_type': data_type,
-            'hash': self.descriptor_to_hash(descriptor),
+            'hash': hash_value,
             'meta': {
                 'descriptor': descriptor,
             }
         }
-        redis.setex(name='data:{}'.format(task_id),
-                    value=json.dumps(data_state),
-                    time=app.config['FRACTALIS_DATA_LIFETIME'])
+        lifetime = app.config['FRACTALIS_DATA_LIFETIME']
+        client = redis.pipeline(transaction=False) \
+            if pipeline is None else pipeline
+        client.setex(name='data:{}'.format(task_id),
+                     value=json.dumps(data_state),
+                     time=lifetime)
+        client.sadd(descriptor_key(hash_value), task_id)
+        client.expire(descriptor_key(hash_value), lifetime)
+        if pipeline is None:
+            client.execute()
 
-    def descriptor_to_hash(self, descriptor: dict) -> int:
+    def descriptor_to_hash(self, descriptor: dict) -> str:
         """Compute hash for the given descriptor. Used to identify duplicates.
+        Descriptors differing only in the order of their keys are equal.
         :param descriptor: ETL descriptor. Used to identify duplicates.
-        :return: Unique hash.
+        :return: Hex encoded SHA-256 digest of server, handler and descriptor.
         """
-        string = '{}-{}-{}'.format(self._server,
-                                   self._handler,
-                                   str(descriptor))
-        hash_value = int.from_bytes(string.encode('utf-8'), 'little')
-        return hash_value
+        string = json.dumps([self._server, self._handler, descriptor],
+                            sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(string.encode('utf-8')).hexdigest()
 
     def find_duplicates(self, data_tasks: List[str],
                         descriptor: dict) -> List[str]:
@@ -115,16 +209,24 @@ class ETLHandler(metaclass=abc.ABCMeta):
         :param descriptor: ETL descriptor. Used to identify duplicates.
         :return: The list of duplicates.
         """
-        task_ids = []
-        hash_value = self.descriptor_to_hash(descriptor)
-        for task_id in data_tasks:
-            value = redis.get('data:{}'.format(task_id))
-            if value is None:
-                continue
-            data_state = json.loads(value)
-            if hash_value == data_state['hash']:
-                task_ids.append(task_id)
-        return task_ids
+        index_key = descriptor_key(self.descriptor_to_hash(descriptor))
+        candidates = redis.smembers(index_key)
+        if not candidates:
+            return []
+        task_ids = [task_id for task_id in data_tasks
+                    if task_id in candidates]
+        if not task_ids:
+            return []
+        # the index outlives entries that have expired or been removed
+        pipeline = redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipeline.exists('data:{}'.format(task_id))
+        exists = pipeline.execute()
+        expired = [task_id for task_id, found in zip(task_ids, exists)
+                   if not found]
+        if expired:
+            redis.srem(index_key, *expired)
+        return [task_id for task_id, found in zip(task_ids, exists) if found]
 
     def remove_duplicates(self, data_tasks: List[str],
                           descriptor: dict) -> None:
@@ -134,16 +236,17 @@ class ETLHandler(metaclass=abc.ABCMeta):
         :param descriptor: ETL descriptor. Used to identify duplicates.
         """
         task_ids = self.find_duplicates(data_tasks, descriptor)
-        for task_id in task_ids:
-            redis.delete('data:{}'.format(task_id))
         if task_ids:
+            redis.delete(*['data:{}'.format(task_id) for task_id in task_ids])
+            redis.srem(descriptor_key(self.descriptor_to_hash(descriptor)),
+                       *task_ids)
             janitor.delay()
 
     def find_duplicate_task_id(self, data_tasks: List[str],
                                descriptor: dict) -> Union[str, None]:
         """Search for duplicates of the given descriptor and return their
-        task id if the state is SUBMITTED or SUCCESS, meaning the data are
-        reusable.
+        task id if the state is SUBMITTED, RETRY, PROGRESS or SUCCESS, meaning
+        the data are reusable.
         :param data_tasks: Limit search to this list.
         :param descriptor: ETL descriptor. Used to identify duplicates.
         :return: TaskID if valid duplicate has been found, None otherwise.
@@ -151,8 +254,8 @@ class ETLHandler(metaclass=abc.ABCMeta):
         task_ids = self.find_duplicates(data_tasks, descriptor)
         for task_id in task_ids:
             async_result = celery.AsyncResult(task_id)
-            if (async_result.state == 'SUBMITTED' or
-                    async_result.state == 'SUCCESS'):
+            if async_result.state in ['SUBMITTED', 'RETRY', 'PROGRESS',
+                                      'SUCCESS']:
                 return task_id
         return None
 
@@ -160,7 +263,8 @@ class ETLHandler(metaclass=abc.ABCMeta):
                use_existing: bool, wait: bool = False) -> List[str]:
         """Create instances of ETL for the given descriptors and submit them
         (ETL implements celery.Task) to the broker. The task ids are returned
-        to keep track of them.
+        to keep track of them. The Redis entries of all new ETLs are written
+        with a single pipeline and the ETLs are published as a single group.
         :param descriptors: A list of items describing the data to download.
         :param data_tasks: Limit search for duplicates to this list.
         :param use_existing: If a duplicate with state 'SUBMITTED' or 'SUCCESS'
@@ -172,33 +276,87 @@ class ETLHandler(metaclass=abc.ABCMeta):
         """
         data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
         task_ids = []
+        # new ETLs by descriptor hash, duplicates within this call are not
+        # in Redis yet and must be found here
+        pending = OrderedDict()
         for descriptor in descriptors:
+            hash_value = self.descriptor_to_hash(descriptor)
             if use_existing:
+                if hash_value in pending:
+                    task_ids.append(pending[hash_value][1]['task_id'])
+                    continue
                 task_id = self.find_duplicate_task_id(data_tasks, descriptor)
                 if task_id:
                     task_ids.append(task_id)
                     data_tasks.append(task_id)
                     continue
             else:
+                pending.pop(hash_value, None)
                 self.remove_duplicates(data_tasks, descriptor)
             task_id = str(uuid4())
             file_path = os.path.join(data_dir, task_id)
             etl = ETL.factory(handler=self._handler, descriptor=descriptor)
-            self.create_redis_entry(task_id, file_path,
-                                    descriptor, etl.produces)
-            kwargs = dict(server=self._server, token=self._token,
-                          descriptor=descriptor, file_path=file_path,
-                          encrypt=app.config['FRACTALIS_ENCRYPT_CACHE'])
-            async_result = etl.apply_async(kwargs=kwargs, task_id=task_id)
-            assert async_result.id == task_id
+            member = dict(name=etl.name, task_id=task_id,
+                          descriptor=descriptor, file_path=file_path)
+            pending[hash_value] = (etl, member)
             task_ids.append(task_id)
             data_tasks.append(task_id)
-            if wait and async_result.state == 'SUBMITTED':
-                logger.debug("'wait' was set. Waiting for tasks to finish ...")
-                async_result.get(propagate=False)
+        submitted = [member['task_id'] for _, member in pending.values()]
+        if submitted:
+            pipeline = redis.pipeline(transaction=False)
+            for etl, member in pending.values():
+                self.create_redis_entry(task_id=member['task_id'],
+                                        file_path=member['file_path'],
+                                        descriptor=member['descriptor'],
+                                        data_type=etl.produces,
+                                        pipeline=pipeline)
+            pipeline.execute()
+            # batched ETLs are published later, but must be found already
+            store_submitted_states(celery.backend, submitted)
+            self.submit(list(pending.values()))
+        if wait and submitted:
+            logger.debug("'wait' was set. Waiting for tasks to finish ...")
+            result_set = ResultSet([celery.AsyncResult(task_id)
+                                    for task_id in submitted], app=celery)
+            if result_set.supports_native_join:
+                result_set.join_native(propagate=False)
+            else:
+                result_set.join(propagate=False)
         task_ids = list(set(task_ids))
         return task_ids
 
+    def submit(self, pending: List[Tuple[ETL, dict]]) -> None:
+        """Publish the given ETLs as a single group. ETLs sharing the same
+        ETL.batch_key() are extracted together in batches of at most
+        ETL_BATCH_SIZE descriptors, all other ETLs are published directly.
+        :param pending: Tuples of ETL and a dict containing name, task_id,
+        descriptor and file_path of the ETL.
+        """
+        encrypt = app.config['FRACTALIS_ENCRYPT_CACHE']
+        batch_size = app.config['ETL_BATCH_SIZE']
+        batches = OrderedDict()
+        for etl, member in pending:
+            batch_key = etl.batch_key(member['descriptor']) or \
+                member['task_id']
+            batches.setdefault(batch_key, []).append((etl, member))
+        signatures = []
+        for batch in batches.values():
+            if len(batch) == 1:
+                etl, member = batch[0]
+                kwargs = dict(server=self._server, token=self._token,
+                              descriptor=member['descriptor'],
+                              file_path=member['file_path'], encrypt=encrypt)
+                signatures.append(etl.signature(kwargs=kwargs,
+                                                task_id=member['task_id']))
+                continue
+            members = [member for _, member in batch]
+            for i in range(0, len(members), batch_size):
+                # the ETLs are published once their data have been extracted
+                signatures.append(extract_batch.signature(kwargs=dict(
+                    server=self._server, token=self._token,
+                    members=members[i:i + batch_size], encrypt=encrypt)))
+        group(signatures).apply_async(headers={STATE_STORED_HEADER: True})
+
     @staticmethod
     def factory(handler: str, server: str, auth: dict) -> 'ETLHandler':
         """Return an instance of the implementation of ETLHandler that can
@@ -225,5 +383,40 @@ class ETLHandler(metaclass=abc.ABCMeta):
         """
         return handler == cls._handler
 
-    def _heartbeat(self):
+    def _heartbeat(self) -> bool:
+        """Check whether the server accepts the token of this handler with a
+        request that is as cheap as possible.
+        :return: True if the token is accepted, False if it is rejected.
+        """
         raise NotImplementedError()
+
+    def has_cached_token(self) -> bool:
+        """Return whether the token of this handler has been taken from the
+        token cache and might therefore have been revoked in the meantime.
+        :return: True if the token has been cached.
+        """
+        return self._cached_token_key is not None
+
+    def verify_access(self) -> Union[bool, None]:
+        """Check the token of this handler with _heartbeat(). A rejected token
+        that has been taken from the token cache might have been revoked, so
+        it is removed from the cache and the handler authenticates again.
+        :return: True or False if the token has been accepted or rejected,
+        None if the handler cannot tell.
+        """
+        # noinspection PyBroadException
+        try:
+            accepted = self._heartbeat()
+            if not accepted and self._cached_token_key is not None:
+                redis.delete(self._cached_token_key)
+                self._cached_token_key = None
+                self._token = self._get_cached_token(self._server,
+                                                     self._credentials)
+                accepted = self._heartbeat()
+        except NotImplementedError:
+            return None
+        except Exception as e:
+            logger.warning("Heartbeat of '{}' failed. Exception: '{}'"
+                           .format(self._server, e))
+            return None
+        return bool(accepted)
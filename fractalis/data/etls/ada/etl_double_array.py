@@ -29,15 +29,15 @@ class DoubleArrayETL(ETL):
                                 cookie=cookie, projection=projection)
         return data
 
+    def batch_key(self, descriptor: dict) -> str:
+        return shared.get_batch_key(descriptor)
+
+    def extract_batch(self, server: str, token: str,
+                      descriptors: List[dict]) -> List[List[dict]]:
+        return shared.extract_batch(server=server, token=token,
+                                    descriptors=descriptors)
+
     def transform(self, raw_data: List[dict],
                   descriptor: dict) -> pd.DataFrame:
-        name = descriptor['dictionary']['name']
-        ids = []
-        values = []
-        for row in raw_data:
-            ids.append(row['_id']['$oid'])
-            values.append(row[name])
-        df = pd.DataFrame(values)
-        df.insert(0, 'id', ids)
-        df = pd.melt(df, id_vars='id', var_name='feature')
+        df = shared.make_array_data_frame(raw_data, descriptor)
         return df
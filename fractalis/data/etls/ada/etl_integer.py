@@ -29,8 +29,14 @@ class IntegerETL(ETL):
                                 cookie=cookie, projection=projection)
         return data
 
+    def batch_key(self, descriptor: dict) -> str:
+        return shared.get_batch_key(descriptor)
+
+    def extract_batch(self, server: str, token: str,
+                      descriptors: List[dict]) -> List[List[dict]]:
+        return shared.extract_batch(server=server, token=token,
+                                    descriptors=descriptors)
+
     def transform(self, raw_data: List[dict], descriptor: dict) -> DataFrame:
-        data = shared.prepare_ids(raw_data)
-        data = shared.name_to_label(data, descriptor)
-        df = shared.make_data_frame(data)
+        df = shared.make_data_frame(raw_data, descriptor)
         return df
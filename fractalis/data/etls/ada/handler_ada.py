@@ -1,10 +1,10 @@
 """This module provides AdaHandler, an implementation of ETLHandler for ADA."""
 
 import logging
-
-import requests
+from typing import Tuple, Union
 
 from fractalis.data.etlhandler import ETLHandler
+from fractalis.data.httppool import get_session
 
 
 logger = logging.getLogger(__name__)
@@ -27,7 +27,8 @@ class AdaHandler(ETLHandler):
         return '{} ({})'.format(descriptor['dictionary']['label'],
                                 descriptor['data_set'])
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
+    def _get_token_for_credentials(
+            self, server: str, auth: dict) -> Tuple[str, Union[int, None]]:
         try:
             user = auth['user']
             passwd = auth['passwd']
@@ -37,10 +38,10 @@ class AdaHandler(ETLHandler):
             logger.exception(e)
             raise ValueError("The authentication object must contain the "
                              "non-empty fields 'user' and 'passwd'.")
-        r = requests.post(url='{}/login'.format(server),
-                          headers={'Accept': 'application/json'},
-                          data={'id': user, 'password': passwd},
-                          timeout=10)
+        r = get_session(server).post(url='{}/login'.format(server),
+                                     headers={'Accept': 'application/json'},
+                                     data={'id': user, 'password': passwd},
+                                     timeout=10)
         if r.status_code != 200:
             error = "Could not authenticate. " \
                     "Reason: [{}]: {}".format(r.status_code, r.text)
@@ -50,4 +51,7 @@ class AdaHandler(ETLHandler):
         token = [s for s in cookie.split(';')
                  if s.startswith('PLAY2AUTH_SESS_ID')][0]
         token = '='.join(token.split('=')[1:])  # remove PLAY2AUTH_SESS_ID=
-        return token
+        max_age = [s.strip() for s in cookie.split(';')
+                   if s.strip().lower().startswith('max-age=')]
+        expires_in = int(max_age[0].split('=')[1]) if max_age else None
+        return token, expires_in
@@ -1,10 +1,14 @@
 """This module contains code that is shared between the different ETLs."""
 
+import json
 import logging
-from typing import List
+from collections import OrderedDict
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
-import requests
+
+from fractalis.data.httppool import get_session
 
 
 logger = logging.getLogger(__name__)
@@ -14,17 +18,13 @@ def make_cookie(token: str) -> dict:
     return {'PLAY2AUTH_SESS_ID': token}
 
 
-def get_field(server: str, data_set: str,
-              cookie: dict, projection: str) -> List[dict]:
-    r = requests.get(url='{}/dataSets/records/findCustom'.format(server),
-                     headers={'Accept': 'application/json'},
-                     params={
-                         'dataSet': data_set,
-                         'projection': ['_id', projection],
-                         'filterOrId': '[{{"fieldName":"{}","conditionType":"!=","value":""}}]'.format(projection)  # noqa: 501
-                     },
-                     cookies=cookie,
-                     timeout=60)
+def find_custom(server: str, cookie: dict, params: dict) -> List[dict]:
+    session = get_session(server)
+    r = session.get(url='{}/dataSets/records/findCustom'.format(server),
+                    headers={'Accept': 'application/json'},
+                    params=params,
+                    cookies=cookie,
+                    timeout=60)
     if r.status_code != 200:
         error = "Target server responded with " \
                 "status code {}.".format(r.status_code)
@@ -39,30 +39,166 @@ def get_field(server: str, data_set: str,
     return field_data
 
 
-def prepare_ids(data: List[dict]) -> List[dict]:
-    new_data = []
-    for row in data:
-        id = row['_id']['$oid']
-        del row['_id']
-        row['id'] = id
-        new_data.append(row)
-    return new_data
+def get_filter(projections: List[str]) -> str:
+    """Return the findCustom filter for records in which at least one of the
+    given fields is neither missing nor empty.
+    :param projections: The fields to look at.
+    :return: The JSON encoded filter.
+    """
+    conditions = [{'fieldName': projection, 'conditionType': '!=',
+                   'value': ''} for projection in projections]
+    if len(conditions) > 1:
+        conditions = [{'conditionType': 'OR', 'conditions': conditions}]
+    return json.dumps(conditions, separators=(',', ':'))
+
+
+def get_field(server: str, data_set: str,
+              cookie: dict, projection: str) -> List[dict]:
+    return find_custom(server=server, cookie=cookie, params={
+        'dataSet': data_set,
+        'projection': ['_id', projection],
+        'filterOrId': get_filter([projection])
+    })
+
+
+def get_batch_key(descriptor: dict) -> str:
+    return 'ada:{}'.format(descriptor['data_set'])
+
+
+def extract_batch(server: str, token: str,
+                  descriptors: List[dict]) -> List[List[dict]]:
+    """Extract several fields of the same data set with a single request and
+    split the records by field. Records in which a field is missing or empty
+    are dropped for that field, just like get_field() does. Only records in
+    which at least one of the fields is set are requested. Should the server
+    reject that filter, all records are requested instead.
+    :param server: The target server.
+    :param token: The token used for authentication.
+    :param descriptors: Descriptors of fields of the same data set.
+    :return: The records of every descriptor in the given order.
+    """
+    projections = list(OrderedDict.fromkeys(
+        descriptor['dictionary']['projection'] for descriptor in descriptors))
+    cookie = make_cookie(token)
+    params = {
+        'dataSet': descriptors[0]['data_set'],
+        'projection': ['_id'] + projections,
+        'filterOrId': get_filter(projections)
+    }
+    try:
+        data = find_custom(server=server, cookie=cookie, params=params)
+    except ValueError:
+        if len(projections) == 1:
+            raise
+        logger.warning("Server rejected the filter of a batch. Requesting "
+                       "all records of the data set instead.")
+        del params['filterOrId']
+        data = find_custom(server=server, cookie=cookie, params=params)
+    raw_data = []
+    for descriptor in descriptors:
+        # the records contain the fields named like their projection
+        projection = descriptor['dictionary']['projection']
+        raw_data.append([{'_id': row['_id'], projection: row[projection]}
+                         for row in data
+                         if row.get(projection) is not None and
+                         row[projection] != ''])
+    return raw_data
 
 
-def name_to_label(data: List[dict], descriptor: dict) -> List[dict]:
+def get_feature(descriptor: dict, key: str) -> str:
     try:
         label = descriptor['dictionary']['label']
     except (KeyError, TypeError):
-        return data
-    for row in data:
-        if descriptor['dictionary']['name'] in row:
-            value = row[descriptor['dictionary']['name']]
-            del row[descriptor['dictionary']['name']]
-            row[label] = value
-    return data
-
-
-def make_data_frame(data: List[dict]) -> pd.DataFrame:
-    df = pd.DataFrame(data)
-    df = pd.melt(df, id_vars='id', var_name='feature')
-    return df
+        return key
+    return label if key == descriptor['dictionary']['name'] else key
+
+
+def get_columns(raw_data: List[dict]) -> Tuple[np.ndarray, Dict[str, list]]:
+    """Collect the ids and the values of every field of the records in a
+    single pass. Fields missing in a record are None.
+    :param raw_data: The records returned by Ada.
+    :return: The ids and a dict of field name and values.
+    """
+    ids = np.empty(len(raw_data), dtype=object)
+    columns = {}
+    for i, row in enumerate(raw_data):
+        for key, value in row.items():
+            if key == '_id':
+                ids[i] = value['$oid']
+                continue
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * len(raw_data)
+            column[i] = value
+    return ids, columns
+
+
+def map_values(values: list, mapping: dict) -> np.ndarray:
+    """Map the values with the given dict. Every distinct value is looked up
+    only once.
+    :param values: The values to map. None is kept as missing.
+    :param mapping: Dict of the string representation of a value and the
+    value to map it to.
+    :return: The mapped values.
+    """
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    mapped = [mapping[str(value)] for value in uniques] + [np.nan]
+    return np.array(mapped, dtype=object)[codes]
+
+
+def make_data_frame(raw_data: List[dict], descriptor: dict,
+                    mapping: dict = None) -> pd.DataFrame:
+    """Build a DataFrame in the Fractalis format straight from the records.
+    Every field becomes a feature, the field of the descriptor is named after
+    its label.
+    :param raw_data: The records returned by Ada.
+    :param descriptor: Describes the data.
+    :param mapping: Optional dict to map the values with, see map_values().
+    :return: DataFrame with the columns 'id', 'feature' and 'value'.
+    """
+    ids, columns = get_columns(raw_data)
+    frames = []
+    for key in sorted(columns):
+        values = columns[key]
+        values = pd.Series(map_values(values, mapping) if mapping is not None
+                           else values)
+        features = pd.Categorical.from_codes(
+            np.zeros(len(ids), dtype=np.int8),
+            categories=[get_feature(descriptor, key)])
+        frames.append(pd.DataFrame({'id': ids, 'feature': features,
+                                    'value': values},
+                                   columns=['id', 'feature', 'value']))
+    if not frames:
+        return pd.DataFrame(columns=['id', 'feature', 'value'])
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_array_data_frame(raw_data: List[dict],
+                          descriptor: dict) -> pd.DataFrame:
+    """Build a DataFrame in the Fractalis format from records containing an
+    array of numbers. The position within the array is used as feature.
+    :param raw_data: The records returned by Ada.
+    :param descriptor: Describes the data.
+    :return: DataFrame with the columns 'id', 'feature' and 'value'.
+    """
+    if not raw_data:
+        return pd.DataFrame(columns=['id', 'feature', 'value'])
+    name = descriptor['dictionary']['name']
+    ids = np.array([row['_id']['$oid'] for row in raw_data], dtype=object)
+    values = [row[name] for row in raw_data]
+    if len({len(array) for array in values}) > 1:
+        # arrays of different length are padded with NaN
+        matrix = pd.DataFrame(values).values.astype(np.float64)
+    else:
+        matrix = np.array(values, dtype=np.float64).reshape(len(values), -1)
+    n_ids, n_features = matrix.shape
+    features = pd.Categorical.from_codes(
+        np.repeat(np.arange(n_features), n_ids),
+        categories=[str(i) for i in range(n_features)])
+    return pd.DataFrame({'id': np.tile(ids, n_features),
+                         'feature': features,
+                         # column by column, like pd.melt
+                         'value': matrix.ravel(order='F')},
+                        columns=['id', 'feature', 'value'])
@@ -15,6 +15,10 @@ class CategoricalETL(ETL):
         return handler == 'demo_tcga_coad' and \
                descriptor['dataType'] == 'categorical'
 
+    def probe_access(self, server: str, token: str, descriptor: dict):
+        # demo data are shipped with Fractalis and accessible to everyone
+        return True
+
     def extract(self, server: str, token: str, descriptor: dict):
         path = '{}/data/{}.tsv'.format(
             os.path.dirname(os.path.abspath(__file__)), descriptor['field'])
@@ -15,6 +15,10 @@ class NumericalETL(ETL):
         return handler == 'demo_tcga_coad' and \
                descriptor['dataType'] == 'numerical'
 
+    def probe_access(self, server: str, token: str, descriptor: dict):
+        # demo data are shipped with Fractalis and accessible to everyone
+        return True
+
     def extract(self, server: str, token: str, descriptor: dict):
         print('I am 100% sure that I am a TCGA ETL and NOT a wine quality ETL.')
         print(__file__)
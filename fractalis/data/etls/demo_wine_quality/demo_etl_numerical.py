@@ -19,6 +19,10 @@ class NumericalETL(ETL):
         return handler == 'demo_wine_quality' and \
                descriptor['dataType'] == 'numerical'
 
+    def probe_access(self, server: str, token: str, descriptor: dict):
+        # demo data are shipped with Fractalis and accessible to everyone
+        return True
+
     def extract(self, server: str, token: str, descriptor: dict):
         path = os.path.dirname(os.path.abspath(__file__)) + '/wine_quality.csv'
         csv = pd.read_csv(path, sep='\t')
@@ -9,8 +9,8 @@ class DemoHandler(ETLHandler):
     def make_label(descriptor):
         return descriptor.get('field')
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
-        return 'foo'
+    def _get_token_for_credentials(self, server: str, auth: dict) -> tuple:
+        return 'foo', None
 
     def _heartbeat(self):
-        pass
+        return True
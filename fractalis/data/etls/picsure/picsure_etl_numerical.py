@@ -1,10 +1,9 @@
 """Provides NumericalETL for PIC-SURE API."""
 
 import json
-from typing import List
+from typing import Iterator
 
 import pandas as pd
-from io import StringIO
 
 from fractalis.data.etl import ETL
 from fractalis.data.etls.picsure import shared
@@ -15,27 +14,21 @@ class NumericalETL(ETL):
 
     name = 'pic-sure_numerical_etl'
     produces = 'numerical'
+    streaming = True
 
     @staticmethod
     def can_handle(handler: str, descriptor: dict) -> bool:
         return handler == 'pic-sure' and \
                descriptor['dataType'] == 'numerical'
 
-    def extract(self, server: str, token: str, descriptor: dict) -> List[str]:
-        result_id = shared.submit_query(
-            query=json.dumps(descriptor['query']), server=server, token=token)
-        shared.wait_for_completion(
-            result_id=result_id, server=server, token=token)
-        raw_data = shared.get_data(
-            result_id=result_id, server=server, token=token)
-        return raw_data
+    def extract(self, server: str, token: str,
+                descriptor: dict) -> Iterator[pd.DataFrame]:
+        stream = shared.extract(
+            query=json.dumps(descriptor['query']), server=server, token=token,
+            checkpoint=self.get_checkpoint())
+        return shared.read_csv_chunks(stream, value_dtype=float)
 
-    def transform(self, raw_data: List[dict],
+    def transform(self, raw_data: pd.DataFrame,
                   descriptor: dict) -> pd.DataFrame:
-        df = pd.read_csv(StringIO(raw_data))
-        feature = df.columns[1]
-        df.columns = ['id', 'value']
-        df.insert(1, 'feature', feature)
-        df[['id']] = df[['id']].astype(str)
-        df[['value']] = df[['value']].astype(float)
+        df = shared.make_data_frame(raw_data)
         return df
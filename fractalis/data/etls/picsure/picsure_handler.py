@@ -18,5 +18,5 @@ class PicSureHandler(ETLHandler):
     def make_label(descriptor: dict) -> str:
         return descriptor['query']['select'][0]['alias']
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
-        return auth['token']
+    def _get_token_for_credentials(self, server: str, auth: dict) -> tuple:
+        return auth['token'], None
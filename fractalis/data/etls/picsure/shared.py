@@ -1,12 +1,27 @@
-from time import sleep
+"""This module provides shared functionality to the PIC-SURE ETLs."""
 
-import requests
+import io
+import csv
+import logging
+from time import time
+from typing import Iterator, TextIO, Union
+
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
 
 from fractalis import app
+from fractalis.data.etl import PendingExtraction
+from fractalis.data.httppool import get_session
+
+logger = logging.getLogger(__name__)
+
+# Number of rows parsed at once when reading a CSV result
+CHUNK_SIZE = 100000
 
 
 def submit_query(query: str, server: str, token: str) -> int:
-    r = requests.post(
+    r = get_session(server).post(
         url='{}/queryService/runQuery'.format(server),
         data=query,
         headers={
@@ -20,30 +35,130 @@ def submit_query(query: str, server: str, token: str) -> int:
     return result_id
 
 
-def wait_for_completion(result_id: int, server, token):
-    def _check_status():
-        return requests.get(
-            url='{}/resultService/resultStatus/{}'.format(
-                server, result_id),
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': 'Bearer {}'.format(token)
-            },
-            verify=app.config['ETL_VERIFY_SSL_CERT']
-        ).json()
-    while _check_status()['status'] == 'RUNNING':
-        sleep(1)
+def get_status(result_id: int, server: str, token: str) -> str:
+    r = get_session(server).get(
+        url='{}/resultService/resultStatus/{}'.format(
+            server, result_id),
+        headers={
+            'Content-Type': 'application/json',
+            'Authorization': 'Bearer {}'.format(token)
+        },
+        verify=app.config['ETL_VERIFY_SSL_CERT']
+    )
+    r.raise_for_status()
+    return r.json()['status']
 
 
-def get_data(result_id, server, token):
-    r = requests.get(
+def get_countdown(attempt: int) -> float:
+    """Return the time to wait before checking the status of a query again.
+    The interval doubles with every attempt up to ETL_POLL_MAX_INTERVAL.
+    :param attempt: The number of status checks so far.
+    :return: The countdown in seconds.
+    """
+    countdown = app.config['ETL_POLL_INTERVAL'] * 2 ** min(attempt, 32)
+    return min(countdown, app.config['ETL_POLL_MAX_INTERVAL'])
+
+
+def extract(query: str, server: str, token: str,
+            checkpoint: Union[dict, None]) -> TextIO:
+    """Submit the query on the first attempt and fetch the result once the
+    query has completed. While it is running PendingExtraction is raised, so
+    the ETL is rescheduled instead of blocking the worker.
+    :param query: The PIC-SURE query.
+    :param server: The target server.
+    :param token: The token used for authentication.
+    :param checkpoint: The checkpoint of the previous attempt or None.
+    :return: A text stream of the CSV result.
+    """
+    if checkpoint is None:
+        checkpoint = {
+            'result_id': submit_query(query=query, server=server, token=token),
+            'submitted': time(),
+            'attempt': 0
+        }
+    result_id = checkpoint['result_id']
+    if get_status(result_id=result_id,
+                  server=server, token=token) == 'RUNNING':
+        if time() - checkpoint['submitted'] > app.config['ETL_POLL_TIMEOUT']:
+            error = "PIC-SURE query '{}' did not complete within {} " \
+                    "seconds.".format(result_id,
+                                      app.config['ETL_POLL_TIMEOUT'])
+            logger.error(error)
+            raise ValueError(error)
+        countdown = get_countdown(checkpoint['attempt'])
+        checkpoint = dict(checkpoint, attempt=checkpoint['attempt'] + 1)
+        raise PendingExtraction(checkpoint=checkpoint, countdown=countdown)
+    return get_data(result_id=result_id, server=server, token=token)
+
+
+def get_data(result_id: int, server: str, token: str) -> TextIO:
+    """Request the result of a query as CSV without downloading it yet.
+    :param result_id: The id of the completed query.
+    :param server: The target server.
+    :param token: The token used for authentication.
+    :return: A text stream of the response body. Must be closed by the caller.
+    """
+    r = get_session(server).get(
         url='{}/resultService/result/{}/CSV'.format(
             server, result_id),
         headers={
             'Content-Type': 'application/json',
             'Authorization': 'Bearer {}'.format(token)
         },
-        verify=app.config['ETL_VERIFY_SSL_CERT']
+        verify=app.config['ETL_VERIFY_SSL_CERT'],
+        stream=True
     )
-    r.raise_for_status()
-    return r.text
+    try:
+        r.raise_for_status()
+    except Exception:
+        r.close()
+        raise
+    r.raw.decode_content = True
+    return io.TextIOWrapper(r.raw, encoding=r.encoding or 'utf-8')
+
+
+def read_csv_chunks(stream: TextIO,
+                    value_dtype: type) -> Iterator[pd.DataFrame]:
+    """Parse the CSV result chunk by chunk while it is downloaded. The values
+    are parsed with their final type, so neither the text nor untyped copies
+    of the data are held in memory.
+    :param stream: The stream returned by get_data(). It is closed afterwards.
+    :param value_dtype: The type of the values, e.g. float or str.
+    :return: Iterator over DataFrames with the columns of the CSV file. At
+    least one, possibly empty, DataFrame is returned.
+    """
+    try:
+        header = next(csv.reader([stream.readline()]), None)
+        if not header or len(header) != 2:
+            error = "Expected a CSV file with exactly two columns " \
+                    "but got header '{}'.".format(header)
+            logger.error(error)
+            raise ValueError(error)
+        dtype = {header[0]: str, header[1]: value_dtype}
+        try:
+            chunks = pd.read_csv(stream, header=None, names=header,
+                                 dtype=dtype, chunksize=CHUNK_SIZE)
+            empty = True
+            for chunk in chunks:
+                empty = False
+                yield chunk
+        except EmptyDataError:
+            pass
+        if empty:
+            yield pd.DataFrame({column: np.array([], dtype=dtype[column])
+                                for column in header}, columns=header)
+    finally:
+        stream.close()
+
+
+def make_data_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Convert a chunk of the CSV result into the Fractalis format.
+    :param chunk: DataFrame as returned by read_csv_chunks().
+    :return: DataFrame with the columns 'id', 'feature' and 'value'.
+    """
+    feature = chunk.columns[1]
+    chunk.columns = ['id', 'value']
+    features = pd.Categorical.from_codes(
+        np.zeros(chunk.shape[0], dtype=np.int8), categories=[feature])
+    chunk.insert(1, 'feature', features)
+    return chunk
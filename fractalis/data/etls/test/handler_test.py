@@ -9,5 +9,8 @@ class TestHandler(ETLHandler):
     def make_label(descriptor):
         return descriptor.get('label')
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
-        return 'abc'
+    def _get_token_for_credentials(self, server: str, auth: dict) -> tuple:
+        return 'abc', None
+
+    def _heartbeat(self):
+        return True
@@ -2,10 +2,10 @@
 tranSMART."""
 
 import logging
-
-import requests
+from typing import Tuple, Union
 
 from fractalis.data.etlhandler import ETLHandler
+from fractalis.data.httppool import get_session
 
 
 logger = logging.getLogger(__name__)
@@ -28,7 +28,8 @@ class TransmartHandler(ETLHandler):
     def make_label(descriptor: dict) -> str:
         return descriptor['label']
 
-    def _get_token_for_credentials(self, server: str, auth: dict) -> str:
+    def _get_token_for_credentials(
+            self, server: str, auth: dict) -> Tuple[str, Union[int, None]]:
         try:
             user = auth['user']
             passwd = auth['passwd']
@@ -39,16 +40,16 @@ class TransmartHandler(ETLHandler):
                     "fields 'user' and 'passwd'."
             logger.error(error)
             raise ValueError(error)
-        r = requests.post(url=server + '/oauth/token',
-                          params={
-                              'grant_type': 'password',
-                              'client_id': 'glowingbear-js',
-                              'client_secret': '',
-                              'username': user,
-                              'password': passwd
-                          },
-                          headers={'Accept': 'application/json'},
-                          timeout=10)
+        r = get_session(server).post(url=server + '/oauth/token',
+                                     params={
+                                         'grant_type': 'password',
+                                         'client_id': 'glowingbear-js',
+                                         'client_secret': '',
+                                         'username': user,
+                                         'password': passwd
+                                     },
+                                     headers={'Accept': 'application/json'},
+                                     timeout=10)
         if r.status_code != 200:
             error = "Could not authenticate. " \
                     "Reason: [{}]: {}".format(r.status_code, r.text)
@@ -56,9 +57,24 @@ class TransmartHandler(ETLHandler):
             raise ValueError(error)
         try:
             response = r.json()
-            return response['access_token']
+            return response['access_token'], response.get('expires_in')
         except Exception:
             error = "Could not authenticate. " \
                     "Got unexpected response: '{}'".format(r.text)
             logger.error(error)
             raise ValueError(error)
+
+    def _heartbeat(self) -> bool:
+        r = get_session(self._server).get(
+            url='{}/v2/studies'.format(self._server),
+            headers={'Accept': 'application/json',
+                     'Authorization': 'Bearer {}'.format(self._token)},
+            timeout=10)
+        if r.status_code in [401, 403]:
+            return False
+        if r.status_code != 200:
+            error = "Target server responded with " \
+                    "status code {}.".format(r.status_code)
+            logger.error(error)
+            raise ValueError(error)
+        return True
@@ -1,12 +1,16 @@
 """This module provides shared functionality to the transmart ETLs."""
 
+import json
 import logging
-import pandas as pd
+from typing import Union
 from urllib.parse import unquote_plus
 
-import requests
+import numpy as np
+import pandas as pd
 
 from fractalis.data.etl import ETL
+from fractalis.data.httppool import get_session
+from fractalis.data.etls.transmart.stream import Hypercube, parse_hypercube
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +18,10 @@ NUMERICAL_FIELD = 'numericValue'
 CATEGORICAL_FIELD = 'stringValue'
 
 
-def extract_data(server: str, descriptor: dict, token: str) -> dict:
-    """Extract data from transmart.
-    :param server: The target server host.
+def get_observation_params(descriptor: dict) -> dict:
+    """Return the query parameters of /v2/observations for a descriptor.
     :param descriptor: Dict describing the data to download.
-    :param token: The token used for authentication.
+    :return: The query parameters.
     """
     params = dict(
         constraint=descriptor['constraint'],
@@ -30,14 +33,26 @@ def extract_data(server: str, descriptor: dict, token: str) -> dict:
 
         if 'biomarker_constraint' in descriptor:
             params['biomarker_constraint'] = descriptor['biomarker_constraint']
+    return params
 
-    r = requests.get(url='{}/v2/observations'.format(server),
-                     params=params,
-                     headers={
-                         'Accept': 'application/json',
-                         'Authorization': 'Bearer {}'.format(token)
-                     },
-                     timeout=2000)
+
+def extract_data(server: str, descriptor: dict, token: str,
+                 stream: bool = False) -> Union[dict, Hypercube]:
+    """Extract data from transmart.
+    :param server: The target server host.
+    :param descriptor: Dict describing the data to download.
+    :param token: The token used for authentication.
+    :param stream: Parse the response incrementally into a Hypercube instead
+    of loading the whole JSON tree into memory.
+    """
+    r = get_session(server).get(url='{}/v2/observations'.format(server),
+                                params=get_observation_params(descriptor),
+                                headers={
+                                    'Accept': 'application/json',
+                                    'Authorization': 'Bearer {}'.format(token)
+                                },
+                                timeout=2000,
+                                stream=stream)
 
     logger.info('URL called: {}'.format(
         unquote_plus(r.url))
@@ -49,58 +64,94 @@ def extract_data(server: str, descriptor: dict, token: str) -> dict:
         raise ValueError(error)
 
     try:
+        if stream:
+            r.raw.decode_content = True
+            return parse_hypercube(r.raw, NUMERICAL_FIELD)
         return r.json()
     except Exception as e:
         logger.exception(e)
         raise ValueError("Got unexpected data format.")
+    finally:
+        r.close()
+
+
+def probe_observations(server: str, descriptor: dict, token: str) -> bool:
+    """Check whether the observations of the descriptor can be extracted.
+    /v2/observations is requested exactly like by extract_data(), so the
+    same access level is required, but the body is never read. Counts are
+    no proof of access, because tranSMART answers them for users with
+    counts only access as well. tranSMART has no way to limit the
+    observations, so the probe starts the whole query on the server and
+    only saves the transfer of the data. It is therefore only used before
+    reusing data that would otherwise be downloaded again.
+    :param server: The target server host.
+    :param descriptor: Dict describing the data to download.
+    :param token: The token used for authentication.
+    :return: True if the observations are accessible, False if access is
+    denied.
+    """
+    r = get_session(server).get(url='{}/v2/observations'.format(server),
+                                params=get_observation_params(descriptor),
+                                headers={
+                                    'Accept': 'application/json',
+                                    'Authorization': 'Bearer {}'.format(token)
+                                },
+                                timeout=60,
+                                stream=True)
+    # closing a response that has not been read discards the body
+    r.close()
+    if r.status_code in [401, 403]:
+        return False
+    if r.status_code != 200:
+        error = "Target server responded with " \
+                "status code {}.".format(r.status_code)
+        logger.error(error)
+        raise ValueError(error)
+    return True
 
 
-def get_dimension_index(obs, dimension):
-    return list(obs['dimensionElements'].keys()).index(dimension)
-
-
-def get_dimension_element(obs, dimension, index):
-    return obs['dimensionElements'][dimension][index]
+def get_counts(server: str, descriptor: dict, token: str) -> dict:
+    """Count the observations and patients matching the constraint of the
+    descriptor. This is answered by tranSMART without reading the data.
+    :param server: The target server host.
+    :param descriptor: Dict describing the data to download.
+    :param token: The token used for authentication.
+    :return: Dict containing 'observationCount' and 'patientCount'.
+    """
+    r = get_session(server).get(
+        url='{}/v2/observations/counts'.format(server),
+        params={'constraint': descriptor['constraint']},
+        headers={
+            'Accept': 'application/json',
+            'Authorization': 'Bearer {}'.format(token)
+        },
+        timeout=60)
+    if r.status_code != 200:
+        error = "Target server responded with " \
+                "status code {}.".format(r.status_code)
+        logger.error(error)
+        raise ValueError(error)
+    return r.json()
 
 
 def transform_clinical(raw_data: dict, value_field: str) -> pd.DataFrame:
-    patient_idx = get_dimension_index(raw_data, 'patient')
-    rows = []
-
-    for entry in raw_data['cells']:
-        patient_element = entry['dimensionIndexes'][patient_idx]
-        patient = get_dimension_element(raw_data, 'patient', patient_element)
-
-        rows.append([
-            patient['inTrialId'],
-            entry[value_field]
-        ])
-
-    df = pd.DataFrame(rows, columns=['id', 'value'])
+    dtype = np.float64 if value_field == NUMERICAL_FIELD else object
+    hypercube = Hypercube.from_json(raw_data, value_field, dtype=dtype)
+    df = pd.DataFrame({
+        'id': hypercube.decode('patient', 'inTrialId'),
+        'value': hypercube.values
+    }, columns=['id', 'value'])
     feature = df.columns[1]
     df.insert(1, 'feature', feature)
     return df
 
 
-def transform_highdim(raw_data: dict):
-    sample_idx = get_dimension_index(raw_data, 'assay')
-    feature_idx = get_dimension_index(raw_data, 'biomarker')
-    rows = []
-
-    for entry in raw_data['cells']:
-        sample_element = entry['dimensionIndexes'][sample_idx]
-        sample = get_dimension_element(raw_data, 'assay', sample_element)
-
-        feature_element = entry['dimensionIndexes'][feature_idx]
-        feature = get_dimension_element(raw_data, 'biomarker', feature_element)
-
-        rows.append([
-            sample['sampleCode'],
-            entry[NUMERICAL_FIELD],
-            feature['label']
-        ])
-
-    df = pd.DataFrame(rows, columns=['id', 'value', 'feature'])
+def transform_highdim(raw_data: Hypercube) -> pd.DataFrame:
+    df = pd.DataFrame({
+        'id': raw_data.decode('assay', 'sampleCode'),
+        'value': raw_data.values,
+        'feature': raw_data.decode('biomarker', 'label')
+    }, columns=['id', 'value', 'feature'])
     return df
 
 
@@ -122,8 +173,23 @@ def create_etl_type(name_, produces_, field_name):
         def can_handle(handler: str, descriptor: dict) -> bool:
             return handler == 'transmart' and descriptor['data_type'] == produces_
 
+        def probe_access(self, server: str, token: str,
+                         descriptor: dict) -> bool:
+            return probe_observations(server=server, descriptor=descriptor,
+                                      token=token)
+
+        def get_version(self, server: str, token: str,
+                        descriptor: dict) -> str:
+            # loading or deleting observations changes the counts
+            counts = get_counts(server=server, descriptor=descriptor,
+                                token=token)
+            return json.dumps(counts, sort_keys=True)
+
         def extract(self, server: str, token: str, descriptor: dict) -> dict:
-            return extract_data(server=server, descriptor=descriptor, token=token)
+            # highdim responses are too large to be parsed at once
+            return extract_data(server=server, descriptor=descriptor,
+                                token=token,
+                                stream=self.produces == 'numerical_array')
 
         def transform(self, raw_data: dict, descriptor: dict) -> pd.DataFrame:
             if self.produces in ('numerical', 'categorical'):
@@ -0,0 +1,158 @@
+"""This module provides a columnar representation of the hypercube returned
+by the tranSMART '/v2/observations' endpoint and an incremental parser for it.
+The response is never held in memory as a whole. Dimension elements are small
+and are parsed into objects, while the cells are collected in compact typed
+arrays, so memory grows with the number of cells instead of with the size of
+the JSON tree."""
+
+import logging
+import importlib
+from array import array
+from typing import BinaryIO, Union
+
+import numpy as np
+import pandas as pd
+from ijson.common import ObjectBuilder
+
+logger = logging.getLogger(__name__)
+
+# ijson backends in order of preference. The C backends need libyajl 2.
+BACKENDS = ['yajl2_c', 'yajl2_cffi', 'python']
+
+
+def load_backend():
+    """Return the fastest ijson backend that is available. The pure python
+    backend is about ten times slower than json.loads(), which makes large
+    highdim data sets take minutes to parse.
+    :return: The ijson backend module.
+    """
+    for name in BACKENDS[:-1]:
+        # the cffi backend raises OSError if libyajl cannot be loaded
+        try:
+            return importlib.import_module('ijson.backends.{}'.format(name))
+        except (ImportError, OSError):
+            pass
+    logger.warning("No C backend of ijson is available. Falling back to the "
+                   "slow pure python backend. Install libyajl 2 and "
+                   "reinstall ijson to enable the 'yajl2_c' backend.")
+    return importlib.import_module('ijson.backends.python')
+
+
+backend = load_backend()
+
+
+class Hypercube:
+    """The cells of a hypercube in columnar form.
+    :ivar dimension_elements: Dict of dimension name and list of elements in
+    the order of the response.
+    :ivar indexes: Integer matrix with one row per cell and one column per
+    dimension index. Missing indexes are -1.
+    :ivar values: The values of the cells. Missing values are NaN.
+    """
+
+    def __init__(self, dimension_elements: dict,
+                 indexes: np.ndarray, values: np.ndarray):
+        self.dimension_elements = dimension_elements
+        self.indexes = indexes
+        self.values = values
+
+    @classmethod
+    def from_json(cls, raw_data: dict, value_field: str,
+                  dtype: type = np.float64) -> 'Hypercube':
+        """Convert an already parsed hypercube into columnar form.
+        :param raw_data: The JSON response as returned by r.json().
+        :param value_field: The cell field containing the value, e.g.
+        'numericValue'.
+        :param dtype: The type of the values, e.g. object for strings.
+        :return: The hypercube.
+        """
+        cells = raw_data.get('cells', [])
+        indexes = pd.DataFrame([cell['dimensionIndexes'] for cell in cells])
+        indexes = indexes.fillna(-1).values.astype(np.int64)
+        values = np.array([cell.get(value_field) for cell in cells],
+                          dtype=dtype)
+        return cls(dimension_elements=raw_data.get('dimensionElements', {}),
+                   indexes=indexes,
+                   values=values)
+
+    def get_dimension_index(self, dimension: str) -> int:
+        """Return the column of 'indexes' referencing the given dimension.
+        :param dimension: Name of the dimension, e.g. 'patient'.
+        :return: The column index.
+        """
+        return list(self.dimension_elements.keys()).index(dimension)
+
+    def decode(self, dimension: str, attribute: str) -> pd.Categorical:
+        """Resolve the given attribute of the dimension element referenced
+        by every cell. Each element is looked up once and the cells are
+        mapped to it with integer indexing.
+        :param dimension: Name of the dimension, e.g. 'patient'.
+        :param attribute: Attribute of the elements, e.g. 'inTrialId'.
+        :return: The labels of the cells. Missing elements are NaN.
+        """
+        labels = [element[attribute]
+                  for element in self.dimension_elements[dimension]]
+        # elements with equal labels share a category
+        element_codes, categories = pd.factorize(
+            np.array(labels, dtype=object))
+        element_codes = np.append(element_codes, -1)
+        if self.indexes.shape[0]:
+            codes = self.indexes[:, self.get_dimension_index(dimension)]
+        else:
+            codes = np.empty(0, dtype=np.int64)
+        # -1 (missing element) selects the appended -1
+        return pd.Categorical.from_codes(element_codes[codes], categories)
+
+
+def _number(value: object) -> Union[int, float]:
+    # the ijson backends return Decimal for non-integers
+    return value if isinstance(value, int) else float(value)
+
+
+def parse_hypercube(stream: BinaryIO, value_field: str) -> Hypercube:
+    """Parse a hypercube from a stream of JSON encoded bytes.
+    :param stream: File-like object, e.g. the raw body of a response.
+    :param value_field: The cell field containing the value, e.g.
+    'numericValue'.
+    :return: The parsed hypercube.
+    """
+    dimension_elements = {}
+    indexes = array('q')
+    values = array('d')
+    width = None
+    cell_indexes = []
+    cell_value = float('nan')
+    builder = None
+    value_prefix = 'cells.item.{}'.format(value_field)
+
+    for prefix, event, value in backend.parse(stream):
+        if builder is not None:
+            if prefix == 'dimensionElements' and event == 'end_map':
+                dimension_elements = builder.value
+                builder = None
+            else:
+                builder.event(event, value)
+        elif prefix == 'cells.item.dimensionIndexes.item':
+            cell_indexes.append(-1 if value is None else value)
+        elif prefix == value_prefix and event == 'number':
+            cell_value = _number(value)
+        elif prefix == 'cells.item' and event == 'end_map':
+            if width is None:
+                width = len(cell_indexes)
+            elif len(cell_indexes) != width:
+                raise ValueError("Cells have a varying number of "
+                                 "dimension indexes.")
+            indexes.extend(cell_indexes)
+            values.append(cell_value)
+            cell_indexes = []
+            cell_value = float('nan')
+        elif prefix == 'dimensionElements' and event == 'start_map':
+            builder = ObjectBuilder()
+            builder.event(event, value)
+
+    indexes = np.frombuffer(indexes, dtype=np.int64) if indexes \
+        else np.empty(0, dtype=np.int64)
+    return Hypercube(dimension_elements=dimension_elements,
+                     indexes=indexes.reshape(len(values), width or 0),
+                     values=np.frombuffer(values, dtype=np.float64)
+                     if values else np.empty(0, dtype=np.float64))
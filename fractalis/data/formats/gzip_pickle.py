@@ -0,0 +1,40 @@
+"""This module provides the 'pickle' cache format."""
+
+import gzip
+import pickle
+from typing import List
+
+import pandas as pd
+
+from fractalis.data.cache import CacheFormat
+
+
+class PickleFormat(CacheFormat):
+    """Implements CacheFormat using gzip compressed pickles. This is the
+    format that has been used by Fractalis before other formats existed.
+    Filters are ignored because the whole file has to be decompressed anyway.
+    """
+
+    name = 'pickle'
+    magic = b'\x1f\x8b'
+
+    def write(self, data_frame: pd.DataFrame, file_path: str) -> None:
+        data_frame.to_pickle(file_path, compression='gzip')
+
+    def read(self, file_path: str, columns: List[str] = None,
+             filters: dict = None) -> pd.DataFrame:
+        data_frame = pd.read_pickle(file_path, compression='gzip')
+        if columns is not None:
+            data_frame = data_frame[columns]
+        return data_frame
+
+    def serialize(self, data_frame: pd.DataFrame) -> bytes:
+        return gzip.compress(pickle.dumps(data_frame,
+                                          protocol=pickle.HIGHEST_PROTOCOL))
+
+    def deserialize(self, buffer: bytes, columns: List[str] = None,
+                    filters: dict = None) -> pd.DataFrame:
+        data_frame = pickle.loads(gzip.decompress(buffer))
+        if columns is not None:
+            data_frame = data_frame[columns]
+        return data_frame
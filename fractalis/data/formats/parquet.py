@@ -0,0 +1,241 @@
+"""This module provides the 'parquet' cache format."""
+
+import os
+import json
+from bisect import bisect_left
+from typing import List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow
+import pyarrow.parquet
+
+from fractalis.data.cache import CacheFormat, CacheWriter
+
+INDEX_KEY = b'fractalis.index'
+
+
+class ParquetFormat(CacheFormat):
+    """Implements CacheFormat using the columnar Apache Parquet format.
+    Columns can be read individually and are decoded by multiple threads.
+
+    Data with more than one feature are sorted by feature and written in
+    row groups. The range of features in every row group is stored in the
+    file metadata, so feature filters only read the matching row groups.
+    'category' columns are restored as such."""
+
+    name = 'parquet'
+    magic = b'PAR1'
+    row_group_size = 2 ** 14
+
+    def can_write(self, data_frame: pd.DataFrame) -> bool:
+        # the index is not stored and parquet only supports string columns
+        return isinstance(data_frame.index, pd.RangeIndex) and \
+            data_frame.columns.is_unique and \
+            all(isinstance(column, str) for column in data_frame.columns)
+
+    def open_writer(self, file_path: str) -> 'ParquetWriter':
+        return ParquetWriter(self, file_path)
+
+    def write(self, data_frame: pd.DataFrame, file_path: str) -> None:
+        pyarrow.parquet.write_table(self._to_table(data_frame), file_path,
+                                    row_group_size=self.row_group_size)
+
+    def read(self, file_path: str, columns: List[str] = None,
+             filters: dict = None) -> pd.DataFrame:
+        return self._read(file_path, columns, filters)
+
+    def serialize(self, data_frame: pd.DataFrame) -> bytes:
+        sink = pyarrow.BufferOutputStream()
+        pyarrow.parquet.write_table(self._to_table(data_frame), sink,
+                                    row_group_size=self.row_group_size)
+        return sink.getvalue()
+
+    def deserialize(self, buffer: bytes, columns: List[str] = None,
+                    filters: dict = None) -> pd.DataFrame:
+        return self._read(pyarrow.BufferReader(buffer), columns, filters)
+
+    def _sort_by_feature(
+            self, data_frame: pd.DataFrame) -> Tuple[pd.DataFrame,
+                                                     Union[List, None]]:
+        """Sort the data by feature and return the range of features of
+        every row group or None if the features are not strings."""
+        if 'feature' not in data_frame.columns or not data_frame.shape[0]:
+            return data_frame, None
+        # np.asarray also decodes 'category' columns
+        features = np.asarray(data_frame['feature'], dtype=object)
+        if pd.api.types.infer_dtype(features) != 'string':
+            return data_frame, None
+        if not (features[1:] >= features[:-1]).all():
+            order = np.argsort(features, kind='mergesort')
+            data_frame = data_frame.take(order).reset_index(drop=True)
+            features = features[order]
+        index = [[features[start],
+                  features[min(start + self.row_group_size,
+                               len(features)) - 1]]
+                 for start in range(0, len(features), self.row_group_size)]
+        return data_frame, index
+
+    @staticmethod
+    def _add_index(table: pyarrow.Table, index: List) -> pyarrow.Table:
+        metadata = dict(table.schema.metadata or {})
+        metadata[INDEX_KEY] = json.dumps(index).encode('utf-8')
+        return table.replace_schema_metadata(metadata)
+
+    def _to_table(self, data_frame: pd.DataFrame) -> pyarrow.Table:
+        data_frame, index = self._sort_by_feature(data_frame)
+        table = pyarrow.Table.from_pandas(data_frame, preserve_index=False)
+        # an index is useless if there is only a single feature
+        if index is not None and index[0][0] != index[-1][1]:
+            table = self._add_index(table, index)
+        return table
+
+    @staticmethod
+    def _select_row_groups(parquet_file: pyarrow.parquet.ParquetFile,
+                           filters: Union[dict, None]) -> Union[List, None]:
+        """Return the row groups that can contain the filtered features or
+        None if all row groups have to be read."""
+        if not filters or not filters.get('feature'):
+            return None
+        wanted = filters['feature']
+        if not all(isinstance(feature, str) for feature in wanted):
+            return None
+        metadata = parquet_file.schema.to_arrow_schema().metadata or {}
+        if INDEX_KEY not in metadata:
+            return None
+        index = json.loads(metadata[INDEX_KEY].decode('utf-8'))
+        wanted = sorted(wanted)
+        row_groups = []
+        for i, (first, last) in enumerate(index):
+            position = bisect_left(wanted, first)
+            if position < len(wanted) and wanted[position] <= last:
+                row_groups.append(i)
+        return row_groups
+
+    def _read(self, source: object, columns: Union[List[str], None],
+              filters: Union[dict, None]) -> pd.DataFrame:
+        parquet_file = pyarrow.parquet.ParquetFile(source)
+        row_groups = self._select_row_groups(parquet_file, filters)
+        if row_groups is None:
+            table = parquet_file.read(columns=columns, use_threads=True)
+        elif not row_groups:
+            table = parquet_file.read_row_group(
+                0, columns=columns, use_threads=True).slice(0, 0)
+        else:
+            table = pyarrow.concat_tables([
+                parquet_file.read_row_group(i, columns=columns,
+                                            use_threads=True)
+                for i in row_groups])
+        return table.to_pandas(categories=self._get_categories(table),
+                               use_threads=True)
+
+    @staticmethod
+    def _mark_categories(table: pyarrow.Table,
+                         columns: List[str]) -> pyarrow.Table:
+        """Record the given columns as 'category' typed in the pandas metadata
+        of a table, so they are restored as such by _get_categories()."""
+        metadata = dict(table.schema.metadata or {})
+        if not columns or b'pandas' not in metadata:
+            return table
+        pandas_metadata = json.loads(metadata[b'pandas'].decode('utf-8'))
+        for column in pandas_metadata['columns']:
+            if column['name'] in columns:
+                column['pandas_type'] = 'categorical'
+                column['metadata'] = {'num_categories': None,
+                                      'ordered': False}
+        metadata[b'pandas'] = json.dumps(pandas_metadata).encode('utf-8')
+        return table.replace_schema_metadata(metadata)
+
+    @staticmethod
+    def _get_categories(table: pyarrow.Table) -> List[str]:
+        """Return the columns that have been 'category' typed when written.
+        Parquet stores them dictionary encoded but decodes them on read."""
+        metadata = table.schema.metadata or {}
+        if b'pandas' not in metadata:
+            return []
+        columns = json.loads(metadata[b'pandas'].decode('utf-8'))['columns']
+        return [column['name'] for column in columns
+                if column['pandas_type'] == 'categorical']
+
+
+class ParquetWriter(CacheWriter):
+    """Writes every chunk sorted by feature into its own row groups. The
+    chunks are written to a temporary file first and copied into the final
+    file row group by row group on close(), because pyarrow fixes the file
+    metadata containing the feature index when a file is opened.
+
+    The categories of 'category' columns differ from chunk to chunk, but
+    pyarrow makes them part of the schema. These columns are therefore
+    written as strings and only marked as 'category' in the metadata, which
+    is how parquet stores them anyway."""
+
+    def __init__(self, parquet_format: ParquetFormat, file_path: str):
+        self.format = parquet_format
+        self.file_path = file_path
+        self.partial_path = '{}.partial'.format(file_path)
+        self.schema = None
+        self.index = []
+        self._writer = None
+
+    def append(self, data_frame: pd.DataFrame) -> None:
+        if not data_frame.shape[0]:
+            return
+        data_frame = data_frame.copy(deep=False)
+        categories = []
+        for column in data_frame.columns:
+            if pd.api.types.is_categorical_dtype(data_frame[column]):
+                categories.append(column)
+                data_frame[column] = np.asarray(data_frame[column],
+                                                dtype=object)
+        data_frame, index = self.format._sort_by_feature(data_frame)
+        table = pyarrow.Table.from_pandas(data_frame, schema=self.schema,
+                                          preserve_index=False)
+        if self._writer is None:
+            table = self.format._mark_categories(table, categories)
+            self.schema = table.schema
+            self._writer = pyarrow.parquet.ParquetWriter(self.partial_path,
+                                                         self.schema)
+        else:
+            table = table.replace_schema_metadata(self.schema.metadata)
+        self._writer.write_table(table,
+                                 row_group_size=self.format.row_group_size)
+        if index is None or self.index is None:
+            self.index = None
+        else:
+            self.index.extend(index)
+
+    def close(self) -> None:
+        if self._writer is None:
+            error = "Cannot write a cache file without any data."
+            raise ValueError(error)
+        self._writer.close()
+        self._writer = None
+        if not self.index or \
+                len({feature for bounds in self.index
+                     for feature in bounds}) == 1:
+            os.replace(self.partial_path, self.file_path)
+            return
+        source = pyarrow.parquet.ParquetFile(self.partial_path)
+        writer = None
+        try:
+            for i in range(source.num_row_groups):
+                table = self.format._add_index(
+                    source.read_row_group(i, use_threads=True), self.index)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(self.file_path,
+                                                           table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.remove(self.partial_path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for path in [self.partial_path, self.file_path]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
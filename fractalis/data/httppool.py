@@ -0,0 +1,169 @@
+"""This module provides the pooled HTTP sessions used by all ETLs and ETL
+handlers to communicate with data sources. Every worker process keeps one
+session per server, so consecutive requests to the same server reuse open
+connections instead of establishing a new TCP and TLS connection each time."""
+
+import os
+import time
+import logging
+import weakref
+import threading
+from typing import Tuple, Union
+from urllib.parse import urlparse
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fractalis import app
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_retired = {}
+_pid = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_server_key(server: str) -> str:
+    """Return the key identifying the connection pool of a server.
+    :param server: The server url, possibly including a path.
+    :return: Scheme and network location of the server.
+    """
+    url = urlparse(server)
+    if not url.netloc:
+        return server
+    return '{}://{}'.format(url.scheme, url.netloc)
+
+
+def _track(response: requests.Response, *args, **kwargs) -> None:
+    responses = getattr(_local, 'responses', None)
+    if responses is not None:
+        responses.append(response.raw)
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    # sessions are shared by all users of this process, so cookies set by a
+    # server, e.g. after a login, must never be stored and sent along with
+    # the requests of someone else. Cookies passed to a request still apply.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.hooks['response'].append(_track)
+    adapter = HTTPAdapter(pool_maxsize=app.config['ETL_HTTP_POOL_SIZE'])
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not app.config['ETL_HTTP_KEEP_ALIVE']:
+        session.headers['Connection'] = 'close'
+    # retired sessions are closed by the last thread dropping them. The
+    # connections of a response that is still being read are closed once
+    # they are released.
+    weakref.finalize(session, adapter.close)
+    return session
+
+
+def _count(session: requests.Session) -> dict:
+    counts = {'requests': 0, 'connections': 0}
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools[pool_key]
+            counts['requests'] += pool.num_requests
+            counts['connections'] += pool.num_connections
+    return counts
+
+
+def _retire(server_key: str) -> None:
+    # other threads might still use the session, so it is not closed here
+    session = _sessions.pop(server_key)[0]
+    counts = _count(session)
+    retired = _retired.setdefault(server_key,
+                                  {'requests': 0, 'connections': 0})
+    retired['requests'] += counts['requests']
+    retired['connections'] += counts['connections']
+
+
+def get_session(server: str) -> requests.Session:
+    """Return the session of this process for the given server. Sessions that
+    have been idle for longer than ETL_HTTP_KEEP_ALIVE seconds are replaced,
+    because the server has most likely dropped their connections already.
+    :param server: The server url, possibly including a path.
+    :return: The session to send requests with.
+    """
+    global _pid
+    server_key = get_server_key(server)
+    keep_alive = app.config['ETL_HTTP_KEEP_ALIVE']
+    now = time.monotonic()
+    with _lock:
+        if _pid != os.getpid():
+            # connections must never be shared with a forked process
+            _sessions.clear()
+            _retired.clear()
+            _pid = os.getpid()
+        entry = _sessions.get(server_key)
+        if entry is not None and keep_alive and now - entry[1] > keep_alive:
+            logger.debug("Replacing idle session for '{}'.".format(server_key))
+            _retire(server_key)
+            entry = None
+        if entry is None:
+            entry = [_make_session(), now]
+            _sessions[server_key] = entry
+        entry[1] = now
+        return entry[0]
+
+
+def get_stats() -> dict:
+    """Return the connection statistics of this process per server.
+    :return: Dict of server and the number of requests sent, connections
+    established and requests that reused an open connection.
+    """
+    with _lock:
+        stats = {key: dict(counts) for key, counts in _retired.items()}
+        for server_key, entry in _sessions.items():
+            counts = _count(entry[0])
+            total = stats.setdefault(server_key,
+                                     {'requests': 0, 'connections': 0})
+            total['requests'] += counts['requests']
+            total['connections'] += counts['connections']
+    for counts in stats.values():
+        counts['reused'] = max(counts['requests'] - counts['connections'], 0)
+    return stats
+
+
+def close_all() -> None:
+    """Close all sessions of this process and reset the statistics."""
+    with _lock:
+        for entry in _sessions.values():
+            entry[0].close()
+        _sessions.clear()
+        _retired.clear()
+
+
+def start_tracking() -> None:
+    """Start counting the bytes received by this thread, e.g. for the
+    progress of an ETL. Tracking ends with the next call of stop_tracking()."""
+    _local.responses = []
+
+
+def stop_tracking() -> None:
+    """Stop counting the bytes received by this thread."""
+    _local.responses = None
+
+
+def get_received_bytes() -> Tuple[int, Union[int, None]]:
+    """Return the bytes received by this thread since start_tracking(). The
+    bodies of streamed responses count as far as they have been read.
+    :return: The number of bytes received and the number of bytes expected in
+    total or None if a response has no Content-Length.
+    """
+    received = 0
+    expected = 0
+    for raw in getattr(_local, 'responses', None) or []:
+        received += raw.tell()
+        length = raw.headers.get('Content-Length')
+        if expected is not None and length is not None:
+            expected += int(length)
+        else:
+            expected = None
+    return received, expected
@@ -15,6 +15,8 @@ class CategoricalIntegrityCheck(IntegrityCheck):
     """Implements IntegrityCheck for 'categorical' data type."""
 
     data_type = 'categorical'
+    unique_columns = ['id']
+    constant_columns = ['feature']
 
     def check(self, data: object) -> None:
         if not isinstance(data, pd.DataFrame):
@@ -26,12 +28,14 @@ class CategoricalIntegrityCheck(IntegrityCheck):
                     "'id', 'feature', and 'value'."
             logger.error(error)
             raise ValueError(error)
-        if data['id'].dtype != np.object:
-            error = "'id' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['id']):
+            error = "'id' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
-        if data['feature'].dtype != np.object:
-            error = "'feature' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['feature']):
+            error = "'feature' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
         if data['value'].dtype != np.object:
@@ -15,6 +15,8 @@ class NumericalIntegrityCheck(IntegrityCheck):
     """Implements IntegrityCheck for 'numerical' data type."""
 
     data_type = 'numerical'
+    unique_columns = ['id']
+    constant_columns = ['feature']
 
     def check(self, data: object) -> None:
         if not isinstance(data, pd.DataFrame):
@@ -26,12 +28,14 @@ class NumericalIntegrityCheck(IntegrityCheck):
                     "'id', 'feature', and 'value'."
             logger.error(error)
             raise ValueError(error)
-        if data['id'].dtype != np.object:
-            error = "'id' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['id']):
+            error = "'id' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
-        if data['feature'].dtype != np.object:
-            error = "'feature' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['feature']):
+            error = "'feature' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
         if data['value'].dtype != np.int \
@@ -15,6 +15,7 @@ class NumericalArrayIntegrityCheck(IntegrityCheck):
     """Implements IntegrityCheck for 'numerical_array' data type."""
 
     data_type = 'numerical_array'
+    unique_columns = ['id', 'feature']
 
     def check(self, data: object) -> None:
         if not isinstance(data, pd.DataFrame):
@@ -26,12 +27,14 @@ class NumericalArrayIntegrityCheck(IntegrityCheck):
                     "'id', 'feature', and 'value'."
             logger.error(error)
             raise ValueError(error)
-        if data['id'].dtype != np.object:
-            error = "'id' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['id']):
+            error = "'id' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
-        if data['feature'].dtype != np.object:
-            error = "'feature' column must be of type 'object' ('string')."
+        if not self.is_label_column(data['feature']):
+            error = "'feature' column must be of type 'object' ('string') " \
+                    "or 'category'."
             logger.error(error)
             raise ValueError(error)
         if data['value'].dtype != np.int \
@@ -39,7 +42,7 @@ class NumericalArrayIntegrityCheck(IntegrityCheck):
             error = "'value' column must be of type 'np.int' or 'np.float'."
             logger.error(error)
             raise ValueError(error)
-        if data.groupby(['id', 'feature']).count().shape[0] != data.shape[0]:
+        if data.duplicated(['id', 'feature']).any():
             error = "Every combination of 'id' and 'feature' must be unique."
             logger.error(error)
             raise ValueError(error)
@@ -0,0 +1,98 @@
+"""This module provides a dense matrix representation of 'numerical_array'
+data. The matrix is stored next to the cache file as a float array that can be
+memory-mapped, together with a sidecar file containing the row (feature) and
+column (id) labels. Analytic tasks can therefore use a 'feature x id' matrix
+without unpickling or pivoting the long Fractalis format."""
+
+import os
+import json
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def get_matrix_paths(file_path: str) -> List[str]:
+    """Return the locations of the matrix and its labels.
+    :param file_path: The location of the associated cache file.
+    :return: The path of the matrix file and the path of the label file.
+    """
+    return ['{}.matrix.npy'.format(file_path),
+            '{}.matrix.json'.format(file_path)]
+
+
+def has_matrix(file_path: str) -> bool:
+    """Check whether a matrix has been written for the given cache file.
+    :param file_path: The location of the associated cache file.
+    :return: True if the matrix and its labels exist.
+    """
+    return all(os.path.exists(path) for path in get_matrix_paths(file_path))
+
+
+def pivot_array(data_frame: pd.DataFrame) -> pd.DataFrame:
+    """Pivot data in the Fractalis long format into a 'feature x id' matrix.
+    Unused categories of dictionary encoded labels are dropped first so they
+    do not turn into empty rows or columns. The labels of the matrix are
+    plain (non categorical) indices.
+    :param data_frame: DataFrame with the columns 'id', 'feature', 'value'.
+    :return: DataFrame with features as index and ids as columns.
+    """
+    labels = {}
+    for column in ['feature', 'id']:
+        if pd.api.types.is_categorical_dtype(data_frame[column]):
+            labels[column] = \
+                data_frame[column].cat.remove_unused_categories()
+    if labels:
+        data_frame = data_frame.assign(**labels)
+    df = data_frame.pivot(index='feature', columns='id', values='value')
+    df.index = df.index.astype(object)
+    df.columns = df.columns.astype(object)
+    return df
+
+
+def write_matrix(data_frame: pd.DataFrame, file_path: str) -> None:
+    """Pivot data in the Fractalis long format and write the resulting
+    'feature x id' matrix next to the given cache file.
+    :param data_frame: DataFrame with the columns 'id', 'feature', 'value'.
+    :param file_path: The location of the associated cache file.
+    """
+    matrix_path, labels_path = get_matrix_paths(file_path)
+    df = pivot_array(data_frame)
+    labels = {
+        'features': df.index.tolist(),
+        'ids': df.columns.tolist()
+    }
+    with open(labels_path, 'w') as f:
+        json.dump(labels, f)
+    np.save(matrix_path, np.ascontiguousarray(df.values, dtype=np.float64))
+
+
+def read_matrix(file_path: str, features: List[str] = None,
+                ids: List[str] = None) -> pd.DataFrame:
+    """Memory-map the matrix associated with the given cache file. If neither
+    features nor ids are given the returned DataFrame is a read-only view of
+    the file and nothing is copied. Otherwise only the selected rows and
+    columns are read.
+    :param file_path: The location of the associated cache file.
+    :param features: Only keep these rows. All rows if None or empty.
+    :param ids: Only keep these columns. All columns if None or empty.
+    :return: DataFrame with features as index and ids as columns.
+    """
+    matrix_path, labels_path = get_matrix_paths(file_path)
+    with open(labels_path, 'r') as f:
+        labels = json.load(f)
+    index = pd.Index(labels['features'], name='feature')
+    columns = pd.Index(labels['ids'], name='id')
+    matrix = np.load(matrix_path, mmap_mode='r')
+    if features:
+        rows = np.flatnonzero(index.isin(features))
+        index = index[rows]
+        matrix = matrix[rows]
+    if ids:
+        cols = np.flatnonzero(columns.isin(ids))
+        columns = columns[cols]
+        matrix = matrix[:, cols]
+    return pd.DataFrame(matrix, index=index, columns=columns, copy=False)
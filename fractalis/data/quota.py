@@ -0,0 +1,103 @@
+"""This module keeps track of the size of the data cache on disk and of the
+last time each data set has been used. The janitor uses this information to
+evict the least recently used data sets once FRACTALIS_CACHE_QUOTA is
+exceeded."""
+
+import os
+import time
+import logging
+from glob import glob
+from typing import List
+
+from fractalis import redis
+
+logger = logging.getLogger(__name__)
+
+ACCESS_KEY = 'data-access'
+STATS_KEY = 'data-cache-stats'
+
+
+def touch(task_id: str) -> None:
+    """Record that the data of the given task have just been used.
+    :param task_id: The id associated with a data state.
+    """
+    redis.hset(ACCESS_KEY, task_id, time.time())
+
+
+def forget(task_ids: List[str]) -> None:
+    """Stop tracking the access time of the given tasks.
+    :param task_ids: The ids associated with removed data states.
+    """
+    if task_ids:
+        redis.hdel(ACCESS_KEY, *task_ids)
+
+
+def prune(tracked_task_ids: List[str]) -> None:
+    """Stop tracking the access time of all tasks that do not exist anymore.
+    :param tracked_task_ids: The data task ids that still exist.
+    """
+    tracked_task_ids = set(tracked_task_ids)
+    forget([task_id for task_id in redis.hkeys(ACCESS_KEY)
+            if task_id not in tracked_task_ids])
+
+
+def get_least_recently_used(task_ids: List[str]) -> List[str]:
+    """Sort the given tasks by the time their data have been used last.
+    Tasks that have never been used come first.
+    :param task_ids: The ids associated with data states.
+    :return: The task ids, least recently used first.
+    """
+    access = redis.hgetall(ACCESS_KEY)
+    return sorted(task_ids, key=lambda task_id: float(access.get(task_id, 0)))
+
+
+def get_file_size(file_path: str) -> int:
+    """Return the size of a cache file including all files written next to
+    it, e.g. the matrix of 'numerical_array' data.
+    :param file_path: Path of the cache file.
+    :return: Size in bytes.
+    """
+    size = 0
+    for path in [file_path] + glob('{}.*'.format(file_path)):
+        try:
+            size += os.path.getsize(path)
+        except OSError:
+            pass
+    return size
+
+
+def get_cache_size(data_dir: str) -> int:
+    """Return the size of all files in the data directory.
+    :param data_dir: The directory containing the cache files.
+    :return: Size in bytes.
+    """
+    size = 0
+    for root, _, files in os.walk(data_dir):
+        for file in files:
+            try:
+                size += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return size
+
+
+def record_stats(size: int, evictions: int) -> dict:
+    """Store the current cache size and add to the number of evictions.
+    :param size: The current size of the cache in bytes.
+    :param evictions: The number of data sets evicted in this run.
+    :return: The stored statistics.
+    """
+    redis.hset(STATS_KEY, 'size', size)
+    total = redis.hincrby(STATS_KEY, 'evictions', evictions)
+    return {'size': size, 'evictions': evictions, 'total_evictions': total}
+
+
+def get_stats() -> dict:
+    """Return the statistics recorded by the janitor.
+    :return: Dict containing cache size and the total number of evictions.
+    """
+    stats = redis.hgetall(STATS_KEY)
+    return {
+        'size': int(stats.get('size', 0)),
+        'total_evictions': int(stats.get('evictions', 0))
+    }
@@ -0,0 +1,116 @@
+"""This module provides per-feature summary statistics of numerical data.
+Summaries are computed once when the data are loaded and stored next to the
+cache file, so feature rankings and previews do not need to read the data."""
+
+import logging
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from fractalis.data.cache import read_cache
+
+logger = logging.getLogger(__name__)
+
+# quantiles stored in the summary and the columns they are stored in
+QUANTILES = [(0.25, 'q25'), (0.5, 'median'), (0.75, 'q75')]
+SUMMARY_COLUMNS = ['feature', 'count', 'mean', 'variance', 'min', 'max'] + \
+                  [column for _, column in QUANTILES]
+# maximum number of values read at once by compute_cache_summary()
+BATCH_ROWS = 2 ** 20
+
+
+def get_summary_path(file_path: str) -> str:
+    """Return the location of the summary for the given cache file.
+    :param file_path: The location of the associated cache file.
+    :return: The path of the summary file.
+    """
+    return '{}.summary'.format(file_path)
+
+
+def compute_summary(data_frame: pd.DataFrame) -> pd.DataFrame:
+    """Compute count, mean, variance, min, max and quantiles of the values of
+    every feature. Missing values are ignored and the variance is the
+    population variance like np.var().
+    :param data_frame: DataFrame with the columns 'id', 'feature', 'value'.
+    :return: DataFrame with one row per feature and the SUMMARY_COLUMNS.
+    """
+    grouped = data_frame['value'].groupby(data_frame['feature'])
+    summary = pd.DataFrame({
+        'count': grouped.count(),
+        'mean': grouped.mean(),
+        'variance': grouped.var(ddof=0),
+        'min': grouped.min(),
+        'max': grouped.max()
+    })
+    for q, column in QUANTILES:
+        summary[column] = grouped.quantile(q)
+    # categorical features are grouped by all categories, even unused ones
+    summary = summary[summary['count'] > 0]
+    summary['feature'] = np.asarray(summary.index, dtype=object)
+    summary['count'] = summary['count'].astype(np.int64)
+    return summary[SUMMARY_COLUMNS].reset_index(drop=True)
+
+
+def compute_cache_summary(file_path: str,
+                          feature_rows: Dict[str, int]) -> pd.DataFrame:
+    """Compute the summary of a cache file without reading all its values at
+    once. Features are read in batches of up to BATCH_ROWS values, for which
+    the parquet format only reads the row groups that can contain them. The
+    values of a single feature are always read at once.
+    :param file_path: The location of the cache file.
+    :param feature_rows: Dict of every feature and its number of values.
+    :return: DataFrame with one row per feature and the SUMMARY_COLUMNS.
+    """
+    batches = [[]]
+    rows = 0
+    for feature in sorted(feature_rows, key=str):
+        if not feature_rows[feature]:
+            continue
+        if batches[-1] and rows + feature_rows[feature] > BATCH_ROWS:
+            batches.append([])
+            rows = 0
+        batches[-1].append(feature)
+        rows += feature_rows[feature]
+    summaries = []
+    for batch in batches:
+        values = read_cache(file_path, columns=['feature', 'value'],
+                            filters={'feature': batch})
+        summaries.append(compute_summary(
+            values[values['feature'].isin(batch)]))
+    return pd.concat(summaries, ignore_index=True)
+
+
+def merge_summaries(summaries: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merge summaries of several data sets into one. Count, mean, variance,
+    min and max of features present in more than one summary are pooled
+    exactly. Quantiles cannot be pooled, so they are NaN for these features.
+    :param summaries: List of DataFrames as returned by compute_summary().
+    :return: DataFrame with one row per feature and the SUMMARY_COLUMNS.
+    """
+    if len(summaries) == 1:
+        return summaries[0]
+    df = pd.concat(summaries)
+    weighted = pd.DataFrame({
+        'feature': df['feature'].astype(object),
+        'count': df['count'],
+        'sum': df['count'] * df['mean'],
+        'squares': df['count'] * (df['variance'] + df['mean'] ** 2)
+    })
+    grouped = weighted.groupby('feature')
+    sums = grouped.sum()
+    summary = pd.DataFrame({
+        'count': sums['count'],
+        'mean': sums['sum'] / sums['count'],
+        'min': df.groupby(weighted['feature'])['min'].min(),
+        'max': df.groupby(weighted['feature'])['max'].max()
+    })
+    variance = sums['squares'] / sums['count'] - summary['mean'] ** 2
+    # rounding errors can make the variance of constant data negative
+    summary['variance'] = variance.clip(lower=0)
+    single = grouped.size() == 1
+    for _, column in QUANTILES:
+        quantiles = df.groupby(weighted['feature'])[column].first()
+        summary[column] = quantiles.where(single)
+    summary['feature'] = summary.index
+    return summary[SUMMARY_COLUMNS].reset_index(drop=True)
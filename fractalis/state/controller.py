@@ -87,6 +87,12 @@ def request_state_access(state_id: UUID) -> Tuple[Response, int]:
     etl_handler = ETLHandler.factory(handler=meta_state['handler'],
                                      server=meta_state['server'],
                                      auth=payload['auth'])
+    # fail fast instead of submitting ETLs that cannot succeed
+    if etl_handler.verify_access() is False:
+        error = "The server '{}' rejected the given credentials.".format(
+            meta_state['server'])
+        logger.error(error)
+        return jsonify({'error': error}), 403
     task_ids = etl_handler.handle(descriptors=meta_state['descriptors'],
                                   data_tasks=session['data_tasks'],
                                   use_existing=True,
@@ -122,7 +128,7 @@ def get_state_data(state_id: UUID) -> Tuple[Response, int]:
     state = json.dumps(meta_state['state'])
     for task_id in session['state_access'][state_id]:
         async_result = celery.AsyncResult(task_id)
-        if async_result.state == 'SUBMITTED':
+        if async_result.state in ['SUBMITTED', 'RETRY', 'PROGRESS']:
             return jsonify({'message': 'ETLs are still running.'}), 202
         elif async_result.state == 'SUCCESS':
             continue
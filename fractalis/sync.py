@@ -6,9 +6,12 @@ db and the file system.
 import os
 import json
 import logging
+from glob import glob
 from shutil import rmtree
 
 from fractalis import redis, app, celery
+from fractalis.analytics.framecache import frame_cache
+from fractalis.data import blobstore, quota
 
 
 logger = logging.getLogger(__name__)
@@ -24,16 +27,23 @@ def remove_data(task_id: str) -> None:
     value = redis.get(key)
     celery.control.revoke(task_id, terminate=True, signal='SIGUSR1')
     redis.delete(key)
+    frame_cache.invalidate(task_id)
+    quota.forget([task_id])
     if value:
         data_state = json.loads(value)
-        remove_file(data_state['file_path'])
+        if data_state.get('blob'):
+            # shared data are only removed once they are not used anymore
+            blobstore.release(data_state['blob'], task_id)
+        else:
+            remove_file(data_state['file_path'])
     else:
         logger.warning("Can't delete file for task id '{}',because there is "
                        "no associated entry in Redis.".format(task_id))
 
 
 def remove_file(file_path: str) -> None:
-    """Remove the file for the given file path.
+    """Remove the file for the given file path and all files that have been
+    written next to it, e.g. the matrix of 'numerical_array' data.
     :param file_path: Path of file to remove.
     """
     try:
@@ -41,6 +51,11 @@ def remove_file(file_path: str) -> None:
     except FileNotFoundError:
         logger.warning("Attempted to remove file '{}', "
                        "but it does not exist.".format(file_path))
+    for companion_path in glob('{}.*'.format(file_path)):
+        try:
+            os.remove(companion_path)
+        except FileNotFoundError:
+            pass
 
 
 def cleanup_all() -> None:
@@ -57,7 +72,7 @@ def cleanup_all() -> None:
         task_id = data_state.get('task_id')
         if task_id is not None:
             async_result = celery.AsyncResult(task_id)
-            if async_result.state == 'SUBMITTED':
+            if async_result.state in ['SUBMITTED', 'RETRY', 'PROGRESS']:
                 async_result.get(propagate=False)
     redis.flushall()
     tmp_dir = app.config['FRACTALIS_TMP_DIR']
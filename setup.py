@@ -27,11 +27,13 @@ setup(
         'numpy==1.13.3',
         'scipy==0.19.1',
         'pandas==0.20.3',
+        'pyarrow==0.11.1',
         'scikit-learn==0.19.1',
         'lifelines==0.14.3',
         'requests==2.18.4',
+        'ijson==2.3',
         'PyYAML==3.12',
-        'pycryptodomex==3.4.7',
+        'pycryptodomex==3.7.0',
         'rpy2==2.9.3',
         'tzlocal',
         'flake8',
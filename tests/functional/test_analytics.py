@@ -312,3 +312,26 @@ class TestAnalytics:
         assert new_response.status_code == 200
         new_body = flask.json.loads(new_response.get_data())
         assert new_body['state'] == 'SUCCESS', new_body
+
+    def test_identical_analysis_is_answered_from_result_cache(
+            self, test_client, small_data_post):
+        small_data_post(random=True, wait=1)
+        with test_client.session_transaction() as sess:
+            data_task_id = sess['data_tasks'][0]
+        task_ids = []
+        results = []
+        for wait in [1, 0]:
+            rv = test_client.post('/analytics', data=flask.json.dumps(dict(
+                task_name='sum_df_test_task',
+                args={'a': '${}$'.format(data_task_id)}
+            )))
+            assert rv.status_code == 201
+            body = flask.json.loads(rv.get_data())
+            # the cached result is available without waiting for a worker
+            new_url = '/analytics/{}?wait={}'.format(body['task_id'], wait)
+            new_body = flask.json.loads(test_client.get(new_url).get_data())
+            assert new_body['state'] == 'SUCCESS', new_body
+            task_ids.append(body['task_id'])
+            results.append(new_body['result'])
+        assert task_ids[0] != task_ids[1]
+        assert results[0] == results[1]
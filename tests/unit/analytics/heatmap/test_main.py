@@ -5,6 +5,8 @@ import pandas as pd
 import numpy as np
 
 from fractalis.analytics.tasks.heatmap.main import HeatmapTask
+from fractalis.analytics.tasks.shared import array_stats
+from fractalis.data.summary import compute_summary
 
 
 # noinspection PyMissingTypeHints
@@ -256,3 +258,56 @@ class TestHeatmap:
                                 subsets=subsets)
         stats = result['stats']['t']
         assert all([stats[i] > stats[i + 1] for i in range(len(stats) - 1)])
+
+    def test_ranks_by_summaries_like_by_matrix(self):
+        # qux is present in both arrays
+        numerical_arrays = [
+            pd.DataFrame([[101, 'foo', 5], [101, 'bar', 6],
+                          [102, 'foo', 10], [102, 'bar', 11],
+                          [103, 'foo', 15], [103, 'bar', 16],
+                          [104, 'foo', 20], [104, 'bar', 30],
+                          [101, 'qux', 1], [102, 'qux', 40]],
+                         columns=['id', 'feature', 'value']),
+            pd.DataFrame([[101, 'baz', 21], [102, 'baz', 8],
+                          [103, 'baz', 1], [104, 'baz', 9],
+                          [103, 'qux', 2], [104, 'qux', 3]],
+                         columns=['id', 'feature', 'value'])
+        ]
+        summaries = [compute_summary(df) for df in numerical_arrays]
+        for ranking_method in ['mean', 'median', 'variance']:
+            args = dict(numerical_arrays=numerical_arrays,
+                        numericals=[],
+                        categoricals=[],
+                        ranking_method=ranking_method,
+                        params={},
+                        id_filter=[],
+                        max_rows=3,
+                        subsets=[])
+            expected = self.task.main(**args)
+            result = self.task.main(numerical_arrays_summaries=summaries,
+                                    **args)
+            assert result['stats']['feature'] == \
+                expected['stats']['feature']
+            assert np.allclose(result['stats'][ranking_method],
+                               expected['stats'][ranking_method])
+            assert pd.DataFrame(result['data']).equals(
+                pd.DataFrame(expected['data']))
+
+    def test_summaries_are_not_used_if_ids_are_dropped(self, monkeypatch):
+        numerical_arrays = [
+            pd.DataFrame([[101, 'foo', 5], [101, 'bar', 6],
+                          [102, 'foo', 10], [102, 'bar', 11]],
+                         columns=['id', 'feature', 'value'])
+        ]
+        summaries = [compute_summary(numerical_arrays[0])]
+        monkeypatch.setattr(array_stats, 'get_summary_stats', None)
+        result = self.task.main(numerical_arrays=numerical_arrays,
+                                numericals=[],
+                                categoricals=[],
+                                ranking_method='mean',
+                                params={},
+                                id_filter=[101],
+                                max_rows=100,
+                                subsets=[],
+                                numerical_arrays_summaries=summaries)
+        assert result['stats']['mean'] == [6, 5]
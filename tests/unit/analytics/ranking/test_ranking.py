@@ -0,0 +1,49 @@
+"""This module provides tests for the feature ranking analysis task."""
+
+import pytest
+import pandas as pd
+
+from fractalis.analytics.tasks.ranking.main import FeatureRankingTask
+from fractalis.data.summary import compute_summary
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestFeatureRankingTask:
+
+    task = FeatureRankingTask()
+
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 3.0],
+                       ['a', 'bar', 5.0], ['b', 'bar', 5.0],
+                       ['a', 'baz', 0.0], ['b', 'baz', 10.0]],
+                      columns=['id', 'feature', 'value'])
+
+    def test_ranks_by_given_statistic(self):
+        summary = compute_summary(self.df)
+        result = self.task.main(numerical_arrays=[summary],
+                                ranking_method='variance', max_rows=2)
+        assert result['stats']['feature'] == ['baz', 'foo']
+        assert result['stats']['variance'] == [25.0, 1.0]
+
+    def test_merges_summaries_of_several_arrays(self):
+        summaries = [compute_summary(self.df[self.df['id'] == 'a']),
+                     compute_summary(self.df[self.df['id'] == 'b'])]
+        result = self.task.main(numerical_arrays=summaries,
+                                ranking_method='mean', max_rows=10)
+        assert result['stats']['feature'] == ['bar', 'baz', 'foo']
+        assert result['stats']['mean'] == [5.0, 5.0, 2.0]
+        assert result['stats']['variance'] == [0.0, 25.0, 1.0]
+        assert result['stats']['count'] == [2, 2, 2]
+        # quantiles cannot be pooled
+        assert pd.isnull(result['stats']['median']).all()
+
+    def test_raises_for_quantiles_of_features_in_several_arrays(self):
+        summaries = [compute_summary(self.df[self.df['id'] == 'a']),
+                     compute_summary(self.df[self.df['id'] == 'b'])]
+        with pytest.raises(ValueError):
+            self.task.main(numerical_arrays=summaries,
+                           ranking_method='median', max_rows=10)
+
+    def test_raises_for_unknown_ranking_method(self):
+        with pytest.raises(ValueError):
+            self.task.main(numerical_arrays=[compute_summary(self.df)],
+                           ranking_method='limma', max_rows=10)
@@ -52,3 +52,41 @@ class TestCommonTasks:
         assert df.shape[0] == 2
         df = utils.apply_transformation(df=df, transformation='log2(x)')
         assert df.shape[0] == 1
+
+    def test_merge_arrays_merges_long_format_and_matrices(self):
+        df1 = pd.DataFrame([[101, 'foo', 1], [102, 'foo', 2],
+                            [101, 'bar', 3]],
+                           columns=['id', 'feature', 'value'])
+        df2 = pd.DataFrame([[4.0], [5.0]],
+                           index=pd.Index(['foo', 'baz'], name='feature'),
+                           columns=pd.Index([103], name='id'))
+        result = utils.merge_arrays(arrays=[df1, df2])
+        assert result.index.tolist() == ['bar', 'baz', 'foo']
+        assert result.columns.tolist() == [101, 102, 103]
+        assert result.loc['foo'].tolist() == [1, 2, 4]
+
+    def test_merge_arrays_raises_for_duplicate_pairs(self):
+        df1 = pd.DataFrame([[101, 'foo', 1], [102, 'foo', 2]],
+                           columns=['id', 'feature', 'value'])
+        df2 = pd.DataFrame([[102, 'foo', 5], [103, 'foo', 6]],
+                           columns=['id', 'feature', 'value'])
+        with pytest.raises(ValueError) as e:
+            utils.merge_arrays(arrays=[df1, df2])
+        assert "'foo'" in str(e.value) and "'102'" in str(e.value)
+
+    def test_merge_arrays_fills_missing_pairs_of_other_arrays(self):
+        df1 = pd.DataFrame([[1.0, np.nan]],
+                           index=pd.Index(['foo'], name='feature'),
+                           columns=pd.Index([101, 102], name='id'))
+        df2 = pd.DataFrame([[102, 'foo', 5]],
+                           columns=['id', 'feature', 'value'])
+        result = utils.merge_arrays(arrays=[df1, df2])
+        assert result.loc['foo'].tolist() == [1.0, 5.0]
+
+    def test_select_ids_drops_features_without_values(self):
+        df = pd.DataFrame([[1.0, np.nan], [2.0, 3.0]],
+                          index=pd.Index(['foo', 'bar'], name='feature'),
+                          columns=pd.Index([101, 102], name='id'))
+        result = utils.select_ids(df=df, ids=[102, 103])
+        assert result.columns.tolist() == [102]
+        assert result.index.tolist() == ['bar']
@@ -1,5 +1,8 @@
 """This module provides tests for the AnalyticsTask class."""
 
+import time
+import threading
+
 import pandas as pd
 
 from uuid import uuid4
@@ -48,3 +51,44 @@ class TestAnalyticsTask:
         assert data_task_id == uuid
         assert 'foo' in filters
         assert filters['foo'] == [1, 2]
+
+    def test_prepare_args_loads_data_concurrently_in_order(
+            self, monkeypatch):
+        threads = set()
+
+        def load_value(value, *args, **kwargs):
+            threads.add(threading.get_ident())
+            # later values finish first
+            time.sleep(0.1 - int(value[1:-1]) / 100)
+            return value[1:-1]
+
+        monkeypatch.setattr(self.task, 'load_value', load_value)
+        args = self.task.prepare_args(
+            session_data_tasks=[], decrypt=False,
+            args={'a': '$0$', 'b': ['$1$', '$2$', '$3$'], 'c': 'foo'})
+        assert args == {'a': '0', 'b': ['1', '2', '3'], 'c': 'foo'}
+        assert len(threads) > 1
+
+    def test_prepare_args_adds_extra_summaries(self, monkeypatch):
+        uuids = [str(uuid4()) for _ in range(3)]
+
+        def load_value(value, *args, **kwargs):
+            return 'data-{}'.format(value[1:-1])
+
+        def data_task_id_to_summary(data_task_id, *args, **kwargs):
+            assert not kwargs['compute']
+            return 'summary-{}'.format(data_task_id)
+
+        monkeypatch.setattr(self.task, 'extra_summary_args', ['b'])
+        monkeypatch.setattr(self.task, 'load_value', load_value)
+        monkeypatch.setattr(self.task, 'data_task_id_to_summary',
+                            data_task_id_to_summary)
+        args = self.task.prepare_args(
+            session_data_tasks=uuids, decrypt=False,
+            args={'a': '${}$'.format(uuids[0]),
+                  'b': ['${}$'.format(uuid) for uuid in uuids[1:]]})
+        assert args == {
+            'a': 'data-{}'.format(uuids[0]),
+            'b': ['data-{}'.format(uuid) for uuid in uuids[1:]],
+            'b_summaries': ['summary-{}'.format(uuid) for uuid in uuids[1:]]
+        }
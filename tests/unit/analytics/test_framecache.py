@@ -0,0 +1,68 @@
+"""This module provides tests for the worker-local data frame cache."""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from fractalis.analytics.framecache import DataFrameCache
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestDataFrameCache:
+
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0]],
+                      columns=['id', 'feature', 'value'])
+
+    def make_file(self, tmpdir, name):
+        file_path = os.path.join(str(tmpdir), name)
+        Path(file_path).touch()
+        return file_path
+
+    def test_get_returns_copy_of_cached_frame(self, tmpdir):
+        cache = DataFrameCache(max_bytes=1024 ** 2)
+        file_path = self.make_file(tmpdir, 'abc')
+        assert cache.get('abc', file_path) is None
+        cache.put('abc', file_path, self.df)
+        df = cache.get('abc', file_path)
+        assert df.equals(self.df)
+        df['value'] = 0
+        assert cache.get('abc', file_path).equals(self.df)
+        stats = cache.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+
+    def test_get_misses_if_file_was_removed(self, tmpdir):
+        cache = DataFrameCache(max_bytes=1024 ** 2)
+        file_path = self.make_file(tmpdir, 'abc')
+        cache.put('abc', file_path, self.df)
+        os.remove(file_path)
+        assert cache.get('abc', file_path) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_put_evicts_least_recently_used(self, tmpdir):
+        size = int(self.df.memory_usage(index=True, deep=True).sum())
+        cache = DataFrameCache(max_bytes=2 * size)
+        paths = [self.make_file(tmpdir, name) for name in 'abc']
+        cache.put('a', paths[0], self.df)
+        cache.put('b', paths[1], self.df)
+        cache.get('a', paths[0])
+        cache.put('c', paths[2], self.df)
+        assert cache.get('b', paths[1]) is None
+        assert cache.get('a', paths[0]) is not None
+        assert cache.get('c', paths[2]) is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_invalidate_removes_entry(self, tmpdir):
+        cache = DataFrameCache(max_bytes=1024 ** 2)
+        file_path = self.make_file(tmpdir, 'abc')
+        cache.put('abc', file_path, self.df)
+        cache.invalidate('abc')
+        assert cache.get('abc', file_path) is None
+        assert cache.stats()['size'] == 0
+
+    def test_disabled_cache_does_not_store(self, tmpdir):
+        cache = DataFrameCache(max_bytes=0)
+        file_path = self.make_file(tmpdir, 'abc')
+        cache.put('abc', file_path, self.df)
+        assert cache.get('abc', file_path) is None
@@ -0,0 +1,78 @@
+"""This module provides tests for the analysis result cache."""
+
+from fractalis import app, redis
+from fractalis.analytics import resultcache
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestResultCache:
+
+    def teardown_method(self, method):
+        redis.flushall()
+
+    def test_cache_key_is_canonical(self):
+        key = resultcache.make_cache_key(
+            'foo', {'a': {'blob': 'abc', 'filters': {}}, 'b': [1, 2]}, False)
+        assert key == resultcache.make_cache_key(
+            'foo', {'b': [1, 2], 'a': {'filters': {}, 'blob': 'abc'}}, False)
+        assert key != resultcache.make_cache_key(
+            'foo', {'a': {'blob': 'abc', 'filters': {}}, 'b': [2, 1]}, False)
+        assert key != resultcache.make_cache_key(
+            'bar', {'a': {'blob': 'abc', 'filters': {}}, 'b': [1, 2]}, False)
+        assert key != resultcache.make_cache_key(
+            'foo', {'a': {'blob': 'abc', 'filters': {}}, 'b': [1, 2]}, True)
+
+    def test_put_and_get(self):
+        assert resultcache.get('abc') is None
+        resultcache.put('abc', '{"foo": 1}')
+        assert resultcache.get('abc') == '{"foo": 1}'
+
+    def test_evicts_least_recently_used(self, monkeypatch):
+        monkeypatch.setitem(app.config, 'FRACTALIS_RESULT_CACHE_SIZE', 10)
+        resultcache.put('abc', 'x' * 4)
+        resultcache.put('def', 'x' * 4)
+        assert resultcache.get('abc') is not None
+        resultcache.put('ghi', 'x' * 4)
+        assert resultcache.get('abc') is not None
+        assert resultcache.get('def') is None
+        assert resultcache.get('ghi') is not None
+        assert set(redis.hkeys(resultcache.SIZE_KEY)) == {'abc', 'ghi'}
+        assert redis.get(resultcache.TOTAL_KEY) == '8'
+
+    def test_forgets_expired_results(self, monkeypatch):
+        resultcache.put('abc', 'x')
+        lifetime = app.config['FRACTALIS_RESULT_CACHE_LIFETIME']
+        later = resultcache.time.time() + lifetime.total_seconds() + 1
+        monkeypatch.setattr(resultcache.time, 'time', lambda: later)
+        resultcache.put('def', 'xy')
+        assert redis.zrange(resultcache.ACCESS_KEY, 0, -1) == ['def']
+        assert redis.zrange(resultcache.EXPIRY_KEY, 0, -1) == ['def']
+        assert redis.hkeys(resultcache.SIZE_KEY) == ['def']
+        assert redis.get(resultcache.TOTAL_KEY) == '2'
+
+    def test_disabled_cache_never_hits(self, monkeypatch):
+        monkeypatch.setitem(app.config, 'FRACTALIS_RESULT_CACHE_SIZE', 0)
+        resultcache.put('abc', 'x')
+        assert resultcache.get('abc') is None
+
+    def test_concurrent_put_of_same_key_counts_size_once(self, monkeypatch):
+        make_pipeline = redis.pipeline
+        raced = []
+
+        def racing_pipeline(*args, **kwargs):
+            pipeline = make_pipeline(*args, **kwargs)
+            multi = pipeline.multi
+
+            def racing_multi():
+                # another process puts the same key after the size was read
+                if not raced:
+                    raced.append(True)
+                    resultcache.put('abc', 'x' * 4)
+                multi()
+            pipeline.multi = racing_multi
+            return pipeline
+        monkeypatch.setattr(redis, 'pipeline', racing_pipeline)
+        resultcache.put('abc', 'x' * 4)
+        assert raced
+        assert redis.hget(resultcache.SIZE_KEY, 'abc') == '4'
+        assert redis.get(resultcache.TOTAL_KEY) == '4'
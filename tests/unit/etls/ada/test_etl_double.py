@@ -1,6 +1,7 @@
 """This module provides tests for the double ETL for Ada."""
 
 import json
+from urllib.parse import parse_qs, urlparse
 
 import pytest
 import responses
@@ -94,3 +95,62 @@ class TestDoubleETL:
             assert list(df['id']) == ['12345']
             assert list(df['feature']) == ['a']
             assert list(df['value']) == [1.1]
+
+    def test_extract_batch_splits_fields_of_single_request(self):
+        other_descriptor = {
+            'dictionary': dict(self.valid_descriptor['dictionary'],
+                               name='Qux', projection='qux'),
+            'data_set': 'baz'
+        }
+        assert self.etl.batch_key(self.valid_descriptor) == \
+            self.etl.batch_key(other_descriptor)
+        with responses.RequestsMock() as response:
+            response.add(response.GET,
+                         'http://foo.bar/dataSets/records/findCustom',
+                         body=json.dumps([
+                             {'_id': {'$oid': '1'}, 'foo': 1.0, 'qux': ''},
+                             {'_id': {'$oid': '2'}, 'qux': 2.0}
+                         ]),
+                         status=200,
+                         content_type='application/json')
+            raw_data = self.etl.extract_batch(
+                server='http://foo.bar', token='',
+                descriptors=[self.valid_descriptor, other_descriptor])
+            assert len(response.calls) == 1
+            params = parse_qs(urlparse(response.calls[0].request.url).query)
+            assert json.loads(params['filterOrId'][0]) == [{
+                'conditionType': 'OR',
+                'conditions': [
+                    {'fieldName': 'foo', 'conditionType': '!=', 'value': ''},
+                    {'fieldName': 'qux', 'conditionType': '!=', 'value': ''}
+                ]
+            }]
+        assert raw_data == [[{'_id': {'$oid': '1'}, 'foo': 1.0}],
+                            [{'_id': {'$oid': '2'}, 'qux': 2.0}]]
+
+    def test_extract_batch_drops_filter_rejected_by_server(self):
+        other_descriptor = {
+            'dictionary': dict(self.valid_descriptor['dictionary'],
+                               name='qux', projection='qux'),
+            'data_set': 'baz'
+        }
+        with responses.RequestsMock() as response:
+            response.add(response.GET,
+                         'http://foo.bar/dataSets/records/findCustom',
+                         body='{}',
+                         status=400,
+                         content_type='application/json')
+            response.add(response.GET,
+                         'http://foo.bar/dataSets/records/findCustom',
+                         body=json.dumps([
+                             {'_id': {'$oid': '1'}, 'foo': 1.0},
+                             {'_id': {'$oid': '2'}}
+                         ]),
+                         status=200,
+                         content_type='application/json')
+            raw_data = self.etl.extract_batch(
+                server='http://foo.bar', token='',
+                descriptors=[self.valid_descriptor, other_descriptor])
+            assert len(response.calls) == 2
+            assert 'filterOrId' not in response.calls[1].request.url
+        assert raw_data == [[{'_id': {'$oid': '1'}, 'foo': 1.0}], []]
@@ -95,3 +95,34 @@ class TestDoubleETL:
             assert list(df['id']) == ['12345']
             assert list(df['feature']) == ['a']
             assert list(df['value']) == [1.1]
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestDoubleArrayTransform:
+
+    etl = DoubleArrayETL()
+
+    descriptor = {
+        'dictionary': {
+            'name': 'foo',
+            'projection': 'foo',
+            'label': 'bar',
+            'fieldType': 'Double',
+            'isArray': True
+        },
+        'data_set': 'baz'
+    }
+
+    def test_transform_returns_empty_df_for_no_records(self):
+        df = self.etl.transform(raw_data=[], descriptor=self.descriptor)
+        assert df.empty
+        assert list(df.columns) == ['id', 'feature', 'value']
+
+    def test_transform_uses_array_position_as_feature(self):
+        raw_data = [{'_id': {'$oid': '1'}, 'foo': [1.0, 2.0]},
+                    {'_id': {'$oid': '2'}, 'foo': [3.0]}]
+        df = self.etl.transform(raw_data=raw_data, descriptor=self.descriptor)
+        assert list(df['id']) == ['1', '2', '1', '2']
+        assert list(df['feature']) == ['0', '0', '1', '1']
+        assert df['value'].tolist()[:3] == [1.0, 3.0, 2.0]
+        assert df['value'].isnull().tolist()[3]
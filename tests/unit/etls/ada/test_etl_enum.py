@@ -95,3 +95,13 @@ class TestEnumETL:
             assert list(df['id']) == ['12345']
             assert list(df['feature']) == ['bar']
             assert list(df['value']) == ['abc']
+
+    def test_transform_maps_every_record(self):
+        raw_data = [{'foo': 1, '_id': {'$oid': '1'}},
+                    {'foo': 0, '_id': {'$oid': '2'}},
+                    {'foo': 1, '_id': {'$oid': '3'}}]
+        df = self.etl.transform(raw_data=raw_data,
+                                descriptor=self.valid_descriptor)
+        assert list(df['id']) == ['1', '2', '3']
+        assert list(df['feature']) == ['bar', 'bar', 'bar']
+        assert list(df['value']) == ['def', 'abc', 'def']
@@ -3,6 +3,7 @@
 import pytest
 import responses
 
+from fractalis import redis
 from fractalis.data.etls.ada.handler_ada import AdaHandler
 
 
@@ -28,6 +29,10 @@ class TestAdaHandler:
     def bad_init_args(self, request):
         return request.param
 
+    def teardown_method(self, method):
+        for key in redis.keys('token:*'):
+            redis.delete(key)
+
     def test_throws_if_bad_init_args(self, bad_init_args):
         with pytest.raises(ValueError):
             AdaHandler(**bad_init_args)
@@ -69,3 +74,15 @@ class TestAdaHandler:
                 AdaHandler(server='http://foo.bar',
                            auth={'user': 'foo', 'passwd': 'bar'})
                 assert '[400]' in e
+
+    def test_caches_token_for_same_credentials_only(self):
+        with responses.RequestsMock() as response:
+            response.add_callback(response.POST, 'http://foo.bar/login',
+                                  callback=self.request_callback,
+                                  content_type='application/json')
+            for user in ['foo', 'foo', 'baz']:
+                adah = AdaHandler(server='http://foo.bar',
+                                  auth={'user': user, 'passwd': 'bar'})
+                assert adah._token == 'foo-token'
+            assert len(response.calls) == 2
+            assert not any('bar' in key for key in redis.keys('token:*'))
@@ -0,0 +1,91 @@
+"""This module provides tests for the shared functionality of the PIC-SURE
+ETLs."""
+
+from io import StringIO
+
+import pandas as pd
+import pytest
+import responses
+
+from fractalis import app
+from fractalis.data.etl import PendingExtraction
+from fractalis.data.etls.picsure import shared
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestExtract:
+
+    server = 'http://foo.bar'
+
+    def add_status(self, response, status):
+        response.add(response.GET,
+                     '{}/resultService/resultStatus/42'.format(self.server),
+                     json={'status': status}, status=200)
+
+    def test_submits_query_and_raises_pending_if_running(self):
+        with responses.RequestsMock() as response:
+            response.add(response.POST,
+                         '{}/queryService/runQuery'.format(self.server),
+                         json={'resultId': 42}, status=200)
+            self.add_status(response, 'RUNNING')
+            with pytest.raises(PendingExtraction) as e:
+                shared.extract(query='{}', server=self.server,
+                               token='', checkpoint=None)
+        assert e.value.checkpoint['result_id'] == 42
+        assert e.value.checkpoint['attempt'] == 1
+        assert e.value.countdown == app.config['ETL_POLL_INTERVAL']
+
+    def test_resumes_from_checkpoint_without_submitting(self):
+        checkpoint = {'result_id': 42, 'submitted': 0, 'attempt': 3}
+        with responses.RequestsMock() as response:
+            self.add_status(response, 'AVAILABLE')
+            response.add(response.GET,
+                         '{}/resultService/result/42/CSV'.format(self.server),
+                         body='id,foo\n1,2\n', status=200)
+            raw_data = shared.extract(query='{}', server=self.server,
+                                      token='', checkpoint=checkpoint)
+            assert raw_data.read() == 'id,foo\n1,2\n'
+
+    def test_raises_if_query_takes_too_long(self):
+        checkpoint = {'result_id': 42, 'submitted': 0, 'attempt': 3}
+        with responses.RequestsMock() as response:
+            self.add_status(response, 'RUNNING')
+            with pytest.raises(ValueError):
+                shared.extract(query='{}', server=self.server,
+                               token='', checkpoint=checkpoint)
+
+    def test_countdown_backs_off_up_to_maximum(self):
+        countdowns = [shared.get_countdown(attempt) for attempt in range(64)]
+        assert countdowns == sorted(countdowns)
+        assert countdowns[1] == 2 * countdowns[0]
+        assert countdowns[-1] == app.config['ETL_POLL_MAX_INTERVAL']
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestReadCSV:
+
+    def test_parses_typed_chunks(self, monkeypatch):
+        monkeypatch.setattr(shared, 'CHUNK_SIZE', 2)
+        stream = StringIO('patient,age\n001,1.5\n002,\n003,3\n')
+        chunks = [shared.make_data_frame(chunk)
+                  for chunk in shared.read_csv_chunks(stream,
+                                                      value_dtype=float)]
+        assert stream.closed
+        assert [chunk.shape[0] for chunk in chunks] == [2, 1]
+        df = pd.concat(chunks, ignore_index=True)
+        assert df.columns.tolist() == ['id', 'feature', 'value']
+        assert df['id'].tolist() == ['001', '002', '003']
+        assert df['feature'].tolist() == ['age', 'age', 'age']
+        assert df['value'].dtype == float
+        assert df['value'].isnull().tolist() == [False, True, False]
+
+    def test_parses_empty_result(self):
+        chunks = list(shared.read_csv_chunks(StringIO('patient,sex\n'),
+                                             value_dtype=str))
+        assert len(chunks) == 1
+        assert shared.make_data_frame(chunks[0]).shape == (0, 3)
+
+    def test_raises_for_unexpected_columns(self):
+        with pytest.raises(ValueError):
+            list(shared.read_csv_chunks(StringIO('a,b,c\n1,2,3\n'),
+                                        value_dtype=str))
@@ -0,0 +1,130 @@
+"""This module provides tests for the content-addressed blob store."""
+
+import os
+from pathlib import Path
+from shutil import rmtree
+
+import pandas as pd
+
+from fractalis import app, redis
+from fractalis.data import blobstore
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestBlobStore:
+
+    data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0]],
+                      columns=['id', 'feature', 'value'])
+
+    def teardown_method(self, method):
+        redis.flushall()
+        rmtree(self.data_dir, ignore_errors=True)
+
+    def make_file(self, name):
+        os.makedirs(self.data_dir, exist_ok=True)
+        file_path = os.path.join(self.data_dir, name)
+        Path(file_path).touch()
+        Path('{}.summary'.format(file_path)).touch()
+        return file_path
+
+    def test_content_digest_depends_on_content_only(self):
+        digest = blobstore.content_digest(self.df, encrypted=False)
+        assert digest == blobstore.content_digest(self.df.copy(),
+                                                  encrypted=False)
+        assert digest != blobstore.content_digest(self.df, encrypted=True)
+        assert digest != blobstore.content_digest(self.df[:1],
+                                                  encrypted=False)
+
+    def test_content_digest_depends_on_types_of_values(self):
+        df_1 = pd.DataFrame({'value': [1, 'a']})
+        df_2 = pd.DataFrame({'value': ['1', 'a']})
+        assert blobstore.content_digest(df_1, encrypted=False) != \
+            blobstore.content_digest(df_2, encrypted=False)
+
+    def test_content_digest_of_categories_depends_on_values(self):
+        df_1 = pd.DataFrame({'feature': pd.Categorical(['a', 'b'])})
+        df_2 = pd.DataFrame({'feature': pd.Categorical(['b', 'a'])})
+        assert blobstore.content_digest(df_1, encrypted=False) != \
+            blobstore.content_digest(df_2, encrypted=False)
+
+    def test_publish_moves_files_into_store(self):
+        file_path = self.make_file('123')
+        blob_path = blobstore.publish(file_path=file_path, digest='abc',
+                                      task_id='123', meta={'features': []})
+        assert blob_path == blobstore.get_blob_path('abc')
+        assert os.path.exists(blob_path)
+        assert os.path.exists('{}.summary'.format(blob_path))
+        assert not os.path.exists(file_path)
+
+    def test_publish_shares_identical_data(self):
+        blobstore.publish(file_path=self.make_file('123'), digest='abc',
+                          task_id='123', meta={'features': []})
+        file_path = self.make_file('456')
+        blobstore.publish(file_path=file_path, digest='abc',
+                          task_id='456', meta={'features': []})
+        assert not os.path.exists(file_path)
+        assert not os.path.exists('{}.summary'.format(file_path))
+        assert redis.smembers('blob:abc') == {'123', '456'}
+
+    def test_release_removes_blob_after_last_reference(self):
+        for task_id in ['123', '456']:
+            blobstore.publish(file_path=self.make_file(task_id),
+                              digest='abc', task_id=task_id,
+                              meta={'features': []})
+        blob_path = blobstore.get_blob_path('abc')
+        blobstore.release('abc', '123')
+        assert os.path.exists(blob_path)
+        blobstore.release('abc', '456')
+        assert not os.path.exists(blob_path)
+        assert not os.path.exists('{}.summary'.format(blob_path))
+
+    def test_link_reuses_blob_by_fingerprint(self):
+        blobstore.publish(file_path=self.make_file('123'), digest='abc',
+                          task_id='123', meta={'features': ['foo']},
+                          fingerprint='xyz')
+        assert blobstore.find_blob('xyz') == 'abc'
+        assert blobstore.link('abc', '456') == {'features': ['foo']}
+        assert redis.smembers('blob:abc') == {'123', '456'}
+        assert blobstore.find_blob('foo') is None
+
+    def test_publish_records_source_version(self):
+        blobstore.publish(file_path=self.make_file('123'), digest='abc',
+                          task_id='123', meta={'features': []},
+                          fingerprint='xyz', version='1')
+        assert blobstore.find_version('xyz') == '1'
+        blobstore.publish(file_path=self.make_file('456'), digest='def',
+                          task_id='456', meta={'features': []},
+                          fingerprint='xyz')
+        assert blobstore.find_blob('xyz') == 'def'
+        assert blobstore.find_version('xyz') is None
+
+    def test_prune_drops_untracked_references(self):
+        for task_id in ['123', '456']:
+            blobstore.publish(file_path=self.make_file(task_id),
+                              digest=task_id * 2, task_id=task_id,
+                              meta={'features': []})
+        redis.set('data:456', '{}')
+        blobstore.prune()
+        assert not os.path.exists(blobstore.get_blob_path('123123'))
+        assert os.path.exists(blobstore.get_blob_path('456456'))
+
+    def test_prune_keeps_references_added_by_running_tasks(self):
+        blobstore.publish(file_path=self.make_file('123'), digest='abc',
+                          task_id='123', meta={'features': []})
+        # the janitor listed the data states before this task linked the blob
+        tracked = [key.split(':')[1] for key in redis.scan_iter('data:*')]
+        redis.set('data:456', '{}')
+        assert blobstore.link('abc', '456') is not None
+        assert '456' not in tracked
+        blobstore.prune()
+        assert os.path.exists(blobstore.get_blob_path('abc'))
+        assert redis.smembers('blob:abc') == {'456'}
+
+    def test_link_does_not_reference_removed_blob(self):
+        blobstore.publish(file_path=self.make_file('123'), digest='abc',
+                          task_id='123', meta={'features': []})
+        blobstore.release('abc', '123')
+        assert blobstore.link('abc', '456') is None
+        assert not redis.smembers('blob:abc')
+        assert not redis.keys('blob-lock:*')
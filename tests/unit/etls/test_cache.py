@@ -0,0 +1,113 @@
+"""This module provides tests for the cache formats."""
+
+import os
+
+import pytest
+import pandas as pd
+
+from fractalis.data.cache import CacheFormat, read_cache
+from fractalis.data.etl import ETL
+from fractalis import app
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestCacheFormat:
+
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0]],
+                      columns=['id', 'feature', 'value'])
+
+    def test_factory_returns_format_for_name(self):
+        assert CacheFormat.factory('parquet').name == 'parquet'
+        assert CacheFormat.factory('pickle').name == 'pickle'
+
+    def test_factory_raises_for_unknown_name(self):
+        with pytest.raises(NotImplementedError):
+            CacheFormat.factory('foo')
+
+    @pytest.mark.parametrize('name', ['parquet', 'pickle'])
+    def test_write_and_read_cache_roundtrip(self, tmpdir, name):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        CacheFormat.factory(name).write(self.df, file_path)
+        assert CacheFormat.detect(file_path).name == name
+        df = read_cache(file_path)
+        assert df.equals(self.df)
+
+    @pytest.mark.parametrize('name', ['parquet', 'pickle'])
+    def test_read_cache_reads_only_given_columns(self, tmpdir, name):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        CacheFormat.factory(name).write(self.df, file_path)
+        df = read_cache(file_path, columns=['id', 'value'])
+        assert df.columns.tolist() == ['id', 'value']
+        assert df['value'].tolist() == [1.0, 2.0]
+
+    @pytest.mark.parametrize('name', ['parquet', 'pickle'])
+    def test_roundtrip_keeps_category_columns(self, tmpdir, name):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        df = ETL.encode_labels(self.df.copy())
+        CacheFormat.factory(name).write(df, file_path)
+        df = read_cache(file_path)
+        assert pd.api.types.is_categorical_dtype(df['id'])
+        assert pd.api.types.is_categorical_dtype(df['feature'])
+        assert df['id'].tolist() == ['a', 'b']
+
+    def test_parquet_read_skips_row_groups_not_matching_filters(
+            self, tmpdir, monkeypatch):
+        parquet = CacheFormat.factory('parquet')
+        monkeypatch.setattr(parquet, 'row_group_size', 2)
+        df = pd.DataFrame([['a', 'foo', 1.0], ['a', 'bar', 2.0],
+                           ['a', 'baz', 3.0], ['b', 'foo', 4.0],
+                           ['b', 'bar', 5.0], ['b', 'baz', 6.0]],
+                          columns=['id', 'feature', 'value'])
+        file_path = os.path.join(str(tmpdir), 'abc')
+        parquet.write(df, file_path)
+        assert read_cache(file_path).shape == (6, 3)
+        df = read_cache(file_path, filters={'feature': ['foo']})
+        assert df.shape[0] == 2
+        assert df['value'].tolist() == [1.0, 4.0]
+        df = read_cache(file_path, filters={'feature': ['qux']})
+        assert df.shape == (0, 3)
+
+    def test_parquet_writer_indexes_appended_chunks(
+            self, tmpdir, monkeypatch):
+        parquet = CacheFormat.factory('parquet')
+        monkeypatch.setattr(parquet, 'row_group_size', 2)
+        file_path = os.path.join(str(tmpdir), 'abc')
+        writer = parquet.open_writer(file_path)
+        writer.append(ETL.encode_labels(pd.DataFrame(
+            [['a', 'foo', 1.0], ['a', 'bar', 2.0], ['a', 'baz', 3.0]],
+            columns=['id', 'feature', 'value'])))
+        writer.append(self.df.iloc[:0])
+        writer.append(pd.DataFrame([['b', 'foo', 4.0], ['b', 'bar', 5.0]],
+                                   columns=['id', 'feature', 'value']))
+        writer.close()
+        assert not os.path.exists('{}.partial'.format(file_path))
+        df = read_cache(file_path)
+        assert df.shape == (5, 3)
+        # the first chunk has been dictionary encoded
+        assert pd.api.types.is_categorical_dtype(df['feature'])
+        assert sorted(df['feature'].cat.categories) == ['bar', 'baz', 'foo']
+        df = read_cache(file_path, filters={'feature': ['foo']})
+        assert df.shape[0] < 5
+        assert sorted(df[df['feature'] == 'foo']['value']) == [1.0, 4.0]
+
+    def test_parquet_writer_abort_removes_files(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        writer = CacheFormat.factory('parquet').open_writer(file_path)
+        writer.append(self.df)
+        writer.abort()
+        assert not os.listdir(str(tmpdir))
+
+    def test_detect_raises_for_unknown_file(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        with open(file_path, 'wb') as f:
+            f.write(b'foobar')
+        with pytest.raises(ValueError):
+            CacheFormat.detect(file_path)
+
+    def test_load_falls_back_to_pickle(self, tmpdir, monkeypatch):
+        monkeypatch.setitem(app.config, 'FRACTALIS_CACHE_FORMAT', 'parquet')
+        file_path = os.path.join(str(tmpdir), 'abc')
+        ETL.load(pd.DataFrame([[1, 2]]), file_path)
+        assert CacheFormat.detect(file_path).name == 'pickle'
+        ETL.load(self.df, file_path)
+        assert CacheFormat.detect(file_path).name == 'parquet'
@@ -0,0 +1,57 @@
+"""This module provides tests for the encrypted cache container."""
+
+import os
+
+import pytest
+import pandas as pd
+
+from fractalis import app
+from fractalis.analytics.task import AnalyticTask
+from fractalis.data.encryption import encrypt_to_file, decrypt_file
+from fractalis.data.etl import ETL
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestEncryption:
+
+    key = b'0123456789abcdef'
+
+    @pytest.mark.parametrize('threads', [1, 4])
+    def test_decrypt_file_restores_data(self, tmpdir, threads):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        data = os.urandom(1000)
+        encrypt_to_file(data=data, file_path=file_path,
+                        key=self.key, chunk_size=64)
+        assert decrypt_file(file_path=file_path,
+                            key=self.key, threads=threads) == data
+
+    def test_decrypt_file_raises_for_modified_file(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        encrypt_to_file(data=os.urandom(1000), file_path=file_path,
+                        key=self.key, chunk_size=64)
+        with open(file_path, 'r+b') as f:
+            f.seek(500)
+            byte = f.read(1)
+            f.seek(500)
+            f.write(bytes([byte[0] ^ 1]))
+        with pytest.raises(ValueError):
+            decrypt_file(file_path=file_path, key=self.key)
+
+    def test_decrypt_file_raises_for_truncated_file(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        encrypt_to_file(data=os.urandom(1000), file_path=file_path,
+                        key=self.key, chunk_size=64)
+        with open(file_path, 'r+b') as f:
+            f.truncate(900)
+        with pytest.raises(ValueError):
+            decrypt_file(file_path=file_path, key=self.key)
+
+    @pytest.mark.parametrize('name', ['parquet', 'pickle'])
+    def test_secure_load_roundtrip(self, tmpdir, monkeypatch, name):
+        monkeypatch.setitem(app.config, 'FRACTALIS_CACHE_FORMAT', name)
+        monkeypatch.setitem(app.config, 'FRACTALIS_ENCRYPT_CHUNK_SIZE', 128)
+        file_path = os.path.join(str(tmpdir), 'abc')
+        df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0]],
+                          columns=['id', 'feature', 'value'])
+        ETL.secure_load(df, file_path)
+        assert AnalyticTask.secure_load(file_path).equals(df)
@@ -1,11 +1,17 @@
 """This module provides test for the 'etl' module."""
 
+import os
 import json
+from shutil import rmtree
 
 import pandas as pd
+import pytest
 
-from fractalis import redis
-from fractalis.data.etl import ETL
+from fractalis import app, redis
+from fractalis.data import blobstore
+from fractalis.data.cache import CacheFormat, read_cache
+from fractalis.data.etl import ETL, descriptor_key
+from fractalis.data.summary import get_summary_path
 
 
 # noinspection PyMissingOrEmptyDocstring
@@ -41,6 +47,17 @@ class MockETL(ETL):
         return ''
 
 
+# noinspection PyMissingOrEmptyDocstring
+class NumericalMockETL(MockETL):
+
+    def transform(self, raw_data: object, descriptor: dict) -> pd.DataFrame:
+        return raw_data
+
+    @property
+    def produces(self) -> str:
+        return 'numerical'
+
+
 # noinspection PyMissingOrEmptyDocstring, PyMissingTypeHints
 class TestETL:
 
@@ -64,3 +81,125 @@ class TestETL:
         self.etl.update_redis(data_frame=df3)
         data_state = json.loads(redis.get('data:123'))
         assert data_state['meta']['features'] == []
+
+    def test_update_redis_refreshes_descriptor_index(self):
+        df = pd.DataFrame([[1, 2, 3]], columns=['id', 'feature', 'value'])
+        redis.set('data:123', json.dumps({'meta': {}, 'hash': 'abc'}))
+        redis.sadd(descriptor_key('abc'), '123')
+        redis.expire(descriptor_key('abc'), 1)
+        self.etl.update_redis(data_frame=df)
+        assert redis.ttl(descriptor_key('abc')) > 1
+        assert redis.ttl(descriptor_key('abc')) >= redis.ttl('data:123')
+
+    @pytest.mark.parametrize('encrypt', [False, True])
+    def test_stash_raw_data_roundtrip(self, encrypt):
+        data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
+        raw_data = [{'_id': {'$oid': '1'}, 'foo': 1.0}]
+        try:
+            path = self.etl.stash_raw_data(
+                raw_data=raw_data, file_path=os.path.join(data_dir, '123'),
+                encrypt=encrypt)
+            assert self.etl.unstash_raw_data(path, encrypt=encrypt) == \
+                raw_data
+            assert not os.path.exists(path)
+        finally:
+            rmtree(data_dir, ignore_errors=True)
+
+    def test_run_raises_readable_if_raw_data_are_corrupt(self, monkeypatch):
+        monkeypatch.setattr(self.etl, 'update_state',
+                            lambda state, meta: None)
+        data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        raw_data_path = os.path.join(data_dir, '123.raw')
+        with open(raw_data_path, 'wb') as f:
+            f.write(b'foo')
+        try:
+            with pytest.raises(RuntimeError) as e:
+                self.etl.run(server='', token='', descriptor={},
+                             file_path=os.path.join(data_dir, '123'),
+                             encrypt=False, raw_data_path=raw_data_path)
+            assert 'Data extraction failed' in str(e.value)
+            assert not os.path.exists(raw_data_path)
+        finally:
+            self.etl.after_return()
+            rmtree(data_dir, ignore_errors=True)
+
+    def test_run_checks_version_only_if_data_can_be_reused(
+            self, monkeypatch):
+        calls = []
+
+        def get_version(*args):
+            calls.append(args)
+            return '1'
+
+        def extract(*args):
+            raise ValueError('foo')
+
+        monkeypatch.setattr(self.etl, 'update_state',
+                            lambda state, meta: None)
+        monkeypatch.setattr(self.etl, 'get_version', get_version)
+        monkeypatch.setattr(self.etl, 'extract', extract)
+        try:
+            with pytest.raises(RuntimeError):
+                self.etl.run(server='', token='', descriptor={},
+                             file_path='', encrypt=False)
+            assert not calls
+            monkeypatch.setattr(blobstore, 'find_blob', lambda _: 'abc')
+            monkeypatch.setattr(self.etl, 'reuse_blob', lambda *args: False)
+            with pytest.raises(RuntimeError):
+                self.etl.run(server='', token='', descriptor={},
+                             file_path='', encrypt=False)
+            assert len(calls) == 1
+        finally:
+            self.etl.after_return()
+
+    def test_report_progress_throttles_reports_within_phase(
+            self, monkeypatch):
+        reports = []
+        monkeypatch.setattr(self.etl, 'update_state',
+                            lambda state, meta: reports.append((state, meta)))
+        monkeypatch.setitem(app.config, 'ETL_PROGRESS_INTERVAL', 60)
+        self.etl.start_progress()
+        try:
+            self.etl.report_progress(phase='extract')
+            self.etl.report_progress(phase='load', rows=10)
+            self.etl.report_progress(rows=5)
+        finally:
+            self.etl.after_return()
+        assert [state for state, _ in reports] == ['PROGRESS', 'PROGRESS']
+        assert reports[0][1]['phase'] == 'extract'
+        assert reports[1][1]['phase'] == 'load'
+        assert reports[1][1]['rows_transformed'] == 10
+        assert reports[1][1]['eta'] is None
+
+    def test_load_chunks_encodes_labels_and_summarizes_exactly(
+            self, monkeypatch):
+        etl = NumericalMockETL()
+        etl.request_stack = RequestStackDummy()
+        monkeypatch.setattr(etl, 'update_state', lambda state, meta: None)
+        data_dir = os.path.join(app.config['FRACTALIS_TMP_DIR'], 'data')
+        file_path = os.path.join(data_dir, '123')
+        chunks = [pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0],
+                                ['c', 'foo', 3.0]],
+                               columns=['id', 'feature', 'value']),
+                  pd.DataFrame([['d', 'foo', 10.0]],
+                               columns=['id', 'feature', 'value'])]
+        redis.set('data:123', json.dumps({'meta': {}}))
+        etl.start_progress()
+        try:
+            etl.load_chunks(
+                raw_data=chunks, descriptor={}, file_path=file_path,
+                writer=CacheFormat.factory('parquet').open_writer(file_path),
+                fingerprint='xyz')
+            blob_path = json.loads(redis.get('data:123'))['file_path']
+            df = read_cache(blob_path)
+            assert pd.api.types.is_categorical_dtype(df['id'])
+            assert pd.api.types.is_categorical_dtype(df['feature'])
+            summary = read_cache(get_summary_path(blob_path))
+            # a count weighted mean of the chunk medians would be 4.0
+            assert summary['median'].tolist() == [2.5]
+            assert summary['q25'].tolist() == [1.75]
+        finally:
+            etl.after_return()
+            redis.flushall()
+            rmtree(data_dir, ignore_errors=True)
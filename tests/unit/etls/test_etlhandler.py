@@ -26,8 +26,8 @@ class TestETLHandler:
         hash_3 = self.etlhandler.descriptor_to_hash(descriptor={'a': 1})
         self.etlhandler._server = 'localbar'
         hash_4 = self.etlhandler.descriptor_to_hash(descriptor={'a': 1})
-        assert isinstance(hash_1, int)
-        assert isinstance(hash_4, int)
+        assert isinstance(hash_1, str)
+        assert isinstance(hash_4, str)
         assert hash_1 == hash_3
         assert hash_1 != hash_2
         assert hash_1 != hash_4
@@ -43,6 +43,32 @@ class TestETLHandler:
         assert len(duplicates) == 1
         assert duplicates[0] == '123'
 
+    def test_descriptor_to_hash_ignores_key_order(self, redis):
+        hash_1 = self.etlhandler.descriptor_to_hash(
+            descriptor={'a': 1, 'b': {'c': 2, 'd': 3}})
+        hash_2 = self.etlhandler.descriptor_to_hash(
+            descriptor={'b': {'d': 3, 'c': 2}, 'a': 1})
+        assert hash_1 == hash_2
+        assert len(hash_1) == 64
+
+    def test_find_duplicates_drops_expired_entries_from_index(self, redis):
+        descriptor = {'a': {'b': 3}, 'c': 4}
+        self.etlhandler.create_redis_entry(task_id='123',
+                                           file_path='',
+                                           descriptor=descriptor,
+                                           data_type='')
+        self.etlhandler.create_redis_entry(task_id='456',
+                                           file_path='',
+                                           descriptor=descriptor,
+                                           data_type='')
+        redis.delete('data:123')
+        duplicates = self.etlhandler.find_duplicates(
+            data_tasks=['123', '456'], descriptor=descriptor)
+        assert duplicates == ['456']
+        index_key = 'descriptor:{}'.format(
+            self.etlhandler.descriptor_to_hash(descriptor))
+        assert redis.smembers(index_key) == {'456'}
+
     def test_finds_all_duplicates(self, redis):
         descriptor = {'a': {'b': 3}, 'c': 4}
         self.etlhandler.create_redis_entry(task_id='123',
@@ -307,3 +333,48 @@ class TestETLHandler:
                                           use_existing=True)
         assert len(task_ids) == 1
         assert len(redis.keys('data:*')) == 1
+
+    def test_handle_submits_new_etls_as_single_group(
+            self, monkeypatch, redis):
+        groups = []
+
+        class FakeGroup:
+            def __init__(self, signatures):
+                groups.append(list(signatures))
+
+            def apply_async(self, *args, **kwargs):
+                pass
+        monkeypatch.setattr('fractalis.data.etlhandler.group', FakeGroup)
+        descriptors = [{'data_type': 'default', 'id': i} for i in range(3)]
+        task_ids = self.etlhandler.handle(descriptors=descriptors,
+                                          data_tasks=[],
+                                          use_existing=False)
+        assert len(groups) == 1
+        assert sorted(signature.options['task_id']
+                      for signature in groups[0]) == sorted(task_ids)
+        assert len(redis.keys('data:*')) == 3
+        for task_id in task_ids:
+            assert celery.AsyncResult(task_id).state == 'SUBMITTED'
+
+    def test_handle_submits_only_last_duplicate_if_not_use_existing(
+            self, monkeypatch, redis):
+        groups = []
+
+        class FakeGroup:
+            def __init__(self, signatures):
+                groups.append(list(signatures))
+
+            def apply_async(self, *args, **kwargs):
+                pass
+        monkeypatch.setattr('fractalis.data.etlhandler.group', FakeGroup)
+        descriptors = [{'data_type': 'default', 'id': i} for i in [0, 1, 0]]
+        task_ids = self.etlhandler.handle(descriptors=descriptors,
+                                          data_tasks=[],
+                                          use_existing=False)
+        assert len(task_ids) == 3
+        assert sorted(signature.options['task_id']
+                      for signature in groups[0]) == sorted(task_ids[1:])
+        assert not redis.exists('data:{}'.format(task_ids[0]))
+        for task_id in task_ids[1:]:
+            assert redis.exists('data:{}'.format(task_id))
+            assert celery.AsyncResult(task_id).state == 'SUBMITTED'
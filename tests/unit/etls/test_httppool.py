@@ -0,0 +1,117 @@
+"""This module provides tests for the pooled HTTP sessions of the ETLs."""
+
+import gc
+import time
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from fractalis import app
+from fractalis.data import httppool
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    received_cookies = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received_cookies.append(self.headers.get('Cookie'))
+        self.send_response(200)
+        self.send_header('Set-Cookie', 'PLAY2AUTH_SESS_ID={}; Path=/'
+                         .format(body.decode('utf-8')))
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestHTTPPool:
+
+    @pytest.fixture(scope='function')
+    def server(self):
+        httpd = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        yield 'http://127.0.0.1:{}'.format(httpd.server_port)
+        httppool.close_all()
+        httpd.shutdown()
+        httpd.server_close()
+
+    def teardown_method(self, method):
+        httppool.close_all()
+
+    def test_get_server_key_ignores_path(self):
+        assert httppool.get_server_key('https://foo.bar/api') == \
+            'https://foo.bar'
+        assert httppool.get_server_key('https://foo.bar:8080/') == \
+            'https://foo.bar:8080'
+
+    def test_same_session_for_same_server(self):
+        assert httppool.get_session('http://foo.bar/a') is \
+            httppool.get_session('http://foo.bar/b')
+        assert httppool.get_session('http://foo.bar') is not \
+            httppool.get_session('http://foo.baz')
+
+    def test_connections_are_reused(self, server):
+        for _ in range(5):
+            httppool.get_session(server).get(server).json()
+        stats = httppool.get_stats()[httppool.get_server_key(server)]
+        assert stats['requests'] == 5
+        assert stats['connections'] == 1
+        assert stats['reused'] == 4
+
+    def test_idle_sessions_are_replaced(self, server, monkeypatch):
+        session = httppool.get_session(server)
+        session.get(server).json()
+        idle = time.monotonic() + app.config['ETL_HTTP_KEEP_ALIVE'] + 1
+        monkeypatch.setattr(httppool.time, 'monotonic', lambda: idle)
+        assert httppool.get_session(server) is not session
+        stats = httppool.get_stats()[httppool.get_server_key(server)]
+        assert stats['requests'] == 1
+        assert stats['connections'] == 1
+
+    def test_retired_session_is_closed_by_last_user(self, server,
+                                                    monkeypatch):
+        session = httppool.get_session(server)
+        session.get(server).json()
+        idle = time.monotonic() + app.config['ETL_HTTP_KEEP_ALIVE'] + 1
+        monkeypatch.setattr(httppool.time, 'monotonic', lambda: idle)
+        assert httppool.get_session(server) is not session
+        # another thread might still be using the retired session
+        assert session.get(server).json() == {}
+        adapter = session.get_adapter(server)
+        assert adapter.poolmanager.pools
+        del session
+        gc.collect()
+        assert not adapter.poolmanager.pools
+
+    def test_cookies_are_not_shared_between_users(self, server):
+        Handler.received_cookies = []
+        r = httppool.get_session(server).post(server + '/login', data='foo')
+        assert r.cookies['PLAY2AUTH_SESS_ID'] == 'foo'
+        httppool.get_session(server).post(server + '/login', data='bar')
+        httppool.get_session(server).post(server + '/login', data='baz',
+                                          cookies={'PLAY2AUTH_SESS_ID': 'a'})
+        assert Handler.received_cookies == \
+            [None, None, 'PLAY2AUTH_SESS_ID=a']
+        assert not httppool.get_session(server).cookies
@@ -0,0 +1,43 @@
+"""This module provides tests for the matrix module."""
+
+import os
+
+import pandas as pd
+
+from fractalis.data.matrix import write_matrix, read_matrix, has_matrix, \
+    pivot_array
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestMatrix:
+
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0],
+                       ['a', 'bar', 3.0], ['b', 'bar', 4.0],
+                       ['c', 'baz', 5.0]],
+                      columns=['id', 'feature', 'value'])
+
+    def test_read_matrix_equals_pivot(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        assert not has_matrix(file_path)
+        write_matrix(self.df, file_path)
+        assert has_matrix(file_path)
+        matrix = read_matrix(file_path)
+        assert matrix.equals(
+            self.df.pivot(index='feature', columns='id', values='value'))
+
+    def test_read_matrix_slices_rows_and_columns(self, tmpdir):
+        file_path = os.path.join(str(tmpdir), 'abc')
+        write_matrix(self.df, file_path)
+        matrix = read_matrix(file_path, features=['foo', 'baz'], ids=['b'])
+        assert matrix.index.tolist() == ['baz', 'foo']
+        assert matrix.columns.tolist() == ['b']
+        assert matrix['b'].tolist()[1] == 2.0
+
+    def test_pivot_array_drops_unused_categories(self):
+        df = self.df.assign(id=self.df['id'].astype('category'),
+                            feature=self.df['feature'].astype('category'))
+        df = df[df['feature'] == 'baz']
+        matrix = pivot_array(df)
+        assert matrix.index.tolist() == ['baz']
+        assert matrix.columns.tolist() == ['c']
+        assert not pd.api.types.is_categorical_dtype(matrix.index)
@@ -0,0 +1,84 @@
+"""This module provides tests for the summary module."""
+
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from fractalis.data import summary as summary_module
+from fractalis.data.cache import CacheFormat
+from fractalis.data.summary import compute_cache_summary, compute_summary, \
+    merge_summaries
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestSummary:
+
+    df = pd.DataFrame([['a', 'foo', 1.0], ['b', 'foo', 2.0],
+                       ['c', 'foo', 6.0], ['a', 'bar', 3.0],
+                       ['b', 'bar', np.nan]],
+                      columns=['id', 'feature', 'value'])
+
+    def test_compute_summary_matches_numpy(self):
+        summary = compute_summary(self.df).set_index('feature')
+        assert summary.loc['foo', 'count'] == 3
+        assert summary.loc['foo', 'mean'] == 3.0
+        assert np.isclose(summary.loc['foo', 'variance'],
+                          np.var([1.0, 2.0, 6.0]))
+        assert summary.loc['foo', 'median'] == 2.0
+        assert summary.loc['bar', 'count'] == 1
+        assert summary.loc['bar', 'max'] == 3.0
+
+    def test_compute_summary_ignores_unused_categories(self):
+        df = self.df.assign(feature=self.df['feature'].astype('category'))
+        df = df[df['feature'] == 'foo']
+        assert compute_summary(df)['feature'].tolist() == ['foo']
+
+    def test_merge_summaries_pools_moments_exactly(self):
+        summary = merge_summaries([compute_summary(self.df[:2]),
+                                   compute_summary(self.df[2:])])
+        expected = compute_summary(self.df)
+        for column in ['feature', 'count', 'min', 'max']:
+            assert summary[column].tolist() == expected[column].tolist()
+        assert np.allclose(summary['mean'], expected['mean'])
+        assert np.allclose(summary['variance'], expected['variance'])
+
+    def test_merge_summaries_does_not_approximate_quantiles(self):
+        summary = merge_summaries([compute_summary(self.df[:2]),
+                                   compute_summary(self.df[2:])])
+        summary = summary.set_index('feature')
+        # foo is present in both data sets, bar only in the second one
+        assert summary.loc['foo', ['q25', 'median', 'q75']].isnull().all()
+        assert summary.loc['bar', 'median'] == 3.0
+
+    def test_compute_cache_summary_reads_features_in_batches(
+            self, tmpdir, monkeypatch):
+        parquet = CacheFormat.factory('parquet')
+        monkeypatch.setattr(parquet, 'row_group_size', 2)
+        monkeypatch.setattr(summary_module, 'BATCH_ROWS', 2)
+        reads = []
+
+        def read_cache(*args, **kwargs):
+            df = parquet.read(*args, **kwargs)
+            reads.append(df.shape[0])
+            return df
+
+        monkeypatch.setattr(summary_module, 'read_cache', read_cache)
+        file_path = os.path.join(str(tmpdir), 'abc')
+        writer = parquet.open_writer(file_path)
+        chunks = [self.df[:2], self.df[2:], self.df.assign(id='d')]
+        for chunk in chunks:
+            writer.append(chunk)
+        writer.close()
+        feature_rows = Counter()
+        for chunk in chunks:
+            feature_rows.update(chunk['feature'].value_counts().to_dict())
+        summary = compute_cache_summary(file_path, feature_rows)
+        expected = compute_summary(pd.concat(chunks))
+        assert summary['feature'].tolist() == expected['feature'].tolist()
+        assert np.allclose(summary[['count', 'mean', 'median', 'q75']],
+                           expected[['count', 'mean', 'median', 'q75']])
+        # one batch per feature, neither of them reads all values
+        assert len(reads) == 2
+        assert max(reads) < 10
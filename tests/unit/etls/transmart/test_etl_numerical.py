@@ -27,6 +27,17 @@ class TestNumericalETL:
         assert not self.etl.can_handle(handler='ada',
                                        descriptor={'foo': 'bar'})
 
+    @pytest.mark.parametrize('status, access', [(200, True), (403, False)])
+    def test_probe_access_requests_observations(self, status, access):
+        with responses.RequestsMock() as response:
+            response.add(response.GET, 'http://foo.bar/v2/observations',
+                         body='{}',
+                         status=status,
+                         content_type='application/json')
+            assert self.etl.probe_access(server='http://foo.bar', token='',
+                                         descriptor=self.descriptor) == access
+            assert len(response.calls) == 1
+
     def test_extract_raises_readable_if_not_200(self):
         with responses.RequestsMock() as response:
             response.add(response.GET, 'http://foo.bar/v2/observations',
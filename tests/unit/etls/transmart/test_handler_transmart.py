@@ -3,6 +3,7 @@
 import pytest
 import responses
 
+from fractalis import redis
 from fractalis.data.etls.transmart.handler_transmart import TransmartHandler
 
 
@@ -28,6 +29,10 @@ class TestTransmartHandler:
     def bad_init_args(self, request):
         return request.param
 
+    def teardown_method(self, method):
+        for key in redis.keys('token:*'):
+            redis.delete(key)
+
     def test_throws_if_bad_init_args(self, bad_init_args):
         with pytest.raises(ValueError):
             TransmartHandler(**bad_init_args)
@@ -63,3 +68,54 @@ class TestTransmartHandler:
                 TransmartHandler(server='http://foo.bar',
                                  auth={'user': 'foo', 'passwd': 'bar'})
                 assert '[400]' in e
+
+    @pytest.mark.parametrize('expires_in, logins', [(3600, 1), (30, 2)])
+    def test_caches_token_until_shortly_before_it_expires(self, expires_in,
+                                                          logins):
+        with responses.RequestsMock() as response:
+            response.add(response.POST, 'http://foo.bar/oauth/token',
+                         body='{{"access_token":"foo-token","expires_in":{}}}'
+                         .format(expires_in),
+                         status=200,
+                         content_type='application/json')
+            for _ in range(2):
+                tmh = TransmartHandler(server='http://foo.bar',
+                                       auth={'user': 'foo', 'passwd': 'bar'})
+                assert tmh._token == 'foo-token'
+            assert len(response.calls) == logins
+
+    def test_verify_access_replaces_revoked_cached_token(self):
+        with responses.RequestsMock() as response:
+            response.add(response.POST, 'http://foo.bar/oauth/token',
+                         body='{"access_token":"foo-token"}',
+                         status=200,
+                         content_type='application/json')
+            response.add(response.POST, 'http://foo.bar/oauth/token',
+                         body='{"access_token":"bar-token"}',
+                         status=200,
+                         content_type='application/json')
+            response.add(response.GET, 'http://foo.bar/v2/studies',
+                         body='', status=401)
+            response.add(response.GET, 'http://foo.bar/v2/studies',
+                         body='{"studies":[]}', status=200,
+                         content_type='application/json')
+            tmh = TransmartHandler(server='http://foo.bar',
+                                   auth={'user': 'foo', 'passwd': 'bar'})
+            assert not tmh.has_cached_token()
+            tmh = TransmartHandler(server='http://foo.bar',
+                                   auth={'user': 'foo', 'passwd': 'bar'})
+            assert tmh.has_cached_token()
+            assert tmh._token == 'foo-token'
+            assert tmh.verify_access()
+            assert tmh._token == 'bar-token'
+            assert response.calls[-1].request.headers['Authorization'] == \
+                'Bearer bar-token'
+
+    def test_verify_access_fails_for_rejected_token(self):
+        with responses.RequestsMock() as response:
+            response.add(response.GET, 'http://foo.bar/v2/studies',
+                         body='', status=401)
+            tmh = TransmartHandler(server='http://foo.bar',
+                                   auth={'token': 'foo-token'})
+            assert not tmh.has_cached_token()
+            assert tmh.verify_access() is False
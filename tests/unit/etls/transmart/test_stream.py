@@ -0,0 +1,107 @@
+"""This module provides tests for the streaming tranSMART hypercube parser."""
+
+import io
+import json
+import importlib
+
+import numpy as np
+import pytest
+
+from fractalis.data.etls.transmart.shared import transform_highdim, \
+    transform_clinical
+from fractalis.data.etls.transmart import stream
+from fractalis.data.etls.transmart.stream import Hypercube, parse_hypercube
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestParseHypercube:
+
+    body = {
+        'dimensionDeclarations': [{'name': 'assay'}, {'name': 'biomarker'}],
+        'cells': [
+            {'inlineDimensions': [], 'dimensionIndexes': [0, 0],
+             'numericValue': 1.5},
+            {'inlineDimensions': [], 'dimensionIndexes': [1, 0],
+             'numericValue': 2},
+            {'inlineDimensions': [], 'dimensionIndexes': [1, 1],
+             'numericValue': None}
+        ],
+        'dimensionElements': {
+            'assay': [{'sampleCode': 's1'}, {'sampleCode': 's2'}],
+            'biomarker': [{'label': 'foo'}, {'label': 'bar'}]
+        }
+    }
+
+    def parse(self, body):
+        stream = io.BytesIO(json.dumps(body).encode('utf-8'))
+        return parse_hypercube(stream, 'numericValue')
+
+    def test_parses_cells_into_arrays(self):
+        hypercube = self.parse(self.body)
+        assert hypercube.indexes.tolist() == [[0, 0], [1, 0], [1, 1]]
+        assert hypercube.values[:2].tolist() == [1.5, 2.0]
+        assert np.isnan(hypercube.values[2])
+        assert hypercube.get_dimension_index('biomarker') == 1
+        assert hypercube.dimension_elements['assay'][1]['sampleCode'] == 's2'
+
+    def test_c_backend_parses_like_python_backend(self, monkeypatch):
+        hypercube = self.parse(self.body)
+        monkeypatch.setattr(stream, 'backend',
+                            importlib.import_module('ijson.backends.python'))
+        expected = self.parse(self.body)
+        assert hypercube.indexes.tolist() == expected.indexes.tolist()
+        assert np.allclose(hypercube.values, expected.values, equal_nan=True)
+        assert hypercube.dimension_elements == expected.dimension_elements
+
+    def test_parses_empty_hypercube(self):
+        hypercube = self.parse({'cells': [], 'dimensionElements': {}})
+        assert hypercube.indexes.shape == (0, 0)
+        assert hypercube.values.shape == (0,)
+
+    def test_raises_for_inconsistent_cells(self):
+        body = dict(self.body)
+        body['cells'] = body['cells'] + [{'dimensionIndexes': [0]}]
+        with pytest.raises(ValueError):
+            self.parse(body)
+
+    def test_transform_highdim_maps_labels(self):
+        df = transform_highdim(self.parse(self.body))
+        assert list(df) == ['id', 'value', 'feature']
+        assert df['id'].tolist() == ['s1', 's2', 's2']
+        assert df['feature'].tolist() == ['foo', 'foo', 'bar']
+
+    def test_from_json_equals_streamed_hypercube(self):
+        streamed = self.parse(self.body)
+        hypercube = Hypercube.from_json(self.body, 'numericValue')
+        assert hypercube.indexes.tolist() == streamed.indexes.tolist()
+        assert np.array_equal(hypercube.values, streamed.values,
+                              equal_nan=True)
+
+    def test_decode_shares_categories_and_keeps_missing(self):
+        body = {
+            'cells': [{'dimensionIndexes': [0]}, {'dimensionIndexes': [2]},
+                      {'dimensionIndexes': [None]}],
+            'dimensionElements': {
+                'patient': [{'inTrialId': 'a'}, {'inTrialId': 'b'},
+                            {'inTrialId': 'a'}]
+            }
+        }
+        ids = Hypercube.from_json(body, 'numericValue').decode(
+            'patient', 'inTrialId')
+        assert ids.categories.tolist() == ['a', 'b']
+        assert ids[:2].tolist() == ['a', 'a']
+        assert ids.codes[2] == -1
+
+    def test_transform_clinical_decodes_patients(self):
+        body = {
+            'cells': [{'dimensionIndexes': [1, None], 'stringValue': 'x'},
+                      {'dimensionIndexes': [0, None], 'stringValue': 'y'}],
+            'dimensionElements': {
+                'patient': [{'inTrialId': 'p1'}, {'inTrialId': 'p2'}],
+                'study': []
+            }
+        }
+        df = transform_clinical(body, 'stringValue')
+        assert df.values.tolist() == [['p2', 'value', 'x'],
+                                      ['p1', 'value', 'y']]
+        assert df['id'].dtype == 'category'
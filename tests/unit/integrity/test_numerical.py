@@ -59,3 +59,28 @@ class TestNumericalIntegrityCheck:
         with pytest.raises(ValueError) as e:
             self.checker.check(df)
             assert 'must be unique' in e
+
+    def test_check_chunks_yields_chunks(self):
+        chunks = [pd.DataFrame([['1', 'a', 3]],
+                               columns=['id', 'feature', 'value']),
+                  pd.DataFrame([['2', 'a', 4]],
+                               columns=['id', 'feature', 'value'])]
+        checked = list(self.checker.check_chunks(chunks))
+        assert all(a is b for a, b in zip(checked, chunks))
+        assert len(checked) == 2
+
+    def test_check_chunks_raises_for_duplicates_across_chunks(self):
+        chunks = [pd.DataFrame([['1', 'a', 3]],
+                               columns=['id', 'feature', 'value']),
+                  pd.DataFrame([['1', 'a', 4]],
+                               columns=['id', 'feature', 'value'])]
+        with pytest.raises(ValueError):
+            list(self.checker.check_chunks(chunks))
+
+    def test_check_chunks_raises_for_different_features(self):
+        chunks = [pd.DataFrame([['1', 'a', 3]],
+                               columns=['id', 'feature', 'value']),
+                  pd.DataFrame([['2', 'b', 4]],
+                               columns=['id', 'feature', 'value'])]
+        with pytest.raises(ValueError):
+            list(self.checker.check_chunks(chunks))
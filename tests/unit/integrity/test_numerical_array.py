@@ -57,3 +57,18 @@ class TestNumericalArrayIntegrityCheck:
         with pytest.raises(ValueError) as e:
             self.checker.check(df)
             assert "must be unique" in e
+
+    def test_correct_check_9(self):
+        df = pd.DataFrame([['1', '2', 3], ['4', '2', 3]],
+                          columns=['id', 'feature', 'value'])
+        df['id'] = df['id'].astype('category')
+        df['feature'] = df['feature'].astype('category')
+        self.checker.check(df)
+
+    def test_correct_check_10(self):
+        df = pd.DataFrame([['1', 2, 3], ['4', 2, 3]],
+                          columns=['id', 'feature', 'value'])
+        df['feature'] = df['feature'].astype('category')
+        with pytest.raises(ValueError) as e:
+            self.checker.check(df)
+            assert "must be of type 'object'" in e
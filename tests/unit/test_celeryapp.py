@@ -0,0 +1,26 @@
+"""This module provides tests for the routing of celery tasks."""
+
+from fractalis import celery
+from fractalis.celeryapp import route_task
+
+
+# noinspection PyMissingOrEmptyDocstring,PyMissingTypeHints
+class TestRouteTask:
+
+    def route(self, name):
+        task = celery.tasks[name]
+        return route_task(name, (), {}, {}, task=task)
+
+    def test_routes_etls_to_etl_queue(self):
+        assert self.route('test_numerical_etl') == {'queue': 'etl'}
+
+    def test_routes_analytics_to_their_queue(self):
+        assert self.route('compute-histogram') == {'queue': 'analytics'}
+        assert self.route('compute-heatmap') == {'queue': 'statistics'}
+
+    def test_routes_unclassified_tasks_to_default_queue(self):
+        assert self.route('fractalis.cleanup.janitor') is None
+
+    def test_workers_consume_all_queues_by_default(self):
+        names = {queue.name for queue in celery.conf.CELERY_QUEUES}
+        assert {'etl', 'analytics', 'statistics', 'celery'} <= names
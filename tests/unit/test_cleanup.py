@@ -6,6 +6,7 @@ from pathlib import Path
 from shutil import rmtree
 
 from fractalis.cleanup import janitor
+from fractalis.data import quota
 from fractalis import app, redis, celery
 
 
@@ -86,3 +87,59 @@ class TestCleanup:
         monkeypatch.setattr(celery, 'AsyncResult', FakeAsyncResult)
         janitor()
         assert redis.exists('data:123')
+
+    def test_janitor_keeps_shared_blobs_of_tracked_data(self, monkeypatch):
+        blob_dir = os.path.join(self.data_dir, 'blobs')
+        os.makedirs(blob_dir, exist_ok=True)
+        path = os.path.join(blob_dir, 'abc')
+        Path(path).touch()
+        Path(os.path.join(blob_dir, 'def')).touch()
+        redis.sadd('blob:abc', '123')
+        redis.sadd('blob:def', '456')
+        data_state = {
+            'file_path': path,
+            'blob': 'abc'
+        }
+        redis.set('data:123', json.dumps(data_state))
+
+        class FakeAsyncResult:
+            def __init__(self, *args, **kwargs):
+                self.state = 'SUCCESS'
+
+            def get(self, *args, **kwargs):
+                pass
+        monkeypatch.setattr(celery, 'AsyncResult', FakeAsyncResult)
+        janitor()
+        assert redis.exists('data:123')
+        assert os.path.exists(path)
+        assert not os.path.exists(os.path.join(blob_dir, 'def'))
+
+    def test_janitor_evicts_least_recently_used_data(self, monkeypatch):
+        os.makedirs(self.data_dir, exist_ok=True)
+        for task_id in ['123', '456', '789']:
+            path = os.path.join(self.data_dir, task_id)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            redis.set('data:{}'.format(task_id),
+                      json.dumps({'file_path': path}))
+        quota.touch('456')
+        quota.touch('123')
+
+        class FakeAsyncResult:
+            def __init__(self, *args, **kwargs):
+                self.state = 'SUCCESS'
+
+            def get(self, *args, **kwargs):
+                pass
+        monkeypatch.setattr(celery, 'AsyncResult', FakeAsyncResult)
+        monkeypatch.setattr(celery.control, 'revoke', lambda *a, **kw: None)
+        monkeypatch.setitem(app.config, 'FRACTALIS_CACHE_QUOTA', 150)
+        stats = janitor()
+        assert stats['evictions'] == 2
+        assert stats['size'] == 100
+        assert redis.exists('data:123')
+        assert not redis.exists('data:456')
+        assert not redis.exists('data:789')
+        assert not os.path.exists(os.path.join(self.data_dir, '456'))
+        assert redis.hkeys(quota.ACCESS_KEY) == ['123']
+        assert quota.get_stats()['total_evictions'] == 2